@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+
+from benchmarks.harness import build_report, format_report, run_benchmark
+from benchmarks.suite import BENCHMARKS, create_benchmarks
+
+
+def main() -> None:
+    names = [cls.name for cls in BENCHMARKS]
+
+    parser = argparse.ArgumentParser(
+        prog="benchmark", description="Run the libddog benchmarks"
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="NAME",
+        help="Benchmarks to run, out of: %s (default: all)" % ", ".join(names),
+    )
+    parser.add_argument(
+        "--widgets", type=int, default=1000, help="Total number of widgets"
+    )
+    parser.add_argument(
+        "--widgets-per-dashboard",
+        type=int,
+        default=100,
+        help="Number of widgets in each dashboard",
+    )
+    parser.add_argument(
+        "--queries", type=int, default=1000, help="Number of queries to parse/validate"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Latency of the fake Datadog API, in seconds",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "-o", "--output", help="Write the results as JSON to this file ('-' is stdout)"
+    )
+    args = parser.parse_args()
+
+    unknown = sorted(set(args.names) - set(names))
+    if unknown:
+        parser.error("unknown benchmark(s): %s" % ", ".join(unknown))
+
+    benchmarks = create_benchmarks(
+        names=args.names or names,
+        widgets=args.widgets,
+        widgets_per_dashboard=args.widgets_per_dashboard,
+        queries=args.queries,
+        latency_s=args.latency,
+    )
+
+    results = []
+    for benchmark in benchmarks:
+        sys.stderr.write(
+            "Running %s: %s...\n" % (benchmark.name, benchmark.description)
+        )
+        result = run_benchmark(benchmark, repeat=args.repeat, warmup=args.warmup)
+        results.append(result)
+
+    sys.stderr.write(format_report(results) + "\n")
+
+    if args.output:
+        report = build_report(results, args=vars(args))
+        block = json.dumps(report, indent=2, sort_keys=True)
+
+        if args.output == "-":
+            sys.stdout.write(block + "\n")
+        else:
+            with open(args.output, "w") as fl:
+                fl.write(block + "\n")
+
+
+if __name__ == "__main__":
+    main()
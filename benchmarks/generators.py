@@ -0,0 +1,157 @@
+import random
+from typing import Dict, List
+
+from libddog.dashboards import (
+    Dashboard,
+    DashboardFactory,
+    Formula,
+    Group,
+    Note,
+    QueryValue,
+    Request,
+    Size,
+    TemplateVariableDefinition,
+    Timeseries,
+    Toplist,
+    Widget,
+)
+from libddog.metrics import Int, Query, QueryMonad
+
+METRICS = [
+    "aws.ec2.cpuutilization",
+    "aws.ec2.network_in",
+    "aws.ec2.network_out",
+    "aws.elb.request_count",
+    "aws.elb.latency",
+    "aws.rds.free_storage_space",
+    "aws.sqs.approximate_number_of_messages_visible",
+    "kubernetes.cpu.usage.total",
+    "kubernetes.memory.usage",
+    "trace.http.request.hits",
+    "trace.http.request.errors",
+    "trace.http.request.duration.by.service.99p",
+]
+
+TAGS = ["availability-zone", "host", "service", "env", "version", "pod_name"]
+
+TAG_VALUES = ["prod", "staging", "web", "api", "worker", "ap-southeast-2a"]
+
+TMPL_VARS = ["region", "env", "service"]
+
+
+class DefinitionGenerator:
+    """
+    Generates synthetic dashboard definitions resembling those of a large
+    monitoring project: many dashboards built from the same handful of metrics
+    and tags, with queries that use filters, grouping and functions.
+
+    The output only depends on the seed.
+    """
+
+    widgets_per_group = 10
+
+    def __init__(self, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+
+    def query(self) -> QueryMonad:
+        rnd = self.random
+
+        query = Query(rnd.choice(METRICS))
+        query = query.filter(f"${rnd.choice(TMPL_VARS)}")
+
+        if rnd.random() < 0.5:
+            query = query.filter(**{rnd.choice(TAGS): rnd.choice(TAG_VALUES)})
+        if rnd.random() < 0.2:
+            query = query.filter_ne(**{rnd.choice(TAGS): rnd.choice(TAG_VALUES)})
+
+        query = query.agg(rnd.choice(["avg", "min", "max", "sum"]))
+
+        if rnd.random() < 0.7:
+            query = query.by(*rnd.sample(TAGS, rnd.randint(1, 2)))
+        if rnd.random() < 0.3:
+            query = query.as_count()
+        if rnd.random() < 0.5:
+            query = query.rollup(rnd.choice(["avg", "sum", "max"]), 60)
+        if rnd.random() < 0.2:
+            query = query.fill("zero")
+
+        return query
+
+    def request(self) -> Request:
+        queries = [self.query() for _ in range(self.random.randint(1, 3))]
+
+        formulas = []
+        if len(queries) > 1 and self.random.random() < 0.5:
+            fst, snd = queries[0].identifier(), queries[1].identifier()
+            formulas.append(Formula(fst / snd * Int(100), alias="ratio"))
+
+        return Request(queries=queries, formulas=formulas)
+
+    def widget(self, idx: int) -> Widget:
+        kind = self.random.random()
+
+        if kind < 0.1:
+            return Note(content=f"Note number {idx}")
+
+        if kind < 0.25:
+            return QueryValue(title=f"Value {idx}", requests=[self.request()])
+
+        if kind < 0.4:
+            return Toplist(title=f"Top {idx}", requests=[self.request()])
+
+        size = Size(width=self.random.choice([3, 4, 6]), height=2)
+        return Timeseries(
+            title=f"Timeseries {idx}", requests=[self.request()], size=size
+        )
+
+    def dashboard(self, title: str, num_widgets: int) -> Dashboard:
+        widgets = [self.widget(idx) for idx in range(num_widgets)]
+
+        groups: List[Widget] = []
+        for start in range(0, num_widgets, self.widgets_per_group):
+            group = Group(
+                title=f"Group {start // self.widgets_per_group}",
+                widgets=widgets[start : start + self.widgets_per_group],
+            )
+            groups.append(group)
+
+        tmpl_var_defs = [
+            TemplateVariableDefinition(name=name, tag=name, default_value="*")
+            for name in TMPL_VARS
+        ]
+
+        return Dashboard(title=title, widgets=groups, tmpl_var_defs=tmpl_var_defs)
+
+    def dashboard_factories(
+        self, num_dashboards: int, widgets_per_dashboard: int
+    ) -> Dict[str, DashboardFactory]:
+        """
+        Returns factories for `num_dashboards` dashboards. Every factory gets its
+        own seed, so a dashboard is the same whenever, and in whichever order,
+        it's built.
+        """
+
+        def make_factory(title: str, seed: int) -> DashboardFactory:
+            def factory() -> Dashboard:
+                generator = self.__class__(seed=seed)
+                return generator.dashboard(title, widgets_per_dashboard)
+
+            return factory
+
+        factories = {}
+        for idx in range(num_dashboards):
+            title = f"Synthetic dashboard {idx:04d}"
+            factories[title] = make_factory(title, self.random.randrange(2**32))
+
+        return factories
+
+    def widgets_of_mixed_sizes(self, num: int) -> List[Widget]:
+        widgets: List[Widget] = []
+        for idx in range(num):
+            size = Size(
+                width=self.random.choice([2, 3, 4, 6, 12]),
+                height=self.random.choice([1, 2, 3, 4]),
+            )
+            widgets.append(Note(content=f"Note number {idx}", size=size))
+
+        return widgets
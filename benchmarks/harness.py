@@ -0,0 +1,116 @@
+import platform
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import libddog
+from libddog.common.types import JsonDict
+
+
+class Benchmark:
+    """
+    A benchmark measures the time it takes to `run` something. `setup` and
+    `teardown` are called around every run and are not measured.
+
+    `run` returns the number of operations it performed (eg. dashboards
+    rendered) so that throughput can be reported.
+    """
+
+    name = ""
+    description = ""
+
+    def __init__(self, **params: Any) -> None:
+        self.params = params
+
+    def setup(self) -> None:
+        pass
+
+    def run(self) -> int:
+        raise NotImplementedError
+
+    def teardown(self) -> None:
+        pass
+
+
+class BenchmarkResult:
+    def __init__(self, *, benchmark: Benchmark, timings: List[float], ops: int) -> None:
+        self.benchmark = benchmark
+        self.timings = timings
+        self.ops = ops
+
+    def as_dict(self) -> JsonDict:
+        median_s = statistics.median(self.timings)
+
+        return {
+            "name": self.benchmark.name,
+            "params": self.benchmark.params,
+            "repeat": len(self.timings),
+            "ops": self.ops,
+            "min_s": min(self.timings),
+            "median_s": median_s,
+            "mean_s": statistics.mean(self.timings),
+            "max_s": max(self.timings),
+            "ops_per_s": self.ops / median_s if median_s else None,
+        }
+
+
+def run_benchmark(
+    benchmark: Benchmark, *, repeat: int = 3, warmup: int = 1
+) -> BenchmarkResult:
+    timings = []
+    ops = 0
+
+    for iteration in range(warmup + repeat):
+        benchmark.setup()
+        try:
+            time_start = time.perf_counter()
+            ops = benchmark.run()
+            elapsed = time.perf_counter() - time_start
+        finally:
+            benchmark.teardown()
+
+        if iteration >= warmup:
+            timings.append(elapsed)
+
+    return BenchmarkResult(benchmark=benchmark, timings=timings, ops=ops)
+
+
+def get_environment() -> JsonDict:
+    "Describes where the benchmarks ran, to tell apart results from elsewhere."
+
+    return {
+        "libddog_version": libddog.__version__,
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def format_report(results: Sequence[BenchmarkResult]) -> str:
+    fmt = "%-20s  %8s  %10s  %10s  %12s"
+    lines = [fmt % ("BENCHMARK", "OPS", "MEDIAN", "MIN", "OPS/SEC")]
+
+    for result in results:
+        dct = result.as_dict()
+        ops_per_s = dct["ops_per_s"]
+        cols = (
+            dct["name"],
+            dct["ops"],
+            "%.3fs" % dct["median_s"],
+            "%.3fs" % dct["min_s"],
+            "%.1f" % ops_per_s if ops_per_s is not None else "-",
+        )
+        lines.append(fmt % cols)
+
+    return "\n".join(lines)
+
+
+def build_report(
+    results: Sequence[BenchmarkResult], args: Optional[Dict[str, Any]] = None
+) -> JsonDict:
+    return {
+        "environment": get_environment(),
+        "args": args or {},
+        "results": [result.as_dict() for result in results],
+    }
@@ -0,0 +1,235 @@
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Type
+
+from benchmarks.generators import DefinitionGenerator
+from benchmarks.harness import Benchmark
+from libddog.common.types import JsonDict
+from libddog.crud.dashboards import DashboardManager
+from libddog.dashboards import FlowLayout, HLayoutWrapping
+from libddog.metrics import Query, deferred_validation
+from libddog.parsing.query_parser import QueryParser
+from libtests.fake_datadog import FakeDatadogServer
+from libtests.query_corpus import QueryCorpusGenerator
+
+
+class BuildDefinitions(Benchmark):
+    name = "build"
+    description = "Build dashboards using Query(...) chains"
+
+    def __init__(self, *, dashboards: int, widgets: int) -> None:
+        super().__init__(dashboards=dashboards, widgets=widgets)
+        self.factories = DefinitionGenerator().dashboard_factories(dashboards, widgets)
+
+    def run(self) -> int:
+        for factory in self.factories.values():
+            factory()
+
+        return len(self.factories)
+
+
+class RenderDashboards(Benchmark):
+    name = "render"
+    description = "Render dashboards with Dashboard.as_dict()"
+
+    def __init__(self, *, dashboards: int, widgets: int) -> None:
+        super().__init__(dashboards=dashboards, widgets=widgets)
+        factories = DefinitionGenerator().dashboard_factories(dashboards, widgets)
+        self.dashes = [factory() for factory in factories.values()]
+
+    def run(self) -> int:
+        for dash in self.dashes:
+            dash.as_dict()
+
+        return len(self.dashes)
+
+
+class ParseQueries(Benchmark):
+    name = "parse"
+    description = "Parse query strings and formulas with QueryParser.parse_st"
+
+    def __init__(self, *, queries: int) -> None:
+        super().__init__(queries=queries)
+        generator = QueryCorpusGenerator(seed=0)
+        self.query_strings = generator.corpus(queries, formula_ratio=0.25)
+        self.parser = QueryParser.get_instance()
+
+    def run(self) -> int:
+        for query_string in self.query_strings:
+            self.parser.parse_st(query_string)
+
+        return len(self.query_strings)
+
+
+class ParseQueriesRecursiveDescent(ParseQueries):
+    name = "parse-rd"
+    description = "Parse the same query strings into ASTs with QueryParser.parse_ast"
+
+    def run(self) -> int:
+        for query_string in self.query_strings:
+            self.parser.parse_ast(query_string)
+
+        return len(self.query_strings)
+
+
+class ValidateQueries(Benchmark):
+    name = "validate"
+    description = "Build queries whose tags and template variables are validated"
+
+    def __init__(self, *, queries: int) -> None:
+        super().__init__(queries=queries)
+
+    def build_queries(self) -> int:
+        num = self.params["queries"]
+
+        for idx in range(num):
+            (
+                Query("aws.ec2.cpuutilization")
+                .filter("$region", "$az", env="prod", role=f"role{idx % 100}")
+                .filter_ne(service="batch")
+                .agg("avg")
+                .by("availability-zone", "host")
+            )
+
+        return int(num)
+
+    def run(self) -> int:
+        return self.build_queries()
+
+
+class ValidateQueriesDeferred(ValidateQueries):
+    name = "validate-deferred"
+    description = "Build the same queries with validation deferred and batched"
+
+    def run(self) -> int:
+        with deferred_validation():
+            return self.build_queries()
+
+
+class ComputeLayouts(Benchmark):
+    name = "layout"
+    description = "Compute HLayoutWrapping and FlowLayout placements"
+
+    def __init__(self, *, widgets: int) -> None:
+        super().__init__(widgets=widgets)
+        self.widgets = DefinitionGenerator().widgets_of_mixed_sizes(widgets)
+
+    def run(self) -> int:
+        HLayoutWrapping(width=3, height=2, widgets=self.widgets).get_placements()
+        FlowLayout(widgets=self.widgets).get_placements()
+
+        return len(self.widgets) * 2
+
+
+class PublishDashboards(Benchmark):
+    name = "publish"
+    description = "Create and update dashboards in a fake Datadog API"
+
+    def __init__(self, *, dashboards: int, widgets: int, latency_s: float) -> None:
+        super().__init__(dashboards=dashboards, widgets=widgets, latency_s=latency_s)
+
+        factories = DefinitionGenerator().dashboard_factories(dashboards, widgets)
+        self.dcts: List[JsonDict] = [
+            factory().as_dict() for factory in factories.values()
+        ]
+
+        self.server: Optional[FakeDatadogServer] = None
+        self.manager: Optional[DashboardManager] = None
+        self.proj_path: Optional[str] = None
+        self.saved_environ: Dict[str, Optional[str]] = {}
+
+    def setup(self) -> None:
+        self.server = FakeDatadogServer(latency_s=self.params["latency_s"])
+        self.server.start()
+
+        for key, value in self.server.environ.items():
+            self.saved_environ[key] = os.environ.get(key)
+            os.environ[key] = value
+
+        self.proj_path = tempfile.mkdtemp()
+        self.manager = DashboardManager(proj_path=self.proj_path)
+
+    def run(self) -> int:
+        manager = self.manager
+        assert manager is not None  # help mypy
+
+        ids = [manager.create_dashboard_from_dict(dct) for dct in self.dcts]
+
+        for id, dct in zip(ids, self.dcts):
+            manager.update_dashboard_from_dict(dct, id=id)
+
+        return len(ids) * 2
+
+    def teardown(self) -> None:
+        for key, value in self.saved_environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+        if self.server is not None:
+            self.server.stop()
+        if self.proj_path is not None:
+            shutil.rmtree(self.proj_path)
+
+
+BENCHMARKS: List[Type[Benchmark]] = [
+    BuildDefinitions,
+    RenderDashboards,
+    ParseQueries,
+    ParseQueriesRecursiveDescent,
+    ValidateQueries,
+    ValidateQueriesDeferred,
+    ComputeLayouts,
+    PublishDashboards,
+]
+
+
+def create_benchmarks(
+    *,
+    names: List[str],
+    widgets: int,
+    widgets_per_dashboard: int,
+    queries: int,
+    latency_s: float,
+) -> List[Benchmark]:
+    """
+    Creates the benchmarks selected by `names` for a total of `widgets` widgets
+    spread over dashboards of `widgets_per_dashboard` widgets each.
+    """
+
+    dashboards = max(widgets // widgets_per_dashboard, 1)
+
+    benchmarks: List[Benchmark] = []
+    for name in names:
+        if name == BuildDefinitions.name:
+            benchmarks.append(
+                BuildDefinitions(dashboards=dashboards, widgets=widgets_per_dashboard)
+            )
+        elif name == RenderDashboards.name:
+            benchmarks.append(
+                RenderDashboards(dashboards=dashboards, widgets=widgets_per_dashboard)
+            )
+        elif name == ParseQueries.name:
+            benchmarks.append(ParseQueries(queries=queries))
+        elif name == ParseQueriesRecursiveDescent.name:
+            benchmarks.append(ParseQueriesRecursiveDescent(queries=queries))
+        elif name == ValidateQueries.name:
+            benchmarks.append(ValidateQueries(queries=queries))
+        elif name == ValidateQueriesDeferred.name:
+            benchmarks.append(ValidateQueriesDeferred(queries=queries))
+        elif name == ComputeLayouts.name:
+            benchmarks.append(ComputeLayouts(widgets=widgets))
+        elif name == PublishDashboards.name:
+            benchmarks.append(
+                PublishDashboards(
+                    dashboards=dashboards,
+                    widgets=widgets_per_dashboard,
+                    latency_s=latency_s,
+                )
+            )
+        else:
+            raise ValueError("Unknown benchmark: %r" % name)
+
+    return benchmarks
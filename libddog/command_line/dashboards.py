@@ -1,59 +1,58 @@
-import fnmatch
+import json
 import os
-from typing import Any, List, Union
+from pathlib import Path
+from typing import List, Optional
 
 from libddog.command_line.console import ConsoleWriter
 from libddog.crud.dashboards import DashboardManager
 from libddog.crud.errors import AbstractCrudError
-from libddog.dashboards.components import Request
-from libddog.dashboards.dashboards import Dashboard
-from libddog.dashboards.widgets import Group, Widget
-from libddog.metrics.query import QueryMonad
-from libddog.tools.timekeeping import parse_date, time_since, utcnow
-
-
-def count_groups(obj: Union[Dashboard, Widget]) -> int:
-    if isinstance(obj, Dashboard):
-        return sum([count_groups(w) for w in obj.widgets])
-    elif isinstance(obj, Group):
-        return 1 + sum([count_groups(w) for w in obj.widgets])
-    elif isinstance(obj, Widget):
-        return 0
-
-
-def count_widgets(obj: Union[Dashboard, Widget]) -> int:
-    if isinstance(obj, Dashboard):
-        return sum([count_widgets(w) for w in obj.widgets])
-    elif isinstance(obj, Group):
-        return sum([count_widgets(w) for w in obj.widgets])
-    elif isinstance(obj, Widget):
-        return 1
-
-
-def count_queries(obj: Union[Dashboard, Widget, Request, QueryMonad]) -> int:
-    if isinstance(obj, Dashboard):
-        return sum([count_queries(w) for w in obj.widgets])
-    elif isinstance(obj, Group):
-        return sum([count_queries(w) for w in obj.widgets])
-    elif isinstance(obj, Widget):
-        return sum([count_queries(req) for req in getattr(obj, "requests", [])])
-    elif isinstance(obj, Request):
-        return sum([count_queries(q) for q in obj.queries])
-    elif isinstance(obj, QueryMonad):
-        return 1
+from libddog.crud.instrumentation import TimingCollector
+from libddog.crud.profiling import DefinitionsProfiler
+from libddog.crud.snapshots import RestoreKind, Snapshot
+from libddog.tools.text import format_size
+from libddog.tools.timekeeping import (
+    format_datetime_for_filename,
+    parse_date,
+    time_since,
+    utcnow,
+)
 
 
 class DashboardManagerCli:
-    def __init__(self, proj_path: str) -> None:
+    def __init__(
+        self,
+        proj_path: str,
+        *,
+        timings: Optional[TimingCollector] = None,
+        warm_up: bool = True,
+    ) -> None:
         self.proj_path = os.path.abspath(proj_path)
+        self.timings = timings
+        self.warm_up = warm_up
 
         self.writer = ConsoleWriter()
-        self.manager = DashboardManager(self.proj_path)
+        self.manager = DashboardManager(self.proj_path, instrumentation=timings)
 
-    def filter_definitions(
-        self, pattern: str, dashes: List[Dashboard]
-    ) -> List[Dashboard]:
-        return [dash for dash in dashes if fnmatch.fnmatch(dash.title, pattern)]
+    def close(self) -> None:
+        self.manager.close()
+
+    def start_warm_up(self, *, connections: int = 1) -> None:
+        # connect to the API while we load definitions
+        if self.warm_up:
+            self.manager.start_warm_up(connections=connections)
+
+    def report_timings(self, *, json_filepath: Optional[str] = None) -> None:
+        if self.timings is None:
+            return
+
+        self.writer.println("")
+        for line in self.timings.format_table():
+            self.writer.println(line)
+
+        if json_filepath is not None:
+            with open(json_filepath, "w") as fl:
+                json.dump(self.timings.as_dict(), fl, indent=2)
+                fl.write("\n")
 
     def delete_live(self, *, id: str) -> int:
         # Take a snapshot first to make restoring it possible
@@ -73,34 +72,55 @@ class DashboardManagerCli:
 
         return os.EX_OK
 
-    def list_defs(self) -> int:
-        dashes = None
+    def list_defs(self, *, jobs: int = 1, use_cache: bool = True) -> int:
+        entries = None
 
         try:
-            dashes = self.manager.load_definitions()
+            # only build the definitions if they've changed since last time
+            if use_cache:
+                entries = self.manager.load_cached_definition_entries()
+
+            if entries is None:
+                entries = {}
+                for defn in self.manager.render_definitions(jobs=jobs):
+                    entries[defn.title] = defn.stats
+
+                self.manager.save_cached_definition_entries(entries)
 
         except AbstractCrudError as exc:
             self.writer.report_failed(exc)
             return os.EX_UNAVAILABLE
 
-        fmt = "%6s  %7s  %7s  %s"
-        self.writer.println(fmt, "GROUPS", "WIDGETS", "QUERIES", "TITLE")
+        fmt = "%6s  %7s  %7s  %8s  %7s  %5s  %7s  %s"
+        header_cols = (
+            "GROUPS",
+            "WIDGETS",
+            "QUERIES",
+            "FORMULAS",
+            "METRICS",
+            "TVARS",
+            "SIZE",
+            "TITLE",
+        )
+        self.writer.println(fmt, *header_cols)
 
         # sort by title
-        dashes = sorted(dashes, key=lambda dash: dash.title.lower())
+        titles = sorted(entries.keys(), key=lambda title: title.lower())
 
-        for dash in dashes:
-            n_widgets = count_widgets(dash)
-            n_groups = count_groups(dash)
-            n_queries = count_queries(dash)
+        for title in titles:
+            entry = entries[title]
 
-            self.writer.println(
-                fmt,
-                n_groups,
-                n_widgets,
-                n_queries,
-                dash.title,
+            cols = (
+                entry["groups"],
+                entry["widgets"],
+                entry["queries"],
+                entry["formulas"],
+                entry["metrics"],
+                entry["tmpl_vars"],
+                format_size(entry["payload_size"]),
+                title,
             )
+            self.writer.println(fmt, *cols)
 
         return os.EX_OK
 
@@ -177,9 +197,73 @@ class DashboardManagerCli:
 
         return os.EX_OK
 
+    def profile_defs(
+        self,
+        *,
+        title_pat: Optional[str] = None,
+        output: str,
+        top: int = 20,
+        trace_allocations: bool = True,
+    ) -> int:
+        profiler = DefinitionsProfiler(
+            self.manager, trace_allocations=trace_allocations
+        )
+
+        try:
+            report = profiler.profile(title_pat=title_pat)
+
+        except AbstractCrudError as exc:
+            self.writer.report_failed(exc)
+            return os.EX_UNAVAILABLE
+
+        category_names = list(report.get_category_totals().keys())
+
+        fmt = "%8s  %8s  %8s  " + "%8s  " * len(category_names) + "%8s  %8s  %8s  %s"
+        header_cols = (
+            ["TOTAL", "BUILD", "RENDER"]
+            + [name.upper() for name in category_names]
+            + ["PEAK", "LIBDDOG", "OTHER", "TITLE"]
+        )
+        self.writer.println(fmt, *header_cols)
+
+        def format_alloc(num_bytes: Optional[int]) -> str:
+            return format_size(num_bytes) if num_bytes is not None else "-"
+
+        # most expensive first
+        profiles = sorted(report.profiles, key=lambda prof: prof.total_s, reverse=True)
+
+        for profile in profiles[:top]:
+            cols = (
+                ["%.3fs" % profile.total_s]
+                + ["%.3fs" % profile.build_s, "%.3fs" % profile.render_s]
+                + ["%.3fs" % profile.categories[name] for name in category_names]
+                + [
+                    format_alloc(profile.alloc_peak),
+                    format_alloc(profile.alloc_libddog),
+                    format_alloc(profile.alloc_other),
+                    profile.title,
+                ]
+            )
+            self.writer.println(fmt, *cols)
+
+        total_s = sum(profile.total_s for profile in profiles)
+        self.writer.println(
+            "%d dashboards built and rendered in %.3fs, definitions loaded in %.3fs",
+            len(profiles),
+            total_s,
+            report.load_s,
+        )
+
+        report.dump_stats(output)
+        self.writer.println("Profile written to: %s", output)
+
+        return os.EX_OK
+
     def publish_draft(self, *, title_pat: str) -> int:
-        dashes = self.manager.load_definitions()
-        dashes = self.filter_definitions(title_pat, dashes)
+        self.start_warm_up()
+
+        # only the dashboards matching the pattern are built
+        dashes = self.manager.load_definitions(title_pat=title_pat)
 
         if not dashes:
             self.writer.println(
@@ -224,12 +308,26 @@ class DashboardManagerCli:
 
         return os.EX_OK
 
-    def publish_live(self, *, title_pat: str) -> int:
-        dashes = self.manager.load_definitions()
-        dashes = self.filter_definitions(title_pat, dashes)
+    def publish_live(self, *, title_pat: str, jobs: int = 1) -> int:
+        # Rendering with a pool of worker processes forks this process, which
+        # must not happen while the warm up thread is using the connection
+        # pool, so in that case we only warm up once rendering is done.
+        if jobs == 1:
+            self.start_warm_up()
+
+        defns = self.manager.render_definitions(title_pat=title_pat, jobs=jobs)
+
+        if jobs != 1:
+            self.start_warm_up()
+
+        try:
+            live_by_title = self.manager.index_live_dashboards_by_title()
+        except AbstractCrudError as exc:
+            self.writer.report_failed(exc)
+            return os.EX_UNAVAILABLE
 
-        for dash in dashes:
-            existing = self.manager.find_first_dashboard_with_title(dash.title)
+        for defn in defns:
+            existing = live_by_title.get(defn.title)
 
             if existing:
                 id = existing["id"]
@@ -240,11 +338,11 @@ class DashboardManagerCli:
                     return exit_code
 
                 self.writer.print(
-                    f"Updating dashboard with id: {id!r} entitled: {dash.title!r}... "
+                    f"Updating dashboard with id: {id!r} entitled: {defn.title!r}... "
                 )
 
                 try:
-                    self.manager.update_dashboard(dashboard=dash, id=id)
+                    self.manager.update_dashboard_from_dict(defn.dct, id=id)
                     self.writer.println("done")
 
                 except AbstractCrudError as exc:
@@ -252,10 +350,10 @@ class DashboardManagerCli:
                     return os.EX_IOERR
 
             else:
-                self.writer.print(f"Creating dashboard entitled: {dash.title!r}... ")
+                self.writer.print(f"Creating dashboard entitled: {defn.title!r}... ")
 
                 try:
-                    id = self.manager.create_dashboard(dashboard=dash)
+                    id = self.manager.create_dashboard_from_dict(defn.dct)
                     self.writer.println("created with id: %r", id)
 
                 except AbstractCrudError as exc:
@@ -264,6 +362,153 @@ class DashboardManagerCli:
 
         return os.EX_OK
 
+    def restore(
+        self,
+        *,
+        filepaths: List[str],
+        since: Optional[str] = None,
+        dry_run: bool = False,
+        jobs: int = 4,
+    ) -> int:
+        self.start_warm_up(connections=1 if dry_run else jobs)
+
+        snapshots: List[Snapshot] = []
+
+        try:
+            if since is not None:
+                since_dt = parse_date(since)
+                snapshots.extend(self.manager.find_snapshots_since(since_dt))
+
+            for filepath in filepaths:
+                snapshots.append(Snapshot.load(Path(filepath)))
+
+            actions = self.manager.plan_restore(snapshots)
+
+        except AbstractCrudError as exc:
+            self.writer.report_failed(exc)
+            return os.EX_UNAVAILABLE
+
+        except ValueError as exc:
+            self.writer.println("Invalid time %r: %s", since, exc)
+            return os.EX_USAGE
+
+        if not actions:
+            self.writer.println("No snapshots to restore")
+            return os.EX_OK
+
+        fmt = "%6s  %11s  %20s  %s"
+        self.writer.println(fmt, "ACTION", "ID", "SNAPSHOT TIME", "TITLE")
+        for action in actions:
+            snapshot = action.snapshot
+            id = snapshot.id if action.kind is RestoreKind.UPDATE else "-"
+            taken_at = format_datetime_for_filename(snapshot.taken_at)
+            cols = (action.kind.value, id, taken_at, snapshot.title)
+            self.writer.println(fmt, *cols)
+
+        conflicts = [action for action in actions if action.conflict]
+        if conflicts:
+            for action in conflicts:
+                self.writer.errorln(
+                    "Conflict restoring %s: %s"
+                    % (action.snapshot.filepath.name, action.conflict)
+                )
+            self.writer.println(
+                "Not restoring anything because of %d conflict(s)", len(conflicts)
+            )
+            return os.EX_DATAERR
+
+        if dry_run:
+            self.writer.println("Dry run: would restore %d dashboards", len(actions))
+            return os.EX_OK
+
+        num_failed = 0
+        results = self.manager.restore_snapshots(actions, jobs=jobs)
+        for num, result in enumerate(results, 1):
+            snapshot = result.action.snapshot
+            prefix = f"[{num}/{len(actions)}]"
+
+            if result.error is not None:
+                num_failed += 1
+                self.writer.println(
+                    "%s Failed to restore %r from %s",
+                    prefix,
+                    snapshot.title,
+                    snapshot.filepath.name,
+                )
+                self.writer.report_failed(result.error)
+                continue
+
+            verb = "Updated" if result.action.kind is RestoreKind.UPDATE else "Created"
+            self.writer.println(
+                "%s %s dashboard with id: %r entitled: %r",
+                prefix,
+                verb,
+                result.id,
+                snapshot.title,
+            )
+
+        if num_failed:
+            self.writer.println("%d of %d restores failed", num_failed, len(actions))
+            return os.EX_IOERR
+
+        return os.EX_OK
+
+    def search(
+        self,
+        *,
+        metric: Optional[str] = None,
+        tag: Optional[str] = None,
+        tmpl_var: Optional[str] = None,
+        show_queries: bool = False,
+    ) -> int:
+        index = self.manager.get_search_index()
+
+        try:
+            update = self.manager.update_search_index(index)
+            if update.dashboards_indexed:
+                self.writer.println(
+                    "Indexed %s new snapshot(s) (%s queries, %s failed to parse)",
+                    update.dashboards_indexed,
+                    update.queries_indexed,
+                    update.queries_failed,
+                )
+
+            if show_queries:
+                query_hits = index.search_queries(
+                    metric=metric, tag=tag, tmpl_var=tmpl_var
+                )
+
+                fmt = "%11s  %-40s  %-30s  %s"
+                self.writer.println(fmt, "ID", "DASHBOARD", "WIDGET", "QUERY")
+                for query_hit in query_hits:
+                    self.writer.println(
+                        fmt,
+                        query_hit.dashboard_id,
+                        query_hit.dashboard_title[:40],
+                        (query_hit.widget_title or "-")[:30],
+                        query_hit.query,
+                    )
+
+            else:
+                dashboard_hits = index.search_dashboards(
+                    metric=metric, tag=tag, tmpl_var=tmpl_var
+                )
+
+                fmt = "%11s  %7s  %s"
+                self.writer.println(fmt, "ID", "QUERIES", "TITLE")
+                for dashboard_hit in dashboard_hits:
+                    cols = (
+                        dashboard_hit.id,
+                        dashboard_hit.queries,
+                        dashboard_hit.title,
+                    )
+                    self.writer.println(fmt, *cols)
+
+        finally:
+            index.close()
+
+        return os.EX_OK
+
     def snapshot_live(self, *, id: str) -> int:
         self.writer.print("Creating snapshot of live dashboard with id: %r... ", id)
 
@@ -1,14 +1,19 @@
 import json
 import logging
 import os
+import threading
 import time
-from typing import Dict, List, Optional, Type
+from concurrent.futures import ThreadPoolExecutor
+from types import TracebackType
+from typing import Any, Dict, Iterator, List, Optional, Set, Type
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from libddog.common.types import JsonDict
 from libddog.crud.errors import (
     AbstractCrudError,
+    ApiKeyValidateFailed,
     AppKeyGetFailed,
     AppKeyListFailed,
     DashboardCreateFailed,
@@ -19,6 +24,13 @@ from libddog.crud.errors import (
     MissingDatadogApiKey,
     MissingDatadogAppKey,
 )
+from libddog.crud.instrumentation import (
+    ClientInstrumentation,
+    RequestEvent,
+    get_endpoint_name,
+    measure_phase,
+)
+from libddog.crud.retries import RetryPolicy
 from libddog.crud.users import UserIdentity
 from libddog.dashboards import Dashboard
 from libddog.tools.logs import enable_logging
@@ -27,14 +39,30 @@ from libddog.tools.logs import enable_logging
 class DatadogClient:
     env_varname_api_key = "DATADOG_API_KEY"
     env_varname_app_key = "DATADOG_APPLICATION_KEY"
+    env_varname_host = "DATADOG_HOST"
+
+    default_host = "https://api.datadoghq.com"
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        instrumentation: Optional[ClientInstrumentation] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        pool_size: int = 10,
+    ) -> None:
         self.api_key: Optional[str] = None
         self.app_key: Optional[str] = None
+        self.instrumentation = instrumentation
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.pool_size = pool_size
 
-        self.baseurl = "https://api.datadoghq.com/api"
+        # the host can be overridden to use another Datadog site (eg. EU) or a
+        # stand-in for the API in tests
+        host = os.getenv(self.env_varname_host) or self.default_host
+        self.baseurl = f"{host.rstrip('/')}/api"
 
         self.session = requests.Session()
+        self.mount_adapters()
 
         self.logger = logging.getLogger(__name__)
 
@@ -50,6 +78,77 @@ class DatadogClient:
         # parameters.
         enable_logging(force=True)
 
+    def __enter__(self) -> "DatadogClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        "Closes the pooled connections."
+
+        self.session.close()
+
+    def mount_adapters(self) -> None:
+        # We do our own retrying in make_request, so the adapter must not.
+        # Connections are kept per host, and we only talk to one.
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def resize_pool(self, pool_size: int) -> None:
+        """
+        Makes room for at least `pool_size` concurrent connections, eg. to
+        match the number of threads sharing the client. Must be called before
+        those threads start, because connections in the old pool are closed.
+        """
+
+        if pool_size <= self.pool_size:
+            return
+
+        self.pool_size = pool_size
+        self.session.close()
+        self.mount_adapters()
+
+    def warm_up(self, connections: int = 1) -> None:
+        """
+        Opens `connections` connections to the API ahead of time, so that later
+        requests don't have to wait for the TLS handshake. This is best effort:
+        failures are logged and otherwise ignored, because the requests that
+        follow will report them properly.
+        """
+
+        connections = min(connections, self.pool_size)
+
+        def validate() -> None:
+            try:
+                self.validate_api_key()
+            except AbstractCrudError as exc:
+                self.logger.debug(f"Warming up connection failed: {exc}")
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for _ in range(connections):
+                executor.submit(validate)
+
+    def start_warm_up(self, connections: int = 1) -> threading.Thread:
+        "Warms up connections in a background thread and returns the thread."
+
+        thread = threading.Thread(
+            target=self.warm_up,
+            kwargs={"connections": connections},
+            name="ddog-warm-up",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
     def load_credentials_from_environment(self) -> None:
         var_api_key = self.env_varname_api_key
         var_app_key = self.env_varname_app_key
@@ -87,6 +186,9 @@ class DatadogClient:
 
         return url
 
+    def build_validate_url(self) -> str:
+        return f"{self.baseurl}/v1/validate"
+
     def build_dashboard_url(self, id: Optional[str] = None) -> str:
         url = f"{self.baseurl}/v1/dashboard"
 
@@ -95,6 +197,12 @@ class DatadogClient:
 
         return url
 
+    def get_endpoint_name(self, url: str) -> str:
+        "https://api.datadoghq.com/api/v1/dashboard/abc-def-ghi -> /v1/dashboard/{id}"
+
+        path = url[len(self.baseurl) :] if url.startswith(self.baseurl) else url
+        return get_endpoint_name(path.split("?")[0])
+
     def try_parse_json_payload(self, response: requests.Response) -> Optional[JsonDict]:
         try:
             payload: JsonDict = response.json()
@@ -127,38 +235,107 @@ class DatadogClient:
         request: requests.Request,
         expected_code: int,
         exc_cls: Type[AbstractCrudError],
+        deduplicated: bool = False,
     ) -> Optional[JsonDict]:
+        """
+        Sends the request, retrying it as the retry policy allows. Pass
+        `deduplicated` if sending a non-idempotent request more than once is
+        harmless.
+        """
+
+        policy = self.retry_policy
         response: Optional[requests.Response] = None
         payload: Optional[JsonDict] = None
         errors: List[str] = []
 
-        attempt_no = 1
-        wait_secs_base = 0.5
+        time_start = time.perf_counter()
+        deadline = time.monotonic() + policy.deadline_s
         prepared_request = request.prepare()
+        method = prepared_request.method or ""
+        encode_s = time.perf_counter() - time_start
+
+        network_s = server_s = sleep_s = 0.0
+        sleeps = 0
+        status_codes: List[Optional[int]] = []
+        wait_secs: Optional[float] = None
+
+        for attempt_no in range(1, policy.max_attempts + 1):
+            response = None
+            errors = []
+            retry = False
+            timeout = policy.get_timeout(deadline - time.monotonic())
 
-        while attempt_no < 4:
+            time_send = time.perf_counter()
             try:
-                response = self.session.send(prepared_request)
+                response = self.session.send(prepared_request, timeout=timeout)
+                server_s += response.elapsed.total_seconds()
+
             except requests.exceptions.RequestException as exc:
                 errors.append(str(exc))
+                retry = policy.should_retry_exception(
+                    method=method, exc=exc, deduplicated=deduplicated
+                )
+                reason = exc.__class__.__name__
 
+            network_s += time.perf_counter() - time_send
+            status_codes.append(response.status_code if response is not None else None)
+
+            if response is not None:
+                retry = policy.should_retry_response(
+                    method=method,
+                    status_code=response.status_code,
+                    deduplicated=deduplicated,
+                )
+                reason = f"HTTP {response.status_code}"
+
+            if not retry or attempt_no == policy.max_attempts:
+                break
+
+            wait_secs = policy.get_backoff(wait_secs)
             if response is not None and response.status_code == 429:
-                wait_secs = self.try_parse_ratelimit_reset(response)
-                if wait_secs is None:
-                    # there is no jitter here but I don't think it matters
-                    # because this is a fallback code path anyway
-                    wait_secs = wait_secs_base * (2 ** attempt_no)
+                wait_secs = self.try_parse_ratelimit_reset(response) or wait_secs
+
+            if time.monotonic() + wait_secs >= deadline:
+                self.logger.warning(
+                    f"Request failed ({reason}), not retrying because the "
+                    f"deadline of {policy.deadline_s} seconds would be exceeded"
+                )
+                break
 
-                # log a warning because we are deliberately pausing execution
+            # log a warning because we are deliberately pausing execution
+            if response is not None and response.status_code == 429:
                 self.logger.warning(
                     f"Request was rate limited by the Datadog API, "
-                    f"retrying in {wait_secs} seconds"
+                    f"retrying in {wait_secs:.2f} seconds"
+                )
+            else:
+                self.logger.warning(
+                    f"Request failed ({reason}), "
+                    f"retrying in {wait_secs:.2f} seconds"
                 )
-                time.sleep(wait_secs)
-                attempt_no += 1
-                continue
 
-            break
+            time.sleep(wait_secs)
+            sleeps += 1
+            sleep_s += wait_secs
+
+        if self.instrumentation is not None:
+            body = prepared_request.body or b""
+            event = RequestEvent(
+                method=prepared_request.method or "",
+                endpoint=self.get_endpoint_name(prepared_request.url or ""),
+                status_code=response.status_code if response is not None else None,
+                attempts=len(status_codes),
+                sleeps=sleeps,
+                bytes_sent=len(body),
+                bytes_received=len(response.content) if response is not None else 0,
+                encode_s=encode_s,
+                network_s=network_s,
+                server_s=server_s,
+                sleep_s=sleep_s,
+                elapsed_s=time.perf_counter() - time_start,
+                status_codes=status_codes,
+            )
+            self.instrumentation.request_completed(event)
 
         if response is not None:
             payload = self.try_parse_json_payload(response)
@@ -173,7 +350,13 @@ class DatadogClient:
     # Dashboard API
 
     def create_dashboard(self, dashboard: Dashboard) -> str:
-        client_kwargs = dashboard.as_dict()
+        with measure_phase(self.instrumentation, "render"):
+            dct = dashboard.as_dict()
+
+        return self.create_dashboard_from_dict(dct)
+
+    def create_dashboard_from_dict(self, dct: JsonDict) -> str:
+        client_kwargs = dict(dct)
         client_kwargs.pop("id", None)  # we cannot pass an id when creating
 
         url = self.build_dashboard_url()
@@ -213,20 +396,72 @@ class DatadogClient:
         assert isinstance(payload, dict)  # help mypy
         return payload
 
-    def list_dashboards(self) -> List[JsonDict]:
+    def iter_dashboards(
+        self,
+        *,
+        page_size: int = 100,
+        shared: Optional[bool] = None,
+        deleted: Optional[bool] = None,
+    ) -> Iterator[JsonDict]:
+        """
+        Yields the summaries of the live dashboards one page at a time, so that
+        callers looking for a particular dashboard can stop early.
+
+        `shared` only lists shared dashboards and `deleted` only lists deleted
+        dashboards, as filtered by the API. A dashboard that moves between
+        pages while we're listing (because another dashboard was created or
+        deleted) is only yielded once.
+        """
+
         url = self.build_dashboard_url()
         headers = self.prepare_headers()
-        request = requests.Request(method="GET", url=url, headers=headers)
 
-        payload = self.make_request(
-            request=request, expected_code=200, exc_cls=DashboardListFailed
-        )
+        params: Dict[str, Any] = {"count": page_size}
+        if shared is not None:
+            params["filter[shared]"] = "true" if shared else "false"
+        if deleted is not None:
+            params["filter[deleted]"] = "true" if deleted else "false"
 
-        assert isinstance(payload, dict)  # help mypy
-        dashboards = payload["dashboards"]
-        assert isinstance(dashboards, list)  # help mypy
+        seen_ids: Set[str] = set()
+        start = 0
+
+        while True:
+            params["start"] = start
+            request = requests.Request(
+                method="GET", url=url, headers=headers, params=dict(params)
+            )
+
+            payload = self.make_request(
+                request=request, expected_code=200, exc_cls=DashboardListFailed
+            )
 
-        return dashboards
+            assert isinstance(payload, dict)  # help mypy
+            dashboards = payload["dashboards"]
+            assert isinstance(dashboards, list)  # help mypy
+
+            for dashboard in dashboards:
+                id = dashboard.get("id")
+                if id in seen_ids:
+                    continue
+
+                seen_ids.add(id)
+                yield dashboard
+
+            if len(dashboards) < page_size:
+                break
+
+            start += len(dashboards)
+
+    def list_dashboards(
+        self,
+        *,
+        page_size: int = 100,
+        shared: Optional[bool] = None,
+        deleted: Optional[bool] = None,
+    ) -> List[JsonDict]:
+        return list(
+            self.iter_dashboards(page_size=page_size, shared=shared, deleted=deleted)
+        )
 
     def update_dashboard(self, dashboard: Dashboard, id: Optional[str] = None) -> None:
         id = id or dashboard.id
@@ -236,7 +471,13 @@ class DatadogClient:
                 "Cannot update dashboard without an id: %r" % dashboard.title
             )
 
-        client_kwargs = dashboard.as_dict()
+        with measure_phase(self.instrumentation, "render"):
+            dct = dashboard.as_dict()
+
+        self.update_dashboard_from_dict(dct, id=id)
+
+    def update_dashboard_from_dict(self, dct: JsonDict, id: str) -> None:
+        client_kwargs = dict(dct)
         client_kwargs.pop("id", None)  # we pass it separately
 
         url = self.build_dashboard_url(id=id)
@@ -251,6 +492,18 @@ class DatadogClient:
 
     # Key Management API
 
+    def validate_api_key(self) -> bool:
+        url = self.build_validate_url()
+        headers = self.prepare_headers()
+        request = requests.Request(method="GET", url=url, headers=headers)
+
+        payload = self.make_request(
+            request=request, expected_code=200, exc_cls=ApiKeyValidateFailed
+        )
+
+        assert isinstance(payload, dict)  # help mypy
+        return payload.get("valid") is True
+
     def detect_current_user_identity(self) -> Optional[UserIdentity]:
         """
         Detects the user identity (handle, email address etc) of the user whose
@@ -1,22 +1,41 @@
+import fnmatch
 import importlib
 import json
 import os
 import re
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from types import ModuleType
-from typing import List, Optional
+from types import ModuleType, TracebackType
+from typing import Dict, Iterator, List, Optional, Sequence, Type
 
 import libddog
 from libddog.common.types import JsonDict
 from libddog.crud.client import DatadogClient
+from libddog.crud.definitions import DefinitionsCache, RenderedDefinition
 from libddog.crud.errors import (
+    AbstractCrudError,
+    DashboardCreateFailed,
     DashboardDefinitionsImportError,
     DashboardDefinitionsLoadError,
 )
+from libddog.crud.instrumentation import ClientInstrumentation, measure_phase
+from libddog.crud.retries import RetryPolicy
+from libddog.crud.search import IndexUpdate, SearchIndex
+from libddog.crud.snapshots import (
+    RestoreAction,
+    RestoreKind,
+    RestoreResult,
+    Snapshot,
+    find_snapshots_since,
+)
 from libddog.crud.users import UserIdentity
-from libddog.dashboards.dashboards import Dashboard
+from libddog.dashboards.dashboards import Dashboard, DashboardFactory
+from libddog.dashboards.stats import collect_stats
 from libddog.tools.git import GitHelper
 from libddog.tools.text import sanitize_title_for_filename
 from libddog.tools.timekeeping import format_datetime_for_filename, utcnow
@@ -25,10 +44,15 @@ from libddog.tools.timekeeping import format_datetime_for_filename, utcnow
 class DashboardManager:
     _title_sentinel = "Untitled dashboard"
     _snapshot_dirname = "_snapshots"
+    _cache_dirname = "_cache"
+    _defs_cache_filename = "definitions.json"
+    _search_index_filename = "search.sqlite"
 
     _defs_containing_dir = "config"
     _defs_module_name = "dashboards"
     _defs_import_path = f"{_defs_containing_dir}.{_defs_module_name}"
+    _defs_factories_func = "get_dashboard_factories"
+    _defs_load_func = "get_dashboards"
 
     _libddog_proj_name = "libddog"
     _libddog_proj_version = libddog.__version__
@@ -36,42 +60,107 @@ class DashboardManager:
 
     _rx_desc_version = re.compile(f"(?P<tool>{_libddog_proj_name}) v(?P<version>[^ ]+)")
     _rx_desc_user = re.compile(f"last updated by (?P<user>[^ ]+)")
-
-    def __init__(self, proj_path: str) -> None:
+    _create_marker_fmt = "libddog-create-key: %s"
+
+    def __init__(
+        self,
+        proj_path: str,
+        *,
+        instrumentation: Optional[ClientInstrumentation] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
         self.proj_path = proj_path
+        self.instrumentation = instrumentation
+        self.retry_policy = retry_policy or RetryPolicy()
         self.snapshots_path: Path = Path(self.proj_path) / Path(self._snapshot_dirname)
+        self.cache_path: Path = Path(self.proj_path) / Path(self._cache_dirname)
+        self.definitions_cache = DefinitionsCache(
+            self.proj_path, self.cache_path / Path(self._defs_cache_filename)
+        )
         self.git = GitHelper()
 
         self._client: Optional[DatadogClient] = None  # lazy attribute
+        self._factories: Optional[Dict[str, DashboardFactory]] = None  # lazy
+        self._factories_build_eagerly = False
 
         self._current_user_identity: Optional[UserIdentity] = None
         self._current_user_identity_detect_failed: bool = False
+        self._current_user_identity_lock = threading.Lock()
+
+    def __enter__(self) -> "DashboardManager":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
 
     @property
     def client(self) -> DatadogClient:
         if self._client is None:
-            self._client = DatadogClient()
-            self._client.load_credentials_from_environment()
+            client = DatadogClient(
+                instrumentation=self.instrumentation, retry_policy=self.retry_policy
+            )
+            # only keep the client once it has credentials, so that the error
+            # is raised again on the next attempt
+            client.load_credentials_from_environment()
+            self._client = client
 
         return self._client
 
+    def start_warm_up(self, *, connections: int = 1) -> Optional[threading.Thread]:
+        """
+        Prepares for talking to the API in a background thread, while we get on
+        with loading definitions or snapshots: opens `connections` connections
+        (and makes sure the pool can hold that many) and detects the current
+        user identity, which we need for every dashboard we publish.
+
+        Returns None if there are no credentials. The error is reported when
+        the client is first used for real.
+        """
+
+        try:
+            client = self.client
+        except AbstractCrudError:
+            return None
+
+        client.resize_pool(connections)
+
+        def warm_up() -> None:
+            client.warm_up(connections=connections)
+            self.current_user_identity
+
+        thread = threading.Thread(target=warm_up, name="ddog-warm-up", daemon=True)
+        thread.start()
+        return thread
+
     @property
     def current_user_identity(self) -> Optional[UserIdentity]:
-        if (
-            self._current_user_identity is None
-            and not self._current_user_identity_detect_failed
-        ):
-            # Be defensive here with a try/except. Detecting the user identity
-            # is a nicety and should not cause an uncaught exception if it
-            # fails.
-            try:
-                self._current_user_identity = self.client.detect_current_user_identity()
-                if self._current_user_identity is None:
+        # the identity may be detected in the background by start_warm_up
+        with self._current_user_identity_lock:
+            if (
+                self._current_user_identity is None
+                and not self._current_user_identity_detect_failed
+            ):
+                # Be defensive here with a try/except. Detecting the user
+                # identity is a nicety and should not cause an uncaught
+                # exception if it fails.
+                try:
+                    identity = self.client.detect_current_user_identity()
+                    self._current_user_identity = identity
+                    if self._current_user_identity is None:
+                        self._current_user_identity_detect_failed = True
+
+                except Exception:
                     self._current_user_identity_detect_failed = True
 
-            except Exception:
-                self._current_user_identity_detect_failed = True
-
         return self._current_user_identity
 
     def load_definitions_module(self) -> ModuleType:
@@ -80,7 +169,6 @@ class DashboardManager:
             sys.path.append(self.proj_path)
 
         import_path = self._defs_import_path
-        load_func = "get_dashboards"
 
         # import the module
         try:
@@ -92,43 +180,204 @@ class DashboardManager:
             )
             raise DashboardDefinitionsImportError(errors=[error])
 
-        # probe for get_dashboards()
-        get_dashboards = getattr(dashes_module, load_func, None)
-        if get_dashboards is None or not callable(get_dashboards):
-            error = (
-                f"Definitions module {self._defs_import_path!r} "
-                f"does not contain {load_func!r} function"
-            )
-            raise DashboardDefinitionsLoadError(errors=[error])
+        # probe for get_dashboard_factories() or get_dashboards()
+        for func_name in (self._defs_factories_func, self._defs_load_func):
+            func = getattr(dashes_module, func_name, None)
+            if func is not None and callable(func):
+                return dashes_module
+
+        error = (
+            f"Definitions module {import_path!r} does not contain "
+            f"{self._defs_factories_func!r} or {self._defs_load_func!r} function"
+        )
+        raise DashboardDefinitionsLoadError(errors=[error])
 
-        # try calling get_dashboards
-        dashes = get_dashboards()
+    def _load_factories_from_module(
+        self, module: ModuleType
+    ) -> Dict[str, DashboardFactory]:
+        func_name = self._defs_factories_func
+        factories: Dict[str, DashboardFactory] = getattr(module, func_name)()
+
+        errors: List[str] = []
+        if not isinstance(factories, dict):
+            error = f"{func_name!r} did not return a dict of title -> factory"
+            errors.append(error)
+
+        else:
+            for title, factory in factories.items():
+                if not isinstance(title, str):
+                    error = f"key returned was not a title: {title!r}"
+                    errors.append(error)
+                if not callable(factory):
+                    error = f"factory for {title!r} is not callable: {factory!r}"
+                    errors.append(error)
+
+        if errors:
+            raise DashboardDefinitionsLoadError(errors=errors)
+
+        return factories
+
+    def _load_factories_from_dashboards(
+        self, module: ModuleType
+    ) -> Dict[str, DashboardFactory]:
+        # legacy protocol: every dashboard is built up front
+        func_name = self._defs_load_func
+        dashes = getattr(module, func_name)()
 
         errors = []
         if not isinstance(dashes, list):
-            error = f"{load_func!r} did not return a list of Dashboard instances"
+            error = f"{func_name!r} did not return a list of Dashboard instances"
             errors.append(error)
 
         if not errors:
+            first_idx_by_title: Dict[str, int] = {}
             for idx, dash in enumerate(dashes):
                 if not isinstance(dash, Dashboard):
                     error = f"{idx}th value returned was not a Dashboard: {dash!r}"
                     errors.append(error)
+                    continue
+
+                first_idx = first_idx_by_title.setdefault(dash.title, idx)
+                if first_idx != idx:
+                    error = (
+                        f"{first_idx}th and {idx}th values returned have the "
+                        f"same title: {dash.title!r}"
+                    )
+                    errors.append(error)
 
         if errors:
+            raise DashboardDefinitionsLoadError(errors=errors)
+
+        def make_factory(dash: Dashboard) -> DashboardFactory:
+            return lambda: dash
+
+        return {dash.title: make_factory(dash) for dash in dashes}
+
+    def load_definition_factories(self) -> Dict[str, DashboardFactory]:
+        """
+        Returns a factory for every dashboard definition in the project, keyed
+        by title. Calling a factory builds the dashboard.
+
+        If the definitions module provides `get_dashboard_factories` nothing is
+        built at this point. Otherwise we fall back on `get_dashboards`, which
+        builds all the dashboards at once.
+        """
+
+        if self._factories is None:
+            module = self.load_definitions_module()
+
+            if callable(getattr(module, self._defs_factories_func, None)):
+                self._factories = self._load_factories_from_module(module)
+            else:
+                self._factories = self._load_factories_from_dashboards(module)
+                self._factories_build_eagerly = True
+
+        return self._factories
+
+    def load_definition_titles(self) -> List[str]:
+        return list(self.load_definition_factories().keys())
+
+    def match_definition_titles(self, title_pat: Optional[str] = None) -> List[str]:
+        titles = self.load_definition_titles()
+
+        if title_pat is None:
+            return titles
+
+        return [title for title in titles if fnmatch.fnmatch(title, title_pat)]
+
+    def build_definition(self, title: str) -> Dashboard:
+        factory = self.load_definition_factories()[title]
+        dash = factory()
+
+        if not isinstance(dash, Dashboard):
+            error = f"factory for {title!r} did not return a Dashboard: {dash!r}"
             raise DashboardDefinitionsLoadError(errors=[error])
 
-        return dashes_module
+        if dash.title != title:
+            error = (
+                f"factory for {title!r} returned a dashboard "
+                f"with a different title: {dash.title!r}"
+            )
+            raise DashboardDefinitionsLoadError(errors=[error])
+
+        return dash
+
+    def load_definitions(self, title_pat: Optional[str] = None) -> List[Dashboard]:
+        """
+        Builds the dashboard definitions whose titles match `title_pat` (matched
+        like a wildcard), or all of them if no pattern is given.
+        """
+
+        titles = self.match_definition_titles(title_pat)
+        return [self.build_definition(title) for title in titles]
+
+    def render_definition(self, title: str) -> RenderedDefinition:
+        dash = self.build_definition(title)
+        dct = dash.as_dict()
+        stats = collect_stats(dash, dct=dct)
+        return RenderedDefinition(title=title, dct=dct, stats=stats.as_dict())
+
+    def render_definitions(
+        self, title_pat: Optional[str] = None, jobs: int = 1
+    ) -> List[RenderedDefinition]:
+        """
+        Builds and renders the dashboard definitions whose titles match
+        `title_pat`, or all of them if no pattern is given.
+
+        With `jobs` > 1 the work is spread across a pool of worker processes,
+        each of which imports the definitions module itself. (`jobs` = 0 means
+        one process per CPU core.) This only pays off when the definitions
+        module provides `get_dashboard_factories`, because with
+        `get_dashboards` every dashboard is built up front anyway.
+        """
+
+        with measure_phase(self.instrumentation, "render"):
+            return self._render_definitions(title_pat=title_pat, jobs=jobs)
+
+    def _render_definitions(
+        self, title_pat: Optional[str], jobs: int
+    ) -> List[RenderedDefinition]:
+        titles = self.match_definition_titles(title_pat)
+        jobs = jobs or os.cpu_count() or 1
+
+        if jobs == 1 or len(titles) < 2 or self._factories_build_eagerly:
+            return [self.render_definition(title) for title in titles]
+
+        # Use more chunks than workers so that one slow chunk does not hold up
+        # the whole pool, but not so many that we pay too much overhead
+        # transferring them.
+        num_chunks = min(len(titles), jobs * 4)
+        chunks = [titles[idx::num_chunks] for idx in range(num_chunks)]
+
+        rendered: Dict[str, RenderedDefinition] = {}
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                render_definitions_in_worker, [self.proj_path] * num_chunks, chunks
+            )
+            for result in results:
+                for defn in result:
+                    rendered[defn.title] = defn
+
+        # return them in the same order as they were defined
+        return [rendered[title] for title in titles]
+
+    def load_cached_definition_entries(self) -> Optional[JsonDict]:
+        """
+        Returns whatever was cached about the definitions the last time they
+        were built, provided the definitions have not changed since.
+        """
 
-    def load_definitions(self) -> List[Dashboard]:
-        module = self.load_definitions_module()
-        dashes: List[Dashboard] = module.get_dashboards()  # type: ignore
-        return dashes
+        # the cache is validated against the project modules that are imported
+        self.load_definitions_module()
+        return self.definitions_cache.get()
+
+    def save_cached_definition_entries(self, entries: JsonDict) -> None:
+        self.definitions_cache.put(entries)
 
     def get_draft_title(self, dashboard: Dashboard) -> str:
         return f"[draft] {dashboard.title}"
 
-    def insert_libddog_metadata_footer(self, dashboard: Dashboard) -> None:
+    def get_libddog_metadata_footer(self) -> str:
         user_identity = self.current_user_identity
         opt_project_phrase = ""
         opt_branch_phrase = ""
@@ -172,10 +421,22 @@ class DashboardManager:
             f"using {self._libddog_proj_name} v{self._libddog_proj_version}."
         )
 
+        return content
+
+    def insert_libddog_metadata_footer(self, dashboard: Dashboard) -> None:
+        content = self.get_libddog_metadata_footer()
+
         desc = dashboard.desc or ""
         if content not in desc:
             dashboard.desc = f"{desc}{content}"
 
+    def insert_libddog_metadata_footer_into_dict(self, dct: JsonDict) -> None:
+        content = self.get_libddog_metadata_footer()
+
+        desc = dct.get("description") or ""
+        if content not in desc:
+            dct["description"] = f"{desc}{content}"
+
     def ensure_snapshot_path_exists(self) -> None:
         if not os.path.exists(self.snapshots_path):
             os.makedirs(self.snapshots_path)
@@ -199,11 +460,214 @@ class DashboardManager:
 
         return fp
 
+    def find_snapshots_since(self, since: datetime) -> List[Snapshot]:
+        return find_snapshots_since(self.snapshots_path, since)
+
+    def get_search_index(self) -> SearchIndex:
+        "Returns the index of our snapshots. Call `update_search_index` first."
+
+        return SearchIndex(self.cache_path / Path(self._search_index_filename))
+
+    def update_search_index(self, index: SearchIndex) -> IndexUpdate:
+        return index.update(self.snapshots_path)
+
+    def plan_restore(self, snapshots: Sequence[Snapshot]) -> List[RestoreAction]:
+        """
+        Decides how to restore each snapshot, based on the dashboards that exist
+        in Datadog right now, and detects conflicts between dashboard titles.
+        """
+
+        live_dcts = self.list_dashboards()
+        live_ids = {dct["id"] for dct in live_dcts}
+        live_ids_by_title: Dict[str, List[str]] = {}
+        for dct in live_dcts:
+            live_ids_by_title.setdefault(dct.get("title") or "", []).append(dct["id"])
+
+        actions = []
+        seen_ids: Dict[str, Snapshot] = {}
+        seen_titles: Dict[str, Snapshot] = {}
+
+        for snapshot in snapshots:
+            kind = RestoreKind.UPDATE if snapshot.id in live_ids else RestoreKind.CREATE
+            conflict = None
+
+            other_ids = [
+                id
+                for id in live_ids_by_title.get(snapshot.title, [])
+                if id != snapshot.id
+            ]
+
+            if snapshot.id in seen_ids:
+                other = seen_ids[snapshot.id]
+                conflict = f"dashboard is also restored from {other.filepath.name}"
+            elif snapshot.title in seen_titles:
+                other = seen_titles[snapshot.title]
+                conflict = f"title is also restored from {other.filepath.name}"
+            elif other_ids:
+                ids_fmt = ", ".join([f"{id!r}" for id in other_ids])
+                conflict = f"title is already used by live dashboard(s): {ids_fmt}"
+
+            seen_ids.setdefault(snapshot.id, snapshot)
+            seen_titles.setdefault(snapshot.title, snapshot)
+
+            action = RestoreAction(snapshot=snapshot, kind=kind, conflict=conflict)
+            actions.append(action)
+
+        return actions
+
+    def restore_snapshot(self, action: RestoreAction) -> str:
+        """
+        Restores the snapshot and returns the id of the dashboard. A dashboard
+        that is updated is snapshotted first, so that the restore can itself be
+        undone.
+        """
+
+        dct = action.snapshot.get_restorable_dict()
+
+        if action.kind is RestoreKind.UPDATE:
+            id = action.snapshot.id
+            self.create_snapshot(id)
+            self.client.update_dashboard_from_dict(dct, id=id)
+            return id
+
+        return self.create_dashboard_idempotently(dct)
+
+    def restore_snapshots(
+        self, actions: Sequence[RestoreAction], jobs: int = 4
+    ) -> Iterator[RestoreResult]:
+        """
+        Restores snapshots using `jobs` concurrent requests, yielding the result
+        of each one as soon as it completes.
+        """
+
+        # make sure the client is initialized before the threads share it
+        self.client.resize_pool(jobs)
+
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            futures = {
+                executor.submit(self.restore_snapshot, action): action
+                for action in actions
+            }
+
+            for future in as_completed(futures):
+                action = futures[future]
+                try:
+                    id = future.result()
+                    yield RestoreResult(action=action, id=id)
+                except AbstractCrudError as exc:
+                    yield RestoreResult(action=action, error=exc)
+
     # Dashboard actions
 
     def create_dashboard(self, dashboard: Dashboard) -> str:
         self.insert_libddog_metadata_footer(dashboard)
-        return self.client.create_dashboard(dashboard=dashboard)
+
+        with measure_phase(self.instrumentation, "render"):
+            dct = dashboard.as_dict()
+
+        return self.create_dashboard_idempotently(dct)
+
+    def create_dashboard_from_dict(self, dct: JsonDict) -> str:
+        dct = dict(dct)
+        self.insert_libddog_metadata_footer_into_dict(dct)
+        return self.create_dashboard_idempotently(dct)
+
+    def create_dashboard_idempotently(self, dct: JsonDict) -> str:
+        """
+        Creates a dashboard, retrying if the request fails in a way that leaves
+        us not knowing whether the dashboard was created (a timeout, a dropped
+        connection or a 5xx response).
+
+        Before sending, a marker unique to this call is added to the
+        description. After an ambiguous failure we look for a live dashboard
+        with the marker and only send the request again if there isn't one, so
+        that retrying never creates duplicates. Once the dashboard is created
+        the marker is removed again, which costs an update per create. When
+        the retry policy allows a single attempt there is nothing to
+        deduplicate, so no marker is added.
+        """
+
+        if self.retry_policy.max_attempts <= 1:
+            return self.client.create_dashboard_from_dict(dct)
+
+        marker = self._create_marker_fmt % uuid.uuid4().hex
+        desc = dct.get("description") or ""
+        marked_dct = dict(dct, description=f"{desc}\n\n{marker}".lstrip())
+
+        id = self._create_dashboard_with_marker(marked_dct, marker)
+        self.remove_create_marker(dct, id=id)
+
+        return id
+
+    def remove_create_marker(self, dct: JsonDict, id: str) -> None:
+        """
+        Restores the description of a dashboard we created before the marker
+        was added. The dashboard exists either way, so failing to do this is
+        only worth a warning. The time it takes is reported as a phase of its
+        own, so that the extra update shows up in the timings.
+        """
+
+        try:
+            with measure_phase(self.instrumentation, "remove create marker"):
+                self.client.update_dashboard_from_dict(dct, id=id)
+        except AbstractCrudError as exc:
+            self.client.logger.warning(
+                f"Failed to remove the create marker from dashboard {id!r}: {exc}"
+            )
+
+    def _create_dashboard_with_marker(self, dct: JsonDict, marker: str) -> str:
+        policy = self.retry_policy
+        deadline = time.monotonic() + policy.deadline_s
+        wait_secs: Optional[float] = None
+
+        attempt_no = 1
+        while True:
+            try:
+                return self.client.create_dashboard_from_dict(dct)
+
+            except DashboardCreateFailed as exc:
+                status = exc.http_status_code
+                if status is not None and status < 500:
+                    raise
+
+                try:
+                    existing = self.find_dashboard_with_marker(marker)
+                except AbstractCrudError:
+                    # we still don't know, so report the original failure
+                    raise exc
+
+                if existing is not None:
+                    id = existing["id"]
+                    assert isinstance(id, str)  # help mypy
+                    return id
+
+                wait_secs = policy.get_backoff(wait_secs)
+                if (
+                    attempt_no >= policy.max_attempts
+                    or time.monotonic() + wait_secs >= deadline
+                ):
+                    raise
+
+            # the client logs its own retries, so we log ours the same way
+            self.client.logger.warning(
+                f"Creating dashboard {dct.get('title')!r} failed and it was not "
+                f"created, retrying in {wait_secs:.2f} seconds"
+            )
+            time.sleep(wait_secs)
+            attempt_no += 1
+
+    def find_dashboard_with_marker(self, marker: str) -> Optional[JsonDict]:
+        """
+        Looks for the marker in the descriptions of the live dashboards. Every
+        create uses a new marker, so we list the dashboards afresh: a listing
+        taken before the create was sent cannot contain it.
+        """
+
+        for dashboard_dict in self.client.iter_dashboards():
+            if marker in (dashboard_dict.get("description") or ""):
+                return dashboard_dict
+
+        return None
 
     def delete_dashboard(self, *, id: str) -> None:
         self.client.delete_dashboard(id=id)
@@ -218,11 +682,46 @@ class DashboardManager:
         self.insert_libddog_metadata_footer(dashboard)
         self.client.update_dashboard(dashboard=dashboard, id=id)
 
-    def find_first_dashboard_with_title(self, title: str) -> Optional[JsonDict]:
-        dashboard_dicts = self.list_dashboards()
+    def update_dashboard_from_dict(self, dct: JsonDict, id: str) -> None:
+        dct = dict(dct)
+        self.insert_libddog_metadata_footer_into_dict(dct)
+        self.client.update_dashboard_from_dict(dct, id=id)
+
+    def index_live_dashboards_by_title(self) -> Dict[str, JsonDict]:
+        """
+        Lists the live dashboards once and maps each title to the first
+        dashboard with that title, like find_first_dashboard_with_title does.
+        """
+
+        index: Dict[str, JsonDict] = {}
+        for dashboard_dict in self.list_dashboards():
+            title = dashboard_dict.get("title")
+            if isinstance(title, str):
+                index.setdefault(title, dashboard_dict)
 
-        for dashboard_dict in dashboard_dicts:
+        return index
+
+    def find_first_dashboard_with_title(self, title: str) -> Optional[JsonDict]:
+        # stops listing at the first page containing the title
+        for dashboard_dict in self.client.iter_dashboards():
             if title == dashboard_dict.get("title"):
                 return dashboard_dict
 
         return None
+
+
+# The manager used by a worker process in `render_definitions`. It lives as
+# long as the process does, so that the definitions module is only imported
+# once per worker.
+_worker_manager: Optional[DashboardManager] = None
+
+
+def render_definitions_in_worker(
+    proj_path: str, titles: List[str]
+) -> List[RenderedDefinition]:
+    global _worker_manager
+
+    if _worker_manager is None or _worker_manager.proj_path != proj_path:
+        _worker_manager = DashboardManager(proj_path)
+
+    return [_worker_manager.render_definition(title) for title in titles]
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import libddog
+from libddog.common.types import JsonDict
+
+
+def get_project_module_paths(proj_path: str) -> List[str]:
+    """
+    Returns the file paths of all the modules currently imported from inside
+    `proj_path`, ie. the definitions module and everything it imported from the
+    project.
+    """
+
+    prefix = os.path.join(os.path.abspath(proj_path), "")
+
+    paths = set()
+    for module in list(sys.modules.values()):
+        filepath = getattr(module, "__file__", None)
+        if not filepath:
+            continue
+
+        filepath = os.path.abspath(filepath)
+        if not filepath.startswith(prefix):
+            continue
+
+        # skip installed packages, eg. a virtualenv in .ve/ inside the project
+        parts = Path(filepath[len(prefix) :]).parts
+        if any(part.startswith(".") or part == "site-packages" for part in parts):
+            continue
+
+        paths.add(filepath)
+
+    return sorted(paths)
+
+
+def hash_file(filepath: str) -> Optional[str]:
+    try:
+        with open(filepath, "rb") as fl:
+            return hashlib.sha256(fl.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def get_libddog_digest() -> str:
+    """
+    Returns a content hash of the libddog sources, so that changing libddog
+    itself (eg. in a development checkout) is noticed even if its version
+    stays the same.
+    """
+
+    package_root = Path(libddog.__file__).parent
+
+    hasher = hashlib.sha256(libddog.__version__.encode())
+    for filepath in sorted(package_root.rglob("*")):
+        if filepath.suffix in (".py", ".txt") and filepath.is_file():
+            hasher.update(filepath.relative_to(package_root).as_posix().encode())
+            hasher.update(filepath.read_bytes())
+
+    return hasher.hexdigest()
+
+
+class RenderedDefinition:
+    """
+    The result of building and rendering a dashboard definition: the JSON
+    document to send to Datadog and statistics describing its contents.
+
+    Unlike a Dashboard, which can contain arbitrary user objects, this is made
+    of plain data only, so that it's cheap to pass between processes.
+    """
+
+    def __init__(self, *, title: str, dct: JsonDict, stats: JsonDict) -> None:
+        self.title = title
+        self.dct = dct
+        self.stats = stats
+
+
+class DefinitionsCache:
+    """
+    A small on-disk cache of facts about dashboard definitions (like how many
+    widgets each one has) so that they don't have to be rebuilt just to be
+    listed.
+
+    Along with the entries we record a content hash of every project module that
+    was imported while computing them, and of libddog itself. The entries are
+    only returned if none of those have changed and no new project modules have
+    been imported since. Data files and environment variables read by the
+    definitions are not tracked.
+    """
+
+    _format_version = 3
+
+    def __init__(self, proj_path: str, filepath: Path) -> None:
+        self.proj_path = proj_path
+        self.filepath = filepath
+
+    def compute_module_hashes(self) -> Dict[str, Optional[str]]:
+        hashes = {}
+        for filepath in get_project_module_paths(self.proj_path):
+            relpath = os.path.relpath(filepath, self.proj_path)
+            hashes[relpath] = hash_file(filepath)
+
+        return hashes
+
+    def is_fresh(self, module_hashes: Dict[str, str]) -> bool:
+        current_relpaths = {
+            os.path.relpath(filepath, self.proj_path)
+            for filepath in get_project_module_paths(self.proj_path)
+        }
+
+        # a module was imported that the cached entries did not depend on
+        if not current_relpaths.issubset(module_hashes.keys()):
+            return False
+
+        for relpath, digest in module_hashes.items():
+            filepath = os.path.join(self.proj_path, relpath)
+            if hash_file(filepath) != digest:
+                return False
+
+        return True
+
+    def get(self) -> Optional[JsonDict]:
+        try:
+            with open(self.filepath, "r") as fl:
+                content: Any = json.load(fl)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if not isinstance(content, dict):
+            return None
+
+        if content.get("format_version") != self._format_version:
+            return None
+
+        if content.get("libddog_digest") != get_libddog_digest():
+            return None
+
+        module_hashes = content.get("modules")
+        entries = content.get("entries")
+        if not isinstance(module_hashes, dict) or not isinstance(entries, dict):
+            return None
+
+        if not self.is_fresh(module_hashes):
+            return None
+
+        return entries
+
+    def put(self, entries: JsonDict) -> None:
+        content = {
+            "format_version": self._format_version,
+            "libddog_digest": get_libddog_digest(),
+            "modules": self.compute_module_hashes(),
+            "entries": entries,
+        }
+
+        os.makedirs(self.filepath.parent, exist_ok=True)
+
+        # write to a temp file first so that a concurrent reader never sees a
+        # partially written cache
+        tmp_filepath = self.filepath.with_suffix(".tmp")
+        with open(tmp_filepath, "w") as fl:
+            json.dump(content, fl, indent=2, sort_keys=True)
+            fl.write("\n")
+
+        os.replace(tmp_filepath, self.filepath)
@@ -1,4 +1,5 @@
-from typing import List, Optional
+import functools
+from typing import Any, List, Optional, Tuple
 
 
 class AbstractCrudError(Exception):
@@ -22,6 +23,15 @@ class AbstractCrudError(Exception):
         self.errors = errors or []
         self.http_status_code = http_status_code
 
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Our constructor takes keyword arguments only, which the default
+        # pickling of exceptions does not support. We need pickling to work for
+        # exceptions raised in worker processes to reach the parent.
+        ctor = functools.partial(
+            self.__class__, errors=self.errors, http_status_code=self.http_status_code
+        )
+        return (ctor, ())
+
     def __repr__(self) -> str:
         return (
             f"{self.__class__.__name__}("
@@ -49,6 +59,10 @@ class AbstractCrudError(Exception):
         return f"{prefix}:\n{block}\n"
 
 
+class ApiKeyValidateFailed(AbstractCrudError):
+    pass
+
+
 class AppKeyGetFailed(AbstractCrudError):
     pass
 
@@ -85,6 +99,10 @@ class DashboardDefinitionsLoadError(AbstractCrudError):
     pass
 
 
+class SnapshotLoadError(AbstractCrudError):
+    pass
+
+
 class MissingDatadogApiKey(AbstractCrudError):
     pass
 
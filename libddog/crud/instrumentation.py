@@ -0,0 +1,276 @@
+import re
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from libddog.common.types import JsonDict
+from libddog.tools.text import format_size
+
+
+class RequestEvent:
+    """
+    Describes one call to the Datadog API, including any retries.
+
+    Timings:
+    - `encode_s`: serializing the request body to JSON
+    - `network_s`: sending requests and receiving responses, summed over all
+      attempts
+    - `server_s`: of which waiting for the response headers, as measured by
+      requests, which is mostly the latency of the API itself
+    - `sleep_s`: waiting before retrying, eg. when rate limited
+    - `elapsed_s`: all of the above
+    """
+
+    def __init__(
+        self,
+        *,
+        method: str,
+        endpoint: str,
+        status_code: Optional[int],
+        attempts: int,
+        sleeps: int,
+        bytes_sent: int,
+        bytes_received: int,
+        encode_s: float,
+        network_s: float,
+        server_s: float,
+        sleep_s: float,
+        elapsed_s: float,
+        status_codes: List[Optional[int]],
+    ) -> None:
+        self.method = method
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.attempts = attempts
+        self.sleeps = sleeps
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.encode_s = encode_s
+        self.network_s = network_s
+        self.server_s = server_s
+        self.sleep_s = sleep_s
+        self.elapsed_s = elapsed_s
+        self.status_codes = status_codes
+
+    @property
+    def retries(self) -> int:
+        return self.attempts - 1
+
+    def as_dict(self) -> JsonDict:
+        return {
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "status_code": self.status_code,
+            "status_codes": self.status_codes,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "sleeps": self.sleeps,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "encode_s": self.encode_s,
+            "network_s": self.network_s,
+            "server_s": self.server_s,
+            "sleep_s": self.sleep_s,
+            "elapsed_s": self.elapsed_s,
+        }
+
+
+class ClientInstrumentation:
+    """
+    Receives measurements from a DatadogClient. Subclass it and override the
+    hooks you're interested in, then pass an instance to the client (or to the
+    DashboardManager, which passes it on).
+
+    Hooks may be called from multiple threads at once.
+    """
+
+    def request_completed(self, event: RequestEvent) -> None:
+        pass
+
+    def phase_completed(self, name: str, elapsed_s: float) -> None:
+        "Called for work done outside of requests, eg. rendering definitions."
+        pass
+
+
+@contextmanager
+def measure_phase(
+    instrumentation: Optional[ClientInstrumentation], name: str
+) -> Iterator[None]:
+    if instrumentation is None:
+        yield
+        return
+
+    time_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation.phase_completed(name, time.perf_counter() - time_start)
+
+
+_rx_url_id = re.compile("/(dashboard|application_keys)/[^/?]+")
+
+
+def get_endpoint_name(path: str) -> str:
+    "/v1/dashboard/abc-def-ghi -> /v1/dashboard/{id}"
+
+    return _rx_url_id.sub(r"/\1/{id}", path)
+
+
+class EndpointTimings:
+    "The aggregate of all the requests to one endpoint with one method."
+
+    def __init__(self, *, method: str, endpoint: str) -> None:
+        self.method = method
+        self.endpoint = endpoint
+        self.events: List[RequestEvent] = []
+
+    def as_dict(self) -> JsonDict:
+        elapsed = [event.elapsed_s for event in self.events]
+
+        status_codes: Dict[str, int] = {}
+        for event in self.events:
+            key = str(event.status_code)
+            status_codes[key] = status_codes.get(key, 0) + 1
+
+        return {
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "calls": len(self.events),
+            "errors": sum(1 for e in self.events if not _is_success(e.status_code)),
+            "retries": sum(event.retries for event in self.events),
+            "sleeps": sum(event.sleeps for event in self.events),
+            "bytes_sent": sum(event.bytes_sent for event in self.events),
+            "bytes_received": sum(event.bytes_received for event in self.events),
+            "encode_s": sum(event.encode_s for event in self.events),
+            "network_s": sum(event.network_s for event in self.events),
+            "server_s": sum(event.server_s for event in self.events),
+            "sleep_s": sum(event.sleep_s for event in self.events),
+            "elapsed_s": sum(elapsed),
+            "median_s": statistics.median(elapsed),
+            "max_s": max(elapsed),
+            "status_codes": status_codes,
+        }
+
+
+def _is_success(status_code: Optional[int]) -> bool:
+    return status_code is not None and 200 <= status_code < 300
+
+
+class TimingCollector(ClientInstrumentation):
+    """
+    Collects every request and phase so that they can be summarized per
+    endpoint once we're done.
+    """
+
+    def __init__(self) -> None:
+        self.events: List[RequestEvent] = []
+        self.phases: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def request_completed(self, event: RequestEvent) -> None:
+        with self.lock:
+            self.events.append(event)
+
+    def phase_completed(self, name: str, elapsed_s: float) -> None:
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed_s
+
+    def get_endpoint_timings(self) -> List[EndpointTimings]:
+        by_key: Dict[Tuple[str, str], EndpointTimings] = {}
+
+        with self.lock:
+            events = list(self.events)
+
+        for event in events:
+            key = (event.endpoint, event.method)
+            if key not in by_key:
+                by_key[key] = EndpointTimings(
+                    method=event.method, endpoint=event.endpoint
+                )
+            by_key[key].events.append(event)
+
+        return [by_key[key] for key in sorted(by_key)]
+
+    def as_dict(self) -> JsonDict:
+        endpoints = [timings.as_dict() for timings in self.get_endpoint_timings()]
+
+        with self.lock:
+            events = [event.as_dict() for event in self.events]
+            phases = dict(self.phases)
+
+        totals = {
+            key: sum(dct[key] for dct in endpoints)
+            for key in (
+                "calls",
+                "errors",
+                "retries",
+                "sleeps",
+                "bytes_sent",
+                "bytes_received",
+                "encode_s",
+                "network_s",
+                "server_s",
+                "sleep_s",
+                "elapsed_s",
+            )
+        }
+
+        return {
+            "phases": phases,
+            "totals": totals,
+            "endpoints": endpoints,
+            "requests": events,
+        }
+
+    def format_table(self) -> List[str]:
+        dct = self.as_dict()
+
+        fmt = "%-38s  %5s  %6s  %7s  %7s  %7s  %7s  %8s  %8s  %8s  %s"
+        lines = [
+            fmt
+            % (
+                "ENDPOINT",
+                "CALLS",
+                "ERRORS",
+                "RETRIES",
+                "SENT",
+                "RECV",
+                "SLEPT",
+                "SERVER",
+                "TOTAL",
+                "MEDIAN",
+                "STATUS",
+            )
+        ]
+
+        def format_row(name: str, row: JsonDict, median: str, status: str) -> str:
+            cols = (
+                name,
+                row["calls"],
+                row["errors"],
+                row["retries"],
+                format_size(row["bytes_sent"]),
+                format_size(row["bytes_received"]),
+                "%.2fs" % row["sleep_s"],
+                "%.2fs" % row["server_s"],
+                "%.2fs" % row["elapsed_s"],
+                median,
+                status,
+            )
+            return fmt % cols
+
+        for row in dct["endpoints"]:
+            status = " ".join(
+                f"{code}x{count}" for code, count in sorted(row["status_codes"].items())
+            )
+            name = f"{row['method']} {row['endpoint']}"
+            lines.append(format_row(name, row, "%.3fs" % row["median_s"], status))
+
+        lines.append(format_row("TOTAL", dct["totals"], "", ""))
+
+        for name, elapsed_s in dct["phases"].items():
+            lines.append("%-38s  %.2fs" % (f"[{name}]", elapsed_s))
+
+        return lines
@@ -0,0 +1,255 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import libddog
+from libddog.common.types import JsonDict
+from libddog.crud.dashboards import DashboardManager
+
+# (filename, lineno, funcname) as used by pstats
+FuncKey = Tuple[str, int, str]
+
+LIBDDOG_DIR = os.path.dirname(os.path.abspath(libddog.__file__))
+
+
+class ProfileCategory:
+    """
+    A part of libddog whose cost we want to single out, eg. cloning queries.
+    Matches functions by module (relative to the libddog package) and name.
+    """
+
+    def __init__(self, *, name: str, funcs: Sequence[Tuple[str, str]]) -> None:
+        self.name = name
+        self.funcs = {
+            (os.path.join(LIBDDOG_DIR, *relpath.split("/")), funcname)
+            for relpath, funcname in funcs
+        }
+
+    def matches(self, func: FuncKey) -> bool:
+        filename, _, funcname = func
+        return (os.path.abspath(filename), funcname) in self.funcs
+
+
+CATEGORIES = [
+    ProfileCategory(name="clone", funcs=[("metrics/query.py", "clone")]),
+    ProfileCategory(
+        name="validate",
+        funcs=[
+            ("parsing/query_parser.py", "is_valid_token"),
+            ("dashboards/components.py", "validate"),
+            ("dashboards/components.py", "validate_query_names_are_distinct"),
+        ],
+    ),
+    ProfileCategory(
+        name="intern",
+        funcs=[
+            ("metrics/interning.py", "intern_node"),
+            ("metrics/interning.py", "intern_formula"),
+        ],
+    ),
+    ProfileCategory(
+        name="layout",
+        funcs=[
+            ("dashboards/layouts.py", "compute"),
+            ("dashboards/layouts.py", "get_widgets"),
+        ],
+    ),
+]
+
+
+def get_category_time(stats: pstats.Stats, category: ProfileCategory) -> float:
+    """
+    Returns the cumulative time spent in the functions of `category`. Calls
+    between functions of the category are only counted once.
+    """
+
+    funcs: Set[FuncKey] = {
+        func for func in stats.stats.keys() if category.matches(func)  # type: ignore
+    }
+
+    total = 0.0
+    for func in funcs:
+        _, _, _, _, callers = stats.stats[func]  # type: ignore
+        for caller, caller_stats in callers.items():
+            if caller not in funcs:
+                total += caller_stats[3]
+
+    return total
+
+
+class DefinitionProfile:
+    """
+    The cost of building and rendering one dashboard definition.
+
+    `alloc_peak` is the most memory in use at any point while building and
+    rendering, relative to before. On Python 3.8 it can be overstated, as
+    tracemalloc cannot reset its peak there. `alloc_libddog` and
+    `alloc_other` are the memory still held by the finished dashboard, split
+    by whether it was allocated inside libddog or elsewhere (ie. in the
+    project).
+    """
+
+    def __init__(self, *, title: str) -> None:
+        self.title = title
+        self.build_s = 0.0
+        self.render_s = 0.0
+        self.categories: Dict[str, float] = {}
+        self.alloc_peak: Optional[int] = None
+        self.alloc_libddog: Optional[int] = None
+        self.alloc_other: Optional[int] = None
+
+    @property
+    def total_s(self) -> float:
+        return self.build_s + self.render_s
+
+    def as_dict(self) -> JsonDict:
+        return {
+            "title": self.title,
+            "build_s": self.build_s,
+            "render_s": self.render_s,
+            "total_s": self.total_s,
+            "categories": self.categories,
+            "alloc_peak": self.alloc_peak,
+            "alloc_libddog": self.alloc_libddog,
+            "alloc_other": self.alloc_other,
+        }
+
+
+class DefinitionsProfileReport:
+    def __init__(
+        self,
+        *,
+        load_s: float,
+        profiles: List[DefinitionProfile],
+        stats: Optional[pstats.Stats],
+    ) -> None:
+        self.load_s = load_s
+        self.profiles = profiles
+        self.stats = stats
+
+    def get_category_totals(self) -> Dict[str, float]:
+        totals = {category.name: 0.0 for category in CATEGORIES}
+        for profile in self.profiles:
+            for name, elapsed_s in profile.categories.items():
+                totals[name] += elapsed_s
+
+        return totals
+
+    def dump_stats(self, filepath: str) -> None:
+        "Writes the combined profile in pstats format."
+
+        if self.stats is not None:
+            self.stats.dump_stats(filepath)
+
+
+class DefinitionsProfiler:
+    """
+    Builds and renders dashboard definitions one at a time under cProfile
+    (and optionally tracemalloc) to find out which ones are expensive, and
+    why.
+
+    Loading the definitions module is profiled too, because with
+    `get_dashboards` that's where every dashboard is built.
+    """
+
+    def __init__(
+        self, manager: DashboardManager, *, trace_allocations: bool = True
+    ) -> None:
+        self.manager = manager
+        self.trace_allocations = trace_allocations
+
+    def profile(self, title_pat: Optional[str] = None) -> DefinitionsProfileReport:
+        started_tracing = False
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+
+        try:
+            return self._profile(title_pat)
+
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _profile(self, title_pat: Optional[str]) -> DefinitionsProfileReport:
+        profiler = cProfile.Profile()
+        time_start = time.perf_counter()
+        profiler.enable()
+        try:
+            titles = self.manager.match_definition_titles(title_pat)
+        finally:
+            profiler.disable()
+        load_s = time.perf_counter() - time_start
+
+        combined = pstats.Stats(profiler)
+
+        profiles = []
+        for title in titles:
+            profile, profiler = self.profile_definition(title)
+            profiles.append(profile)
+            combined.add(profiler)
+
+        return DefinitionsProfileReport(
+            load_s=load_s, profiles=profiles, stats=combined
+        )
+
+    def profile_definition(
+        self, title: str
+    ) -> Tuple[DefinitionProfile, cProfile.Profile]:
+        profile = DefinitionProfile(title=title)
+        profiler = cProfile.Profile()
+
+        snapshot_before = None
+        if tracemalloc.is_tracing():
+            snapshot_before = tracemalloc.take_snapshot()
+            # reset_peak is new in Python 3.9, before that the peak is the
+            # highest since tracing started and may belong to an earlier
+            # definition
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        traced_before, _ = tracemalloc.get_traced_memory()
+
+        profiler.enable()
+        try:
+            time_start = time.perf_counter()
+            dash = self.manager.build_definition(title)
+            time_built = time.perf_counter()
+            dash.as_dict()
+            time_rendered = time.perf_counter()
+        finally:
+            profiler.disable()
+
+        profile.build_s = time_built - time_start
+        profile.render_s = time_rendered - time_built
+
+        if snapshot_before is not None:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            profile.alloc_peak = max(traced_peak - traced_before, 0)
+            self.attribute_allocations(profile, snapshot_before)
+
+        stats = pstats.Stats(profiler)
+        for category in CATEGORIES:
+            profile.categories[category.name] = get_category_time(stats, category)
+
+        return profile, profiler
+
+    def attribute_allocations(
+        self, profile: DefinitionProfile, snapshot_before: tracemalloc.Snapshot
+    ) -> None:
+        snapshot_after = tracemalloc.take_snapshot()
+        prefix = os.path.join(LIBDDOG_DIR, "")
+
+        profile.alloc_libddog = profile.alloc_other = 0
+        for diff in snapshot_after.compare_to(snapshot_before, "filename"):
+            filename = diff.traceback[0].filename
+            # the snapshots themselves are allocated by tracemalloc
+            if filename == tracemalloc.__file__:
+                continue
+
+            if os.path.abspath(filename).startswith(prefix):
+                profile.alloc_libddog += diff.size_diff
+            else:
+                profile.alloc_other += diff.size_diff
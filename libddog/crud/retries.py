@@ -0,0 +1,103 @@
+import random
+import threading
+from typing import Optional, Sequence, Tuple
+
+import requests
+
+
+class RetryPolicy:
+    """
+    Decides whether a request to the Datadog API that failed should be retried
+    and how long to wait before doing so.
+
+    Only requests that are safe to repeat are retried after a failure that
+    leaves us not knowing whether the request took effect (a 5xx response, a
+    dropped connection, a read timeout). GET, PUT and DELETE are idempotent,
+    POST is not, unless the caller deduplicates it. Every request is retried
+    after a 429, because a rate limited request was rejected outright, and
+    after failing to connect, because then it was never sent.
+
+    Waits use "decorrelated jitter": each wait is random between the base wait
+    and three times the previous wait, capped at `backoff_max_s`. This spreads
+    out concurrent clients retrying at the same time better than exponential
+    backoff does.
+
+    All the attempts for one request must complete within `deadline_s`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 5,
+        connect_timeout_s: float = 5.0,
+        read_timeout_s: float = 60.0,
+        deadline_s: float = 300.0,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 30.0,
+        retry_status_codes: Sequence[int] = (429, 502, 503, 504),
+        idempotent_methods: Sequence[str] = ("GET", "PUT", "DELETE"),
+        seed: Optional[int] = None,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        self.deadline_s = deadline_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.retry_status_codes = frozenset(retry_status_codes)
+        self.idempotent_methods = frozenset(idempotent_methods)
+
+        # clients share a policy between threads
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def get_timeout(self, remaining_s: float) -> Tuple[float, float]:
+        "Returns (connect, read) timeouts that respect the deadline."
+
+        remaining_s = max(remaining_s, 0.001)
+        return (
+            min(self.connect_timeout_s, remaining_s),
+            min(self.read_timeout_s, remaining_s),
+        )
+
+    def is_idempotent(self, method: str, deduplicated: bool = False) -> bool:
+        return deduplicated or method.upper() in self.idempotent_methods
+
+    def should_retry_response(
+        self, *, method: str, status_code: int, deduplicated: bool = False
+    ) -> bool:
+        if status_code not in self.retry_status_codes:
+            return False
+
+        if status_code == 429:
+            return True
+
+        return self.is_idempotent(method, deduplicated)
+
+    def should_retry_exception(
+        self,
+        *,
+        method: str,
+        exc: requests.exceptions.RequestException,
+        deduplicated: bool = False,
+    ) -> bool:
+        # the request never reached the server
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return True
+
+        # a connection error can also mean the connection was dropped after
+        # the request was sent
+        transient = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        if isinstance(exc, transient):
+            return self.is_idempotent(method, deduplicated)
+
+        return False
+
+    def get_backoff(self, previous_s: Optional[float]) -> float:
+        previous_s = previous_s or self.backoff_base_s
+        upper = max(previous_s * 3, self.backoff_base_s)
+
+        with self._random_lock:
+            wait_s = self._random.uniform(self.backoff_base_s, upper)
+
+        return min(wait_s, self.backoff_max_s)
@@ -0,0 +1,384 @@
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from parsimonious.exceptions import IncompleteParseError, ParseError
+
+from libddog.crud.errors import SnapshotLoadError
+from libddog.crud.snapshots import Snapshot
+from libddog.parsing.extract_queries import get_queries, get_query_terms
+from libddog.parsing.extract_tmpl_vars import get_template_vars
+from libddog.parsing.parse_fetched import get_parser_digest
+from libddog.parsing.query_parser import QueryParser
+
+_logger = logging.getLogger(__name__)
+
+_schema = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE files (filename TEXT PRIMARY KEY);
+CREATE TABLE dashboards (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    taken_at TEXT NOT NULL,
+    filename TEXT NOT NULL
+);
+CREATE TABLE queries (
+    id INTEGER PRIMARY KEY,
+    dashboard_id TEXT NOT NULL,
+    widget_id TEXT,
+    widget_title TEXT,
+    query TEXT NOT NULL,
+    parsed INTEGER NOT NULL
+);
+CREATE TABLE terms (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    dashboard_id TEXT NOT NULL,
+    query_id INTEGER
+);
+CREATE INDEX queries_by_dashboard ON queries (dashboard_id);
+CREATE INDEX terms_by_name ON terms (kind, name, value);
+CREATE INDEX terms_by_dashboard ON terms (dashboard_id);
+"""
+
+# kinds of terms
+METRIC = "metric"
+TAG = "tag"
+TMPL_VAR = "tmpl_var"
+TMPL_VAR_DEF = "tmpl_var_def"
+
+
+class IndexUpdate:
+    "What updating the index did."
+
+    def __init__(self) -> None:
+        self.files_added = 0
+        self.dashboards_indexed = 0
+        self.queries_indexed = 0
+        self.queries_failed = 0
+
+
+class QueryHit:
+    def __init__(
+        self,
+        *,
+        dashboard_id: str,
+        dashboard_title: str,
+        widget_id: Optional[str],
+        widget_title: Optional[str],
+        query: str,
+    ) -> None:
+        self.dashboard_id = dashboard_id
+        self.dashboard_title = dashboard_title
+        self.widget_id = widget_id
+        self.widget_title = widget_title
+        self.query = query
+
+
+class DashboardHit:
+    """
+    A dashboard matching a search. `queries` is the number of its queries that
+    match, which can be zero if it matched by defining a template variable.
+    """
+
+    def __init__(self, *, id: str, title: str, queries: int) -> None:
+        self.id = id
+        self.title = title
+        self.queries = queries
+
+
+def split_tag(tag: str) -> Tuple[str, Optional[str]]:
+    "env:prod -> ('env', 'prod'), env -> ('env', None)"
+
+    name, sep, value = tag.partition(":")
+    return name, value if sep else None
+
+
+class SearchIndex:
+    """
+    An inverted index from metrics, tags and template variables to the
+    dashboards and queries that use them, built from a directory of snapshots
+    and stored in a SQLite file.
+
+    Only the latest snapshot of each dashboard is indexed. Updating is
+    incremental: each snapshot file is only considered once, and only parsed if
+    it is newer than the snapshot already indexed for its dashboard. A file
+    that fails to load is considered again next time, and the whole index is
+    rebuilt when the parser changes (like the manifest of `parse-fetched`), so
+    that queries which failed to parse are parsed again.
+
+    Searches match names with shell-style wildcards, eg. `aws.ec2.*`.
+    """
+
+    _format_version = "1"
+
+    def __init__(self, filepath: Path) -> None:
+        self.filepath = filepath
+        self.parser = QueryParser.get_instance()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.filepath))
+            self.ensure_schema()
+
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def ensure_schema(self) -> None:
+        conn = self.connection
+        expected = {
+            "format_version": self._format_version,
+            "parser_digest": get_parser_digest(),
+        }
+
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.OperationalError:
+            meta = {}
+
+        if meta == expected:
+            return
+
+        # the index is derived from the snapshots, so if it's missing, in an
+        # older format or was built by a different parser just start over
+        with conn:
+            tables = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()
+            for (table,) in tables:
+                conn.execute(f"DROP TABLE {table}")
+
+            conn.executescript(_schema)
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)", expected.items()
+            )
+
+    def get_indexed_dashboards(self) -> Dict[str, datetime]:
+        rows = self.connection.execute("SELECT id, taken_at FROM dashboards")
+        return {id: datetime.fromisoformat(taken_at) for id, taken_at in rows}
+
+    def update(self, snapshots_path: Path) -> IndexUpdate:
+        "Indexes the snapshots in `snapshots_path` that haven't been seen yet."
+
+        update = IndexUpdate()
+        if not snapshots_path.is_dir():
+            return update
+
+        conn = self.connection
+        seen = {filename for (filename,) in conn.execute("SELECT filename FROM files")}
+        indexed = self.get_indexed_dashboards()
+
+        new_filenames = []
+        candidates: Dict[str, List[Tuple[datetime, Path]]] = {}
+        for filepath in sorted(snapshots_path.iterdir()):
+            if filepath.name in seen:
+                continue
+
+            parsed = Snapshot.parse_filename(filepath)
+            if parsed is None:
+                continue
+
+            new_filenames.append(filepath.name)
+
+            id, taken_at = parsed
+            if id in indexed and indexed[id] >= taken_at:
+                continue
+
+            candidates.setdefault(id, []).append((taken_at, filepath))
+
+        # index the latest snapshot of each dashboard that loads, falling back
+        # to older ones
+        failed_filenames = set()
+        with conn:
+            for id in sorted(candidates):
+                for _, filepath in sorted(candidates[id], reverse=True):
+                    try:
+                        snapshot = Snapshot.load(filepath)
+                    except SnapshotLoadError as exc:
+                        _logger.warning("Not indexing snapshot: %s", exc)
+                        failed_filenames.add(filepath.name)
+                        continue
+
+                    self.index_snapshot(snapshot, update)
+                    break
+
+            new_filenames = [
+                filename
+                for filename in new_filenames
+                if filename not in failed_filenames
+            ]
+            conn.executemany(
+                "INSERT INTO files (filename) VALUES (?)",
+                [(filename,) for filename in new_filenames],
+            )
+
+        update.files_added = len(new_filenames)
+        return update
+
+    def index_snapshot(self, snapshot: Snapshot, update: IndexUpdate) -> None:
+        conn = self.connection
+        id = snapshot.id
+
+        conn.execute("DELETE FROM terms WHERE dashboard_id = ?", (id,))
+        conn.execute("DELETE FROM queries WHERE dashboard_id = ?", (id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO dashboards (id, title, taken_at, filename) "
+            "VALUES (?, ?, ?, ?)",
+            (id, snapshot.title, snapshot.taken_at.isoformat(), snapshot.filepath.name),
+        )
+
+        terms: List[Tuple[str, str, Optional[str], str, Optional[int]]] = []
+
+        for tmpl_var in get_template_vars(snapshot.dct):
+            terms.append((TMPL_VAR_DEF, tmpl_var.name, tmpl_var.tag, id, None))
+
+        for found in get_queries(dict(snapshot.dct, id=id)):
+            try:
+                query_terms = get_query_terms(found.query, self.parser)
+                parsed = True
+            except (IncompleteParseError, ParseError):
+                _logger.debug("Failed to parse query: %s", found.query)
+                query_terms = None
+                parsed = False
+
+            cursor = conn.execute(
+                "INSERT INTO queries "
+                "(dashboard_id, widget_id, widget_title, query, parsed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (id, found.id, found.title, found.query, int(parsed)),
+            )
+            query_id = cursor.lastrowid
+
+            if query_terms is None:
+                update.queries_failed += 1
+                continue
+
+            update.queries_indexed += 1
+
+            for metric in set(query_terms.metrics):
+                terms.append((METRIC, metric, None, id, query_id))
+            for tag_name, tag_value in set(query_terms.tags):
+                terms.append((TAG, tag_name, tag_value, id, query_id))
+            for tmpl_var_name in set(query_terms.tmpl_vars):
+                terms.append((TMPL_VAR, tmpl_var_name, None, id, query_id))
+
+        conn.executemany(
+            "INSERT INTO terms (kind, name, value, dashboard_id, query_id) "
+            "VALUES (?, ?, ?, ?, ?)",
+            terms,
+        )
+
+        update.dashboards_indexed += 1
+
+    def get_conditions(
+        self,
+        *,
+        metric: Optional[str] = None,
+        tag: Optional[str] = None,
+        tmpl_var: Optional[str] = None,
+    ) -> Tuple[List[str], List[Optional[str]]]:
+        "Returns SQL conditions on `queries` matching every criterion."
+
+        conds: List[str] = []
+        params: List[Optional[str]] = []
+
+        subquery = "queries.id IN (SELECT query_id FROM terms WHERE kind = ? AND %s)"
+
+        if metric is not None:
+            conds.append(subquery % "name GLOB ?")
+            params.extend((METRIC, metric))
+
+        if tag is not None:
+            tag_name, tag_value = split_tag(tag)
+            if tag_value is None:
+                conds.append(subquery % "name GLOB ?")
+                params.extend((TAG, tag_name))
+            else:
+                conds.append(subquery % "name GLOB ? AND value GLOB ?")
+                params.extend((TAG, tag_name, tag_value))
+
+        if tmpl_var is not None:
+            conds.append(subquery % "name GLOB ?")
+            params.extend((TMPL_VAR, tmpl_var.lstrip("$")))
+
+        return conds, params
+
+    def search_queries(
+        self,
+        *,
+        metric: Optional[str] = None,
+        tag: Optional[str] = None,
+        tmpl_var: Optional[str] = None,
+    ) -> List[QueryHit]:
+        "Finds the queries matching all of the criteria given."
+
+        conds, params = self.get_conditions(metric=metric, tag=tag, tmpl_var=tmpl_var)
+        if not conds:
+            return []
+
+        rows = self.connection.execute(
+            "SELECT dashboards.id, dashboards.title, "
+            "queries.widget_id, queries.widget_title, queries.query "
+            "FROM queries JOIN dashboards ON dashboards.id = queries.dashboard_id "
+            "WHERE %s ORDER BY dashboards.title, queries.id" % " AND ".join(conds),
+            params,
+        )
+
+        return [
+            QueryHit(
+                dashboard_id=dashboard_id,
+                dashboard_title=dashboard_title,
+                widget_id=widget_id,
+                widget_title=widget_title,
+                query=query,
+            )
+            for dashboard_id, dashboard_title, widget_id, widget_title, query in rows
+        ]
+
+    def search_dashboards(
+        self,
+        *,
+        metric: Optional[str] = None,
+        tag: Optional[str] = None,
+        tmpl_var: Optional[str] = None,
+    ) -> List[DashboardHit]:
+        """
+        Finds the dashboards with queries matching all of the criteria given.
+        When searching only by template variable, dashboards that define it
+        without using it match as well.
+        """
+
+        hits: Dict[str, DashboardHit] = {}
+        for query_hit in self.search_queries(metric=metric, tag=tag, tmpl_var=tmpl_var):
+            hit = hits.get(query_hit.dashboard_id)
+            if hit is None:
+                hit = DashboardHit(
+                    id=query_hit.dashboard_id,
+                    title=query_hit.dashboard_title,
+                    queries=0,
+                )
+                hits[hit.id] = hit
+            hit.queries += 1
+
+        if tmpl_var is not None and metric is None and tag is None:
+            rows = self.connection.execute(
+                "SELECT DISTINCT dashboards.id, dashboards.title FROM terms "
+                "JOIN dashboards ON dashboards.id = terms.dashboard_id "
+                "WHERE terms.kind = ? AND terms.name GLOB ?",
+                (TMPL_VAR_DEF, tmpl_var.lstrip("$")),
+            )
+            for id, title in rows:
+                if id not in hits:
+                    hits[id] = DashboardHit(id=id, title=title, queries=0)
+
+        return sorted(hits.values(), key=lambda hit: (hit.title.lower(), hit.id))
@@ -0,0 +1,168 @@
+import enum
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from libddog.common.types import JsonDict
+from libddog.crud.errors import AbstractCrudError, SnapshotLoadError
+from libddog.tools.timekeeping import parse_date
+
+
+class Snapshot:
+    """
+    A dashboard as it was returned by the Datadog API at some point in time,
+    saved to a file named `{id}--{title}--{date}.json`.
+    """
+
+    # set by Datadog, rejected or ignored when creating/updating a dashboard
+    _read_only_keys = (
+        "id",
+        "author_handle",
+        "author_name",
+        "created_at",
+        "modified_at",
+        "url",
+    )
+
+    def __init__(
+        self, *, filepath: Path, id: str, title: str, taken_at: datetime, dct: JsonDict
+    ) -> None:
+        self.filepath = filepath
+        self.id = id
+        self.title = title
+        self.taken_at = taken_at
+        self.dct = dct
+
+    @classmethod
+    def parse_filename(cls, filepath: Path) -> Optional[Tuple[str, datetime]]:
+        """
+        Returns the dashboard id and the time the snapshot was taken, or None if
+        the filename is not that of a snapshot.
+        """
+
+        if filepath.suffix != ".json":
+            return None
+
+        # the title is sanitized and cannot contain dashes, but the id and the
+        # date can contain single dashes
+        parts = filepath.stem.split("--")
+        if len(parts) < 3:
+            return None
+
+        id, date = parts[0], parts[-1]
+        try:
+            taken_at = parse_date(date)
+        except (ValueError, OverflowError):
+            return None
+
+        # a time without a timezone is local time
+        if taken_at.tzinfo is None:
+            taken_at = taken_at.astimezone()
+
+        return id, taken_at
+
+    @classmethod
+    def load(cls, filepath: Path) -> "Snapshot":
+        parsed = cls.parse_filename(filepath)
+        if parsed is None:
+            error = f"Not a snapshot filename: {str(filepath)!r}"
+            raise SnapshotLoadError(errors=[error])
+
+        try:
+            with open(filepath, "r") as fl:
+                dct: Any = json.load(fl)
+        except (OSError, ValueError) as exc:
+            error = f"Failed to read snapshot {str(filepath)!r}: {exc}"
+            raise SnapshotLoadError(errors=[error])
+
+        if not isinstance(dct, dict) or not isinstance(dct.get("title"), str):
+            error = f"Snapshot {str(filepath)!r} does not contain a dashboard"
+            raise SnapshotLoadError(errors=[error])
+
+        id, taken_at = parsed
+        return cls(
+            filepath=filepath,
+            id=dct.get("id") or id,
+            title=dct["title"],
+            taken_at=taken_at,
+            dct=dct,
+        )
+
+    def get_restorable_dict(self) -> JsonDict:
+        "Returns the dashboard without the attributes that only Datadog can set."
+
+        dct = dict(self.dct)
+        for key in self._read_only_keys:
+            dct.pop(key, None)
+
+        return dct
+
+
+def find_snapshots_since(snapshots_path: Path, since: datetime) -> List[Snapshot]:
+    """
+    Finds the earliest snapshot of every dashboard taken at or after `since`.
+    Since a snapshot is taken before every change libddog makes, restoring
+    these returns the dashboards to the state they were in at `since`.
+    """
+
+    # a time without a timezone is local time
+    if since.tzinfo is None:
+        since = since.astimezone()
+
+    earliest: Dict[str, Tuple[datetime, Path]] = {}
+
+    if snapshots_path.is_dir():
+        for filepath in snapshots_path.iterdir():
+            parsed = Snapshot.parse_filename(filepath)
+            if parsed is None:
+                continue
+
+            id, taken_at = parsed
+            if taken_at < since:
+                continue
+
+            existing = earliest.get(id)
+            if existing is None or taken_at < existing[0]:
+                earliest[id] = (taken_at, filepath)
+
+    filepaths = sorted(filepath for _, filepath in earliest.values())
+    return [Snapshot.load(filepath) for filepath in filepaths]
+
+
+class RestoreKind(enum.Enum):
+    CREATE = "create"
+    UPDATE = "update"
+
+
+class RestoreAction:
+    """
+    What restoring a snapshot will do: update the dashboard it was taken of if
+    that still exists, otherwise create a new one. If restoring would result in
+    two dashboards with the same title `conflict` explains why and the snapshot
+    should not be restored.
+    """
+
+    def __init__(
+        self,
+        *,
+        snapshot: Snapshot,
+        kind: RestoreKind,
+        conflict: Optional[str] = None,
+    ) -> None:
+        self.snapshot = snapshot
+        self.kind = kind
+        self.conflict = conflict
+
+
+class RestoreResult:
+    def __init__(
+        self,
+        *,
+        action: RestoreAction,
+        id: Optional[str] = None,
+        error: Optional[AbstractCrudError] = None,
+    ) -> None:
+        self.action = action
+        self.id = id
+        self.error = error
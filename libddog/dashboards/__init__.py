@@ -15,7 +15,7 @@ from libddog.dashboards.components import (
     Time,
     YAxis,
 )
-from libddog.dashboards.dashboards import Dashboard
+from libddog.dashboards.dashboards import Dashboard, DashboardFactory
 from libddog.dashboards.enums import (
     BackgroundColor,
     Comparator,
@@ -38,8 +38,15 @@ from libddog.dashboards.enums import (
     TitleAlign,
     VerticalAlign,
 )
-from libddog.dashboards.layouts import HLayout, HLayoutStack, HLayoutWrapping
+from libddog.dashboards.layouts import (
+    FlowLayout,
+    HLayout,
+    HLayoutStack,
+    HLayoutWrapping,
+    Placement,
+)
 from libddog.dashboards.presets import NotePreset
+from libddog.dashboards.stats import DashboardStats, DashboardVisitor, collect_stats
 from libddog.dashboards.widgets import (
     Group,
     Note,
@@ -55,7 +62,11 @@ __all__ = (
     "ConditionalFormat",
     "ConditionalFormatPalette",
     "Dashboard",
+    "DashboardFactory",
+    "DashboardStats",
+    "DashboardVisitor",
     "DisplayType",
+    "FlowLayout",
     "Formula",
     "FormulaLimit",
     "Group",
@@ -76,6 +87,7 @@ __all__ = (
     "Note",
     "NotePreset",
     "Palette",
+    "Placement",
     "PopulatedTemplateVariable",
     "Position",
     "QueryValue",
@@ -96,4 +108,5 @@ __all__ = (
     "VerticalAlign",
     "Widget",
     "YAxis",
+    "collect_stats",
 )
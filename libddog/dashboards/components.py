@@ -1,5 +1,8 @@
+import copy
+import functools
+import itertools
 import warnings
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from libddog.common.bases import Renderable
 from libddog.common.errors import (
@@ -20,9 +23,13 @@ from libddog.dashboards.enums import (
     Palette,
     Scale,
 )
+from libddog.dashboards.exceptions import TemplateVariableConflict
+from libddog.dashboards.registry import get_widget_type, get_widget_types
 from libddog.metrics.bases import FormulaNode
+from libddog.metrics.interning import intern_formula
 from libddog.metrics.query import QueryMonad
-from libddog.metrics.support import find_identifiers
+from libddog.metrics.support import find_identifier_names, rename_identifiers
+from libddog.metrics.validation import get_deferred_validator
 
 
 class Size:
@@ -34,29 +41,18 @@ class Size:
 
     @classmethod
     def get_defaults(cls) -> Dict[Any, Any]:
-        from libddog.dashboards.widgets import (
-            Group,
-            Note,
-            QueryValue,
-            Timeseries,
-            Toplist,
-        )
-
         return {
-            Group: (12, 1),
-            Note: (2, 2),
-            QueryValue: (2, 2),
-            Timeseries: (4, 2),
-            Toplist: (4, 2),
-            # add remaining widget types...
+            widget_type.widget_cls: widget_type.default_size
+            for widget_type in get_widget_types()
+            if widget_type.default_size
         }
 
     @classmethod
     def backfill(cls, obj: Any, instance: Optional["Size"]) -> "Size":
         instance = cls() if instance is None else instance
 
-        defaults = cls.get_defaults()
-        dims = defaults.get(obj.__class__)
+        widget_type = get_widget_type(obj.__class__)
+        dims = widget_type.default_size if widget_type else None
         if dims:
             width, height = dims
             if not instance.width:
@@ -219,13 +215,12 @@ class Formula(Renderable):
         alias: Optional[str] = None,
         limit: Optional[FormulaLimit] = None,
     ) -> None:
-        self.formula = formula
+        self.formula = intern_formula(formula)
         self.alias = alias
         self.limit = limit
 
     def validate(self, queries: List[QueryMonad]) -> None:
-        identifiers = find_identifiers(self.formula)
-        used = {ident.name for ident in identifiers}
+        used = find_identifier_names(self.formula)
 
         defined = {query._state.name for query in queries}
 
@@ -238,6 +233,14 @@ class Formula(Renderable):
                 % (fmt, self.formula.codegen())
             )
 
+    def with_renamed_identifiers(self, names: Dict[str, str]) -> "Formula":
+        if names.keys().isdisjoint(find_identifier_names(self.formula)):
+            return self
+
+        formula = copy.copy(self)
+        formula.formula = intern_formula(rename_identifiers(self.formula, names))
+        return formula
+
     def as_dict(self) -> JsonDict:
         dct: JsonDict = {"formula": self.formula.codegen()}
         if self.alias:
@@ -297,11 +300,24 @@ class Request(Renderable):
         # fast while constructing the object, so that the traceback points back
         # at the call site which introduces the error. We could also validate
         # later on in 'as_dict', but by then it's harder to report the error and
-        # point it back to the offending Dashboard/Widget/Request.
-        self.validate()
+        # point it back to the offending Dashboard/Widget/Request. When
+        # validation is deferred the call site is recorded for the same reason.
+        validator = get_deferred_validator()
+        if validator is not None:
+            # the request as given, before its queries are named below
+            validator.defer_call(
+                functools.partial(
+                    self.validate_queries, list(self.queries), list(self.formulas)
+                )
+            )
+        else:
+            self.validate()
+
+        self.assign_query_names()
 
-    def validate_query_names_are_distinct(self) -> None:
-        names = [query._state.name for query in self.queries]
+    @staticmethod
+    def validate_query_names_are_distinct(queries: List[QueryMonad]) -> None:
+        names = [query._state.name for query in queries]
 
         if len(names) > len(set(names)):
             fmt_names = ", ".join(f"{name!r}" for name in names)
@@ -309,12 +325,51 @@ class Request(Renderable):
                 f"not all query names in request are distinct: {fmt_names}"
             )
 
-    def validate(self) -> None:
+    @classmethod
+    def validate_queries(
+        cls, queries: List[QueryMonad], formulas: List[Formula]
+    ) -> None:
         # validate that variables used in formula correspond to query names
-        for formula in self.formulas:
-            formula.validate(self.queries)
+        for formula in formulas:
+            formula.validate(queries)
 
-        self.validate_query_names_are_distinct()
+        cls.validate_query_names_are_distinct(queries)
+
+    def validate(self) -> None:
+        self.validate_queries(self.queries, self.formulas)
+
+    def assign_query_names(self) -> None:
+        """
+        Names the queries that weren't given a name q1, q2, ... in the order
+        they appear in the request, skipping names already taken, and updates
+        the formulas to match.
+        """
+
+        taken = {
+            query._state.name for query in self.queries if not query._state.auto_named
+        }
+        candidates = (f"q{idx}" for idx in itertools.count(1))
+
+        renames: Dict[str, str] = {}
+        queries: List[QueryMonad] = []
+        for query in self.queries:
+            if query._state.auto_named:
+                name = next(name for name in candidates if name not in taken)
+                if name != query._state.name:
+                    renames[query._state.name] = name
+
+                    # a shallow copy will do: queries are cloned before changing
+                    state = copy.copy(query._state)
+                    state.name = name
+                    query = QueryMonad(state)
+
+            queries.append(query)
+
+        if renames:
+            self.queries = queries
+            self.formulas = [
+                formula.with_renamed_identifiers(renames) for formula in self.formulas
+            ]
 
     def as_dict(self) -> JsonDict:
         # if we have only queries but no formulas then synthesize a formula per query
@@ -391,3 +446,52 @@ class TemplateVariablesPreset(Renderable):
             "name": self.name,
             "template_variables": [tmp.as_dict() for tmp in self.populated_vars],
         }
+
+
+class TemplateVariableIndex:
+    """
+    The template variable definitions of a dashboard, by name.
+
+    Definitions are compared by value: adding a definition with the same name,
+    tag and default value as one already in the index does nothing, adding one
+    with the same name but a different tag or default value is an error.
+    """
+
+    def __init__(
+        self, tmpl_var_defs: Iterable[TemplateVariableDefinition] = ()
+    ) -> None:
+        self._by_name: Dict[str, TemplateVariableDefinition] = {}
+
+        for tmpl_var in tmpl_var_defs:
+            self.add(tmpl_var)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._by_name
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    @classmethod
+    def get_key(cls, tmpl_var: TemplateVariableDefinition) -> Tuple[str, str, str]:
+        return (tmpl_var.name, tmpl_var.tag, tmpl_var.default_value)
+
+    def add(self, tmpl_var: TemplateVariableDefinition) -> bool:
+        "Returns True if `tmpl_var` was not yet in the index."
+
+        existing = self._by_name.get(tmpl_var.name)
+        if existing is None:
+            self._by_name[tmpl_var.name] = tmpl_var
+            return True
+
+        if self.get_key(existing) != self.get_key(tmpl_var):
+            raise TemplateVariableConflict(
+                "Template variable %r is defined more than once: %r != %r"
+                % (tmpl_var.name, existing.as_dict(), tmpl_var.as_dict())
+            )
+
+        return False
+
+    def get_definitions(self) -> List[TemplateVariableDefinition]:
+        "Returns the definitions in the order they were added."
+
+        return list(self._by_name.values())
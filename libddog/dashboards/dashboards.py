@@ -1,9 +1,10 @@
-from typing import List, Optional, Sequence
+from typing import Callable, List, Optional, Sequence
 
 from libddog.common.bases import Renderable
 from libddog.common.types import JsonDict
 from libddog.dashboards.components import (
     TemplateVariableDefinition,
+    TemplateVariableIndex,
     TemplateVariablesPreset,
 )
 from libddog.dashboards.widgets import Widget
@@ -24,14 +25,20 @@ class Dashboard(Renderable):
         self.title = title
         self.desc = desc
         self.widgets = widgets or []
-        self.tmpl_var_defs = tmpl_var_defs or []
         self.tmpl_var_presets = tmpl_var_presets or []
 
         # infer tmpl_var definitions from the presets
+        self.tmpl_var_index = TemplateVariableIndex(tmpl_var_defs or [])
         for preset in self.tmpl_var_presets:
             for populated_var in preset.populated_vars:
-                if populated_var.tmpl_var not in self.tmpl_var_defs:
-                    self.tmpl_var_defs.append(populated_var.tmpl_var)
+                self.tmpl_var_index.add(populated_var.tmpl_var)
+
+        self.tmpl_var_defs = self.tmpl_var_index.get_definitions()
+
+        # imported here because the stats module builds on this one
+        from libddog.dashboards.stats import check_tmpl_vars
+
+        check_tmpl_vars(self)
 
     def as_dict(self) -> JsonDict:
         return {
@@ -48,3 +55,8 @@ class Dashboard(Renderable):
             "notify_list": [],
             "reflow_type": "fixed",
         }
+
+
+# A callable that builds a Dashboard on demand. Definitions modules can register
+# these by title so that only the dashboards that are actually needed get built.
+DashboardFactory = Callable[[], Dashboard]
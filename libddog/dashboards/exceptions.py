@@ -1,2 +1,22 @@
-class HLayoutError(Exception):
+class LayoutError(Exception):
+    pass
+
+
+class HLayoutError(LayoutError):
+    pass
+
+
+class FlowLayoutError(LayoutError):
+    pass
+
+
+class TemplateVariableError(Exception):
+    pass
+
+
+class TemplateVariableConflict(TemplateVariableError):
+    pass
+
+
+class UndefinedTemplateVariables(TemplateVariableError):
     pass
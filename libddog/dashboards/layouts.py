@@ -1,100 +1,142 @@
-from typing import List, Union
+from typing import List, Sequence, Tuple
 
 from libddog.dashboards.components import Position, Size
-from libddog.dashboards.exceptions import HLayoutError
+from libddog.dashboards.exceptions import FlowLayoutError, HLayoutError
 from libddog.dashboards.presets import NotePreset
 from libddog.dashboards.widgets import Note, Widget
 
 
-class HLayout:
+class Placement:
     """
-    A horizontal layout of equal sized widgets that always fills the whole row,
-    up to the page width. If the widgets passed in do not fill the row then
-    padding is inserted in the form of a transparent Note which has the
-    appearance of empty space.
+    The computed size and position of a widget in a layout. Computing a
+    placement does not modify the widget, `apply` does.
+    """
+
+    def __init__(
+        self, *, widget: Widget, x: int, y: int, width: int, height: int
+    ) -> None:
+        self.widget = widget
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def apply(self) -> Widget:
+        self.widget.size = Size(width=self.width, height=self.height)
+        self.widget.position = Position(x=self.x, y=self.y)
+        return self.widget
+
 
-    Calling `get_widgets` modifies the `size` and `position` of the widgets
-    contained in the layout before returning them.
+def create_padding(*, x: int, y: int, width: int, height: int) -> Placement:
+    "Creates a transparent Note which has the appearance of empty space."
+
+    note = Note(
+        preset=NotePreset.CAPTION,
+        content="",
+        size=Size(width=width, height=height),
+        position=Position(x=x, y=y),
+    )
+    return Placement(widget=note, x=x, y=y, width=width, height=height)
+
+
+class WidgetLayout:
+    """
+    The base class for layouts. A layout computes the placements of its widgets
+    in a single pass which does not modify the layout or the widgets, so it can
+    be computed any number of times with the same result.
     """
 
     page_width = 12
 
-    def __init__(self, width: int, height: int, widgets: List[Widget]) -> None:
-        self.width = width
-        self.height = height
-        self.widgets = widgets
+    def compute(self, y_offset: int = 0) -> Tuple[List[Placement], int]:
+        """
+        Returns the placements of the widgets (and any padding) with the layout
+        starting at `y_offset`, as well as the total height of the layout.
+        """
 
-        self.total_height = self.height
+        raise NotImplementedError
 
-    def _lay_out_widgets(self) -> None:
-        cum_width = 0
-        y_pos = 0
+    def get_placements(self) -> List[Placement]:
+        placements, _ = self.compute()
+        return placements
 
-        for widget in self.widgets:
-            overflow = (cum_width + self.width) - self.page_width
-            if overflow > 0:
-                raise HLayoutError(
-                    "Overflowed page width (%r) by %r units"
-                    % (self.page_width, overflow)
-                )
+    @property
+    def total_height(self) -> int:
+        _, height = self.compute()
+        return height
 
-            widget.size.width = self.width
-            widget.size.height = self.height
+    def get_widgets(self) -> List[Widget]:
+        """
+        Returns the widgets in the layout, followed by any padding, with their
+        `size` and `position` set to what the layout computed.
+        """
 
-            widget.position.x = cum_width
-            widget.position.y = y_pos
+        return [placement.apply() for placement in self.get_placements()]
 
-            cum_width += widget.size.width
 
-        delta_width = abs(self.page_width - cum_width)
-        if delta_width > 0:
-            note = Note(
-                preset=NotePreset.CAPTION,
-                content="",
-                size=Size(width=delta_width, height=self.height),
-                position=Position(x=cum_width, y=y_pos),
+class HLayout(WidgetLayout):
+    """
+    A horizontal layout of equal sized widgets that always fills the whole row,
+    up to the page width. If the widgets passed in do not fill the row then
+    padding is inserted in the form of a transparent Note which has the
+    appearance of empty space.
+    """
+
+    def __init__(self, width: int, height: int, widgets: List[Widget]) -> None:
+        self.width = width
+        self.height = height
+        self.widgets = widgets
+
+    def compute(self, y_offset: int = 0) -> Tuple[List[Placement], int]:
+        fitting = self.page_width // self.width
+        if len(self.widgets) > fitting:
+            # the overflow caused by the first widget that does not fit
+            overflow = (fitting + 1) * self.width - self.page_width
+            raise HLayoutError(
+                "Overflowed page width (%r) by %r units" % (self.page_width, overflow)
             )
-            self.widgets.append(note)
 
-    def get_widgets(self) -> List[Widget]:
-        self._lay_out_widgets()
-        return self.widgets
+        placements = [
+            Placement(
+                widget=widget,
+                x=idx * self.width,
+                y=y_offset,
+                width=self.width,
+                height=self.height,
+            )
+            for idx, widget in enumerate(self.widgets)
+        ]
+
+        cum_width = len(self.widgets) * self.width
+        if cum_width < self.page_width:
+            padding = create_padding(
+                x=cum_width,
+                y=y_offset,
+                width=self.page_width - cum_width,
+                height=self.height,
+            )
+            placements.append(padding)
+
+        return placements, self.height
 
 
-class HLayoutWrapping:
+class HLayoutWrapping(WidgetLayout):
     """
     A horizontal layout of equal sized widgets that spans multiple rows if there
     are enough widgets to overflow the first row. If the widgets in a particular
     row do not fill the row then padding is inserted in the form of a
     transparent Note which has the appearance of empty space.
-
-    Calling `get_widgets` modifies the `size` and `position` of the widgets
-    contained in the layout before returning them.
     """
 
-    page_width = 12
-
     def __init__(self, width: int, height: int, widgets: List[Widget]) -> None:
         self.width = width
         self.height = height
         self.widgets = widgets
 
-        self.total_height = 0  # computed in self._lay_out_widgets
-
-    def _lay_out_widgets(self) -> None:
+    def compute(self, y_offset: int = 0) -> Tuple[List[Placement], int]:
+        placements: List[Placement] = []
         cum_width = 0
-        y_pos = 0
-
-        line = []
-        widgets = []
-
-        def create_padding(width: int, height: int, x: int, y: int) -> Widget:
-            return Note(
-                preset=NotePreset.CAPTION,
-                content="",
-                size=Size(width=width, height=height),
-                position=Position(x=x, y=y),
-            )
+        y_pos = y_offset
 
         for widget in self.widgets:
             delta_width = abs(self.page_width - cum_width)
@@ -104,72 +146,150 @@ class HLayoutWrapping:
             if delta_width < self.width:
                 # we have some horiz space left - let's fill it with padding
                 if delta_width > 0:
-                    note = create_padding(delta_width, self.height, cum_width, y_pos)
-                    line.append(note)
-
-                # do a line break
-                widgets.extend(line)
-                line = []
+                    padding = create_padding(
+                        x=cum_width, y=y_pos, width=delta_width, height=self.height
+                    )
+                    placements.append(padding)
 
                 cum_width = 0
                 y_pos += self.height
 
-            widget.size.width = self.width
-            widget.size.height = self.height
-
-            widget.position.x = cum_width
-            widget.position.y = y_pos
-
-            line.append(widget)
+            placement = Placement(
+                widget=widget,
+                x=cum_width,
+                y=y_pos,
+                width=self.width,
+                height=self.height,
+            )
+            placements.append(placement)
 
-            cum_width += widget.size.width
+            cum_width += self.width
 
         # if there is still horiz space left on the last line after the last
         # widget we fill the line using padding
         delta_width = abs(self.page_width - cum_width)
         if delta_width > 0:
-            note = create_padding(delta_width, self.height, cum_width, y_pos)
-            line.append(note)
+            padding = create_padding(
+                x=cum_width, y=y_pos, width=delta_width, height=self.height
+            )
+            placements.append(padding)
+
+        total_height = y_pos + self.height - y_offset
+        return placements, total_height
+
+
+class FlowLayout(WidgetLayout):
+    """
+    A layout of widgets of mixed sizes, each keeping its own `size`.
 
-        widgets.extend(line)
+    Widgets are placed in order, each one in the leftmost of the lowest
+    positions where it fits (a skyline bottom-left packing), so a short widget
+    can fill the space next to a tall one. The gaps left over are filled with
+    as few padding Notes as possible, so that the layout is a rectangle as wide
+    as the page.
+    """
 
-        self.total_height = y_pos + self.height
+    def __init__(self, widgets: List[Widget]) -> None:
         self.widgets = widgets
 
-    def get_widgets(self) -> List[Widget]:
-        self._lay_out_widgets()
-        return self.widgets
+    def compute(self, y_offset: int = 0) -> Tuple[List[Placement], int]:
+        page_width = self.page_width
 
+        # the height of the column of cells at every x
+        skyline = [0] * page_width
+        # a bit mask of the occupied cells in every row
+        rows: List[int] = []
 
-class HLayoutStack:
-    """
-    A vertical layout of `HLayout` or `HLayoutWrapping` rows, which allows
-    stacking layouts vertically.
+        placements: List[Placement] = []
+        for widget in self.widgets:
+            width, height = widget.size.width, widget.size.height
+            if width is None or height is None:
+                raise FlowLayoutError("Size of %r is not set" % widget)
+
+            if not 0 < width <= page_width or height <= 0:
+                raise FlowLayoutError(
+                    "Size %sx%s of %r does not fit the page width (%r)"
+                    % (width, height, widget, page_width)
+                )
 
-    Calling `get_widgets` modifies the `size` and `position` of the widgets
-    contained in the inner layout before returning them as one flat list of
-    widgets.
-    """
+            best_x, best_y = 0, -1
+            for x in range(page_width - width + 1):
+                y = max(skyline[x : x + width])
+                if best_y < 0 or y < best_y:
+                    best_x, best_y = x, y
+
+            mask = ((1 << width) - 1) << best_x
+            while len(rows) < best_y + height:
+                rows.append(0)
+            for y in range(best_y, best_y + height):
+                rows[y] |= mask
+            for x in range(best_x, best_x + width):
+                skyline[x] = best_y + height
+
+            placement = Placement(
+                widget=widget,
+                x=best_x,
+                y=y_offset + best_y,
+                width=width,
+                height=height,
+            )
+            placements.append(placement)
+
+        placements.extend(self.compute_padding(rows, y_offset))
+
+        return placements, len(rows)
+
+    def compute_padding(self, rows: Sequence[int], y_offset: int) -> List[Placement]:
+        """
+        Covers the empty cells in `rows` with rectangles, each one taking a run
+        of empty cells in a row and extending it down for as long as the same
+        cells are empty.
+        """
+
+        full = (1 << self.page_width) - 1
+        filled = list(rows)
+
+        placements = []
+        for y in range(len(filled)):
+            empty = ~filled[y] & full
+            while empty:
+                # the lowest run of consecutive empty cells
+                x = (empty & -empty).bit_length() - 1
+                width = 0
+                while x + width < self.page_width and empty & (1 << (x + width)):
+                    width += 1
+
+                mask = ((1 << width) - 1) << x
+                height = 1
+                while y + height < len(filled) and not filled[y + height] & mask:
+                    filled[y + height] |= mask
+                    height += 1
+
+                empty &= ~mask
+                padding = create_padding(
+                    x=x, y=y_offset + y, width=width, height=height
+                )
+                placements.append(padding)
 
-    def __init__(self, layouts: List[Union[HLayout, HLayoutWrapping]]) -> None:
-        self.layouts = layouts
+        return placements
 
-    def _lay_out_widgets(self) -> None:
-        for layout in self.layouts:
-            layout._lay_out_widgets()
 
-        cum_height = 0
-        for layout in self.layouts:
-            for widget in layout.widgets:
-                widget.position.y += cum_height  # type: ignore
+class HLayoutStack(WidgetLayout):
+    """
+    A vertical layout of other layouts, eg. `HLayout` or `HLayoutWrapping`
+    rows, which allows stacking layouts vertically.
+    """
 
-            cum_height += layout.total_height
+    def __init__(self, layouts: Sequence[WidgetLayout]) -> None:
+        self.layouts = layouts
 
-    def get_widgets(self) -> List[Widget]:
-        self._lay_out_widgets()
+    def compute(self, y_offset: int = 0) -> Tuple[List[Placement], int]:
+        placements: List[Placement] = []
+        cum_height = 0
 
-        widgets = []
         for layout in self.layouts:
-            widgets.extend(layout.widgets)
+            layout_placements, height = layout.compute(y_offset + cum_height)
+            placements.extend(layout_placements)
+            cum_height += height
 
-        return widgets
+        return placements, cum_height
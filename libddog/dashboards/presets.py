@@ -1,5 +1,6 @@
 import enum
-from typing import Any, Dict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
 
 from libddog.dashboards.enums import BackgroundColor, TextAlign, TickEdge, VerticalAlign
 
@@ -12,41 +13,86 @@ class NotePreset(enum.Enum):
 
     @classmethod
     def get_defaults(cls) -> Dict[Any, Any]:
+        # a copy, so that the caller can't modify the shared tables
         return {
-            cls.DEFAULT: {
-                "background_color": BackgroundColor.WHITE,
-                "font_size": 14,
-                "has_padding": True,
-                "show_tick": False,
-                "text_align": TextAlign.LEFT,
-                "tick_edge": TickEdge.TOP,
-                "vertical_align": VerticalAlign.TOP,
-            },
-            cls.CAPTION: {
-                "background_color": BackgroundColor.TRANSPARENT,
-                "font_size": 12,
-                "has_padding": False,
-                "show_tick": False,
-                "text_align": TextAlign.LEFT,
-                "tick_edge": TickEdge.LEFT,
-                "vertical_align": VerticalAlign.TOP,
-            },
-            cls.HEADER: {
-                "background_color": BackgroundColor.WHITE,
-                "font_size": 36,
-                "has_padding": True,
-                "show_tick": False,
-                "text_align": TextAlign.CENTER,
-                "tick_edge": TickEdge.LEFT,
-                "vertical_align": VerticalAlign.CENTER,
-            },
-            cls.ANNOTATION: {
-                "background_color": BackgroundColor.YELLOW,
-                "font_size": 14,
-                "has_padding": True,
-                "show_tick": True,
-                "text_align": TextAlign.LEFT,
-                "tick_edge": TickEdge.LEFT,
-                "vertical_align": VerticalAlign.CENTER,
-            },
+            preset: dict(defaults) for preset, defaults in NOTE_PRESET_DEFAULTS.items()
         }
+
+
+def _freeze(dct: Dict[Any, Dict[str, Any]]) -> Mapping[Any, Mapping[str, Any]]:
+    return MappingProxyType(
+        {key: MappingProxyType(value) for key, value in dct.items()}
+    )
+
+
+# The default value of every optional Note attribute, by preset.
+NOTE_PRESET_DEFAULTS: Mapping[NotePreset, Mapping[str, Any]] = _freeze(
+    {
+        NotePreset.DEFAULT: {
+            "background_color": BackgroundColor.WHITE,
+            "font_size": 14,
+            "has_padding": True,
+            "show_tick": False,
+            "text_align": TextAlign.LEFT,
+            "tick_edge": TickEdge.TOP,
+            "vertical_align": VerticalAlign.TOP,
+        },
+        NotePreset.CAPTION: {
+            "background_color": BackgroundColor.TRANSPARENT,
+            "font_size": 12,
+            "has_padding": False,
+            "show_tick": False,
+            "text_align": TextAlign.LEFT,
+            "tick_edge": TickEdge.LEFT,
+            "vertical_align": VerticalAlign.TOP,
+        },
+        NotePreset.HEADER: {
+            "background_color": BackgroundColor.WHITE,
+            "font_size": 36,
+            "has_padding": True,
+            "show_tick": False,
+            "text_align": TextAlign.CENTER,
+            "tick_edge": TickEdge.LEFT,
+            "vertical_align": VerticalAlign.CENTER,
+        },
+        NotePreset.ANNOTATION: {
+            "background_color": BackgroundColor.YELLOW,
+            "font_size": 14,
+            "has_padding": True,
+            "show_tick": True,
+            "text_align": TextAlign.LEFT,
+            "tick_edge": TickEdge.LEFT,
+            "vertical_align": VerticalAlign.CENTER,
+        },
+    }
+)
+
+
+def render_note_definition(defaults: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Renders preset defaults the way they appear in the definition of a note
+    widget, with placeholders for the content and in the order of the keys in
+    the output.
+    """
+
+    return {
+        "background_color": defaults["background_color"].value,
+        "content": "",
+        "font_size": str(defaults["font_size"]),
+        "has_padding": defaults["has_padding"],
+        "show_tick": defaults["show_tick"],
+        "text_align": defaults["text_align"].value,
+        "tick_edge": defaults["tick_edge"].value,
+        "type": "note",
+        "vertical_align": defaults["vertical_align"].value,
+    }
+
+
+# The definition of a note widget that only uses the preset defaults, by
+# preset. Rendering a note copies one of these and overrides what's set.
+NOTE_PRESET_DEFINITIONS: Mapping[NotePreset, Mapping[str, Any]] = _freeze(
+    {
+        preset: render_note_definition(defaults)
+        for preset, defaults in NOTE_PRESET_DEFAULTS.items()
+    }
+)
@@ -0,0 +1,75 @@
+import weakref
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Sequence, Set, Tuple
+
+
+class WidgetType:
+    """
+    What libddog knows about a kind of widget: the name Datadog uses for it,
+    its default size (width, height) and which attributes of the objects it
+    contains (queries, requests, formulas) it serializes.
+
+    Every subclass of Widget registers a WidgetType when it's defined, so that
+    looking these up while building and rendering a dashboard is a dict hit.
+    The registry only holds weak references to widget classes, so classes
+    that go away (eg. defined inside a function) are unregistered.
+    """
+
+    def __init__(
+        self,
+        *,
+        widget_cls: type,
+        name: Optional[str],
+        default_size: Optional[Tuple[int, int]],
+        allowed_atts: Mapping[Any, Sequence[str]],
+    ) -> None:
+        self._widget_cls_ref = weakref.ref(widget_cls)
+        self.name = name
+        self.default_size = default_size
+        self.allowed_atts: Dict[Any, FrozenSet[str]] = {
+            cls: frozenset(attnames) for cls, attnames in allowed_atts.items()
+        }
+
+        # the classes whose allowed attributes have been checked against an
+        # instance, because an attribute is only known to exist once it's set
+        self._checked_classes: Set[type] = set()
+
+    @property
+    def widget_cls(self) -> type:
+        widget_cls = self._widget_cls_ref()
+        assert widget_cls is not None  # the registry drops us along with it
+        return widget_cls
+
+    def get_allowed_atts(self, obj: Any) -> FrozenSet[str]:
+        cls = obj.__class__
+        allowed_atts = self.allowed_atts.get(cls)
+        if allowed_atts is None:
+            raise NotImplementedError("allowed atts for: %r" % cls)
+
+        if cls not in self._checked_classes:
+            # sanity check: make sure allowed attributes do exist
+            for attname in sorted(allowed_atts):
+                if not hasattr(obj, attname):
+                    raise RuntimeError(
+                        "Invalid att name in allowed_atts for %s: %s" % (cls, attname)
+                    )
+
+            self._checked_classes.add(cls)
+
+        return allowed_atts
+
+
+_widget_types: "weakref.WeakKeyDictionary[type, WidgetType]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def register_widget_type(widget_type: WidgetType) -> None:
+    _widget_types[widget_type.widget_cls] = widget_type
+
+
+def get_widget_type(widget_cls: type) -> Optional[WidgetType]:
+    return _widget_types.get(widget_cls)
+
+
+def get_widget_types() -> List[WidgetType]:
+    return list(_widget_types.values())
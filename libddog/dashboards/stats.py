@@ -0,0 +1,177 @@
+import json
+from typing import Dict, Iterator, List, Optional, Set
+
+from libddog.common.types import JsonDict
+from libddog.dashboards.components import Request
+from libddog.dashboards.dashboards import Dashboard
+from libddog.dashboards.exceptions import UndefinedTemplateVariables
+from libddog.dashboards.widgets import Group, Widget
+from libddog.metrics.query import QueryState, TmplVar
+
+
+class DashboardVisitor:
+    """
+    Walks the tree of a dashboard once, top down and in order, calling a
+    `visit_*` method for every object found along the way. Derived classes
+    override the methods they're interested in.
+
+    The walk is iterative, so deeply nested groups do not hit the recursion
+    limit.
+    """
+
+    def visit_dashboard(self, dash: Dashboard) -> None:
+        pass
+
+    def visit_group(self, group: Group) -> None:
+        pass
+
+    def visit_widget(self, widget: Widget) -> None:
+        pass
+
+    def visit_request(self, request: Request) -> None:
+        pass
+
+    def visit_query(self, query: QueryState) -> None:
+        pass
+
+    def walk(self, dash: Dashboard) -> None:
+        self.visit_dashboard(dash)
+
+        stack: List[Widget] = list(reversed(dash.widgets))
+        while stack:
+            widget = stack.pop()
+
+            if isinstance(widget, Group):
+                self.visit_group(widget)
+                stack.extend(reversed(widget.widgets))
+                continue
+
+            self.visit_widget(widget)
+
+            for request in getattr(widget, "requests", ()):
+                self.visit_request(request)
+
+                for query in request.queries:
+                    self.visit_query(query._state)
+
+
+def iter_tmpl_var_names(query: QueryState) -> Iterator[str]:
+    "Yields the names of the template variables `query` filters on."
+
+    if query.filter:
+        for cond in query.filter.conds:
+            if isinstance(cond, TmplVar):
+                yield cond.tvar
+
+
+class DashboardStats:
+    """
+    Statistics describing the contents of a dashboard.
+
+    `payload_size` is the size in bytes of the JSON document sent to Datadog.
+    """
+
+    def __init__(self) -> None:
+        self.groups = 0
+        self.widgets = 0
+        self.requests = 0
+        self.queries = 0
+        self.formulas = 0
+        self.metrics: Set[str] = set()
+        self.tmpl_var_usage: Dict[str, int] = {}
+        self.payload_size = 0
+
+    def as_dict(self) -> JsonDict:
+        return {
+            "groups": self.groups,
+            "widgets": self.widgets,
+            "requests": self.requests,
+            "queries": self.queries,
+            "formulas": self.formulas,
+            "metrics": len(self.metrics),
+            "tmpl_vars": len(self.tmpl_var_usage),
+            "payload_size": self.payload_size,
+        }
+
+
+class DashboardStatsCollector(DashboardVisitor):
+    def __init__(self) -> None:
+        self.stats = DashboardStats()
+
+    def visit_group(self, group: Group) -> None:
+        self.stats.groups += 1
+
+    def visit_widget(self, widget: Widget) -> None:
+        self.stats.widgets += 1
+
+    def visit_request(self, request: Request) -> None:
+        self.stats.requests += 1
+
+        # if a request has no formulas one is synthesized per query on render
+        self.stats.formulas += len(request.formulas) or len(request.queries)
+
+    def visit_query(self, query: QueryState) -> None:
+        self.stats.queries += 1
+        self.stats.metrics.add(query.metric.name)
+
+        usage = self.stats.tmpl_var_usage
+        for name in iter_tmpl_var_names(query):
+            usage[name] = usage.get(name, 0) + 1
+
+
+def collect_stats(dash: Dashboard, dct: Optional[JsonDict] = None) -> DashboardStats:
+    """
+    Gathers statistics about `dash` in a single walk over its widgets.
+
+    `dct` is the dashboard already rendered with `as_dict`, if available. If not
+    passed the dashboard is rendered to compute the payload size.
+    """
+
+    collector = DashboardStatsCollector()
+    collector.walk(dash)
+
+    if dct is None:
+        dct = dash.as_dict()
+
+    collector.stats.payload_size = len(json.dumps(dct))
+
+    return collector.stats
+
+
+class TmplVarUsageCollector(DashboardVisitor):
+    "Records the title of the first widget using each template variable."
+
+    def __init__(self) -> None:
+        self.widget_title: Optional[str] = None
+        self.first_used_by: Dict[str, Optional[str]] = {}
+
+    def visit_widget(self, widget: Widget) -> None:
+        self.widget_title = getattr(widget, "title", None)
+
+    def visit_query(self, query: QueryState) -> None:
+        for name in iter_tmpl_var_names(query):
+            self.first_used_by.setdefault(name, self.widget_title)
+
+
+def check_tmpl_vars(dash: Dashboard) -> None:
+    """
+    Checks in a single walk over the widgets of `dash` that every template
+    variable used in a query is defined on the dashboard.
+    """
+
+    collector = TmplVarUsageCollector()
+    collector.walk(dash)
+
+    undefined = [
+        (name, title)
+        for name, title in collector.first_used_by.items()
+        if name not in dash.tmpl_var_index
+    ]
+
+    if undefined:
+        descs = ", ".join(
+            "$%s (used in widget %r)" % (name, title) for name, title in undefined
+        )
+        raise UndefinedTemplateVariables(
+            "Dashboard %r uses undefined template variables: %s" % (dash.title, descs)
+        )
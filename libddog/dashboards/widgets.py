@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, Sequence
+from typing import AbstractSet, Any, Dict, List, Optional, Sequence, Tuple
 
 from libddog.common.types import JsonDict
 from libddog.dashboards.components import (
@@ -23,7 +23,16 @@ from libddog.dashboards.enums import (
     TitleAlign,
     VerticalAlign,
 )
-from libddog.dashboards.presets import NotePreset
+from libddog.dashboards.presets import (
+    NOTE_PRESET_DEFAULTS,
+    NOTE_PRESET_DEFINITIONS,
+    NotePreset,
+)
+from libddog.dashboards.registry import (
+    WidgetType,
+    get_widget_type,
+    register_widget_type,
+)
 from libddog.metrics.query import QueryState
 
 
@@ -32,8 +41,23 @@ class Widget:
     A visual component on a dashboard.
     """
 
+    # Describe the widget type in subclasses. They're put in the registry
+    # when the subclass is defined.
+    _type_name: Optional[str] = None
+    _default_size: Optional[Tuple[int, int]] = None
     _allowed_atts: Dict[Any, Sequence[str]] = {}
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        widget_type = WidgetType(
+            widget_cls=cls,
+            name=cls._type_name,
+            default_size=cls._default_size,
+            allowed_atts=cls._allowed_atts,
+        )
+        register_widget_type(widget_type)
+
     def __init__(
         self,
         *,
@@ -66,23 +90,22 @@ class Widget:
         dct_layout = layout.as_dict()
         dct.update(dct_layout)
 
-    def _get_allowed_atts(self, obj: Any) -> Sequence[str]:
-        cls = obj.__class__
-        allowed_atts = self._allowed_atts.get(cls)
-        if allowed_atts is None:
-            raise NotImplementedError("allowed atts for: %r" % cls)
+    def _get_type_name(self) -> str:
+        widget_type = get_widget_type(self.__class__)
+        if widget_type is None or widget_type.name is None:
+            raise NotImplementedError("type name for: %r" % self.__class__)
+
+        return widget_type.name
 
-        # sanity check: make sure present default attributes do exist
-        for attname in allowed_atts:
-            if not hasattr(obj, attname):
-                raise RuntimeError(
-                    "Invalid att name in allowed_atts for %s: %s" % (cls, attname)
-                )
+    def _get_allowed_atts(self, obj: Any) -> AbstractSet[str]:
+        widget_type = get_widget_type(self.__class__)
+        if widget_type is None:
+            raise NotImplementedError("allowed atts for: %r" % obj.__class__)
 
-        return allowed_atts
+        return widget_type.get_allowed_atts(obj)
 
     def _filter_dict_keys(
-        self, dct: Dict[str, Any], allowed_atts: Sequence[str]
+        self, dct: Dict[str, Any], allowed_atts: AbstractSet[str]
     ) -> None:
         for key in list(dct.keys()):
             if key not in allowed_atts:
@@ -106,6 +129,9 @@ class Widget:
 
 
 class Note(Widget):
+    _type_name = "note"
+    _default_size = (2, 2)
+
     def __init__(
         self,
         *,
@@ -139,69 +165,56 @@ class Note(Widget):
         applied for any optional attributes which are not set on 'self'.
         """
 
-        preset_defaults = NotePreset.get_defaults().get(self.preset)
+        preset_defaults = NOTE_PRESET_DEFAULTS.get(self.preset)
         if not preset_defaults:
             raise NotImplementedError(self.preset)
 
-        # sanity check: make sure present default attributes do exist
-        for attname in preset_defaults.keys():
-            if not hasattr(self, attname):
-                raise RuntimeError("Invalid att name in preset: %s" % attname)
-
-        # the effective values of the attributes
-        kwargs = {}
-
-        # get all the attribute names on 'self'
-        attnames = [
-            att
-            for att in dir(self)
-            if not att.startswith("_") and not callable(getattr(self, att))
-        ]
-
-        for attname in attnames:
-            value = getattr(self, attname, None)
-
-            # if the attribute is not set on 'self' get it from the preset
-            # defaults instead
-            if value is None:
-                value = preset_defaults.get(attname)
-
-                # if it's present in the present it must be set
-                assert value is not None
-
-            kwargs[attname] = value
+        kwargs = {
+            attname: getattr(self, attname)
+            for attname in ("preset", "content", "size", "position")
+        }
+        for attname, default in preset_defaults.items():
+            value = getattr(self, attname)
+            kwargs[attname] = default if value is None else value
 
         return self.__class__(**kwargs)
 
     def as_dict(self) -> JsonDict:
-        instance = self.apply_preset()
-        # from this point on: use 'instance' not 'self'
+        # Start from the definition of a note with the preset's defaults, which
+        # is rendered once, and override whatever is set on 'self'. Padding
+        # notes are rendered by the thousand, so this needs to be cheap.
+        preset_definition = NOTE_PRESET_DEFINITIONS.get(self.preset)
+        if not preset_definition:
+            raise NotImplementedError(self.preset)
 
-        # let's help mypy a bit because these are no longer None
-        assert instance.background_color is not None
-        assert instance.text_align is not None
-        assert instance.tick_edge is not None
-        assert instance.vertical_align is not None
+        definition = dict(preset_definition)
+        definition["content"] = self.content
+        definition["type"] = self._get_type_name()
+
+        if self.background_color is not None:
+            definition["background_color"] = self.background_color.value
+        if self.font_size is not None:
+            definition["font_size"] = str(self.font_size)
+        if self.has_padding is not None:
+            definition["has_padding"] = self.has_padding
+        if self.show_tick is not None:
+            definition["show_tick"] = self.show_tick
+        if self.text_align is not None:
+            definition["text_align"] = self.text_align.value
+        if self.tick_edge is not None:
+            definition["tick_edge"] = self.tick_edge.value
+        if self.vertical_align is not None:
+            definition["vertical_align"] = self.vertical_align.value
+
+        dct = {"definition": definition}
 
-        dct = {
-            "definition": {
-                "background_color": instance.background_color.value,
-                "content": instance.content,
-                "font_size": str(instance.font_size),
-                "has_padding": instance.has_padding,
-                "show_tick": instance.show_tick,
-                "text_align": instance.text_align.value,
-                "tick_edge": instance.tick_edge.value,
-                "type": "note",
-                "vertical_align": instance.vertical_align.value,
-            },
-        }
-
-        instance.add_layout(dct, size=instance.size, position=instance.position)
+        self.add_layout(dct, size=self.size, position=self.position)
         return dct
 
 
 class QueryValue(Widget):
+    _type_name = "query_value"
+    _default_size = (2, 2)
     _allowed_atts = {
         QueryState: [
             "aggregator",
@@ -256,7 +269,7 @@ class QueryValue(Widget):
                 "title": self.title,
                 "title_align": self.title_align.value,
                 "title_size": str(self.title_size),
-                "type": "query_value",
+                "type": self._get_type_name(),
             },
         }
 
@@ -268,6 +281,8 @@ class QueryValue(Widget):
 
 
 class Timeseries(Widget):
+    _type_name = "timeseries"
+    _default_size = (4, 2)
     _allowed_atts = {
         QueryState: [
             "data_source",
@@ -333,7 +348,7 @@ class Timeseries(Widget):
                 "title": self.title,
                 "title_align": self.title_align.value,
                 "title_size": str(self.title_size),
-                "type": "timeseries",
+                "type": self._get_type_name(),
                 "yaxis": self.yaxis.as_dict(),
             },
         }
@@ -343,6 +358,8 @@ class Timeseries(Widget):
 
 
 class Toplist(Widget):
+    _type_name = "toplist"
+    _default_size = (4, 2)
     _allowed_atts = {
         QueryState: [
             "aggregator",
@@ -393,7 +410,7 @@ class Toplist(Widget):
                 "title": self.title,
                 "title_align": self.title_align.value,
                 "title_size": str(self.title_size),
-                "type": "toplist",
+                "type": self._get_type_name(),
             },
         }
 
@@ -404,6 +421,9 @@ class Toplist(Widget):
 class Group(Widget):
     """A visual container with a title that contains widgets."""
 
+    _type_name = "group"
+    _default_size = (12, 1)
+
     def __init__(
         self,
         *,
@@ -425,7 +445,7 @@ class Group(Widget):
         dct = {
             "definition": {
                 "title": self.title,
-                "type": "group",
+                "type": self._get_type_name(),
                 "layout_type": self.layout_type.value,
                 "widgets": [wid.as_dict() for wid in self.widgets],
             },
@@ -43,17 +43,21 @@ from libddog.metrics.functions import (
     trend_line,
     week_before,
 )
+from libddog.metrics.interning import NodeInterner, interning
 from libddog.metrics.literals import Float, Identifier, Int
 from libddog.metrics.query import Query, QueryMonad
+from libddog.metrics.validation import DeferredValidator, deferred_validation
 
 __all__ = (
     "Add",
     "Comma",
+    "DeferredValidator",
     "Div",
     "Float",
     "Identifier",
     "Int",
     "Mul",
+    "NodeInterner",
     "Query",
     "QueryMonad",
     "Sub",
@@ -69,6 +73,7 @@ __all__ = (
     "cutoff_min",
     "day_before",
     "default_zero",
+    "deferred_validation",
     "derivative",
     "diff",
     "dt",
@@ -80,6 +85,7 @@ __all__ = (
     "forecast",
     "hour_before",
     "integral",
+    "interning",
     "log10",
     "log2",
     "median_3",
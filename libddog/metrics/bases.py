@@ -1,16 +1,95 @@
-class QueryNode:
+import copy
+import functools
+from typing import Any, Callable, Dict, FrozenSet, Optional, Sequence
+
+
+def memoize_codegen(codegen: Callable[[Any], str]) -> Callable[[Any], str]:
+    """
+    Wraps a `codegen` method so that its result is computed only once on frozen
+    nodes. Nodes that are not frozen are rendered every time, as before.
+    """
+
+    @functools.wraps(codegen)
+    def wrapper(self: "InternableNode") -> str:
+        if not self._frozen:
+            return codegen(self)
+
+        if self._codegen_cache is None:
+            self._codegen_cache = codegen(self)
+
+        return self._codegen_cache
+
+    return wrapper
+
+
+class InternableNode:
+    """
+    The base class of AST nodes that can be interned (see
+    libddog.metrics.interning).
+
+    An interned node is frozen: it is shared between all the trees that contain
+    an equal node, so it must never be mutated again. In exchange its `codegen`
+    result is memoized and copying it is free.
+    """
+
+    _frozen = False
+    _codegen_cache: Optional[str] = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        codegen = cls.__dict__.get("codegen")
+        if codegen is not None:
+            setattr(cls, "codegen", memoize_codegen(codegen))
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Any:
+        if self._frozen:
+            return self
+
+        # the same as what copy.deepcopy does for a plain object
+        clone = self.__class__.__new__(self.__class__)
+        memo[id(self)] = clone
+        for key, value in vars(self).items():
+            setattr(clone, key, copy.deepcopy(value, memo))
+
+        return clone
+
+    def freeze(self) -> None:
+        self._frozen = True
+
+
+class QueryNode(InternableNode):
     "The base class for all metrics AST classes."
 
     def codegen(self) -> str:
         raise NotImplemented  # pragma: no cover
 
 
-class FormulaNode:
-    "The base class for all formula AST classes."
+class FormulaNode(InternableNode):
+    """
+    The base class for all formula AST classes.
+
+    Formula nodes are treated as immutable once constructed: facts derived from
+    a node (like the identifiers it contains) are cached on it.
+    """
+
+    # cache for libddog.metrics.support.find_identifier_names
+    _identifier_names: Optional[FrozenSet[str]] = None
 
     def codegen(self) -> str:
         raise NotImplemented  # pragma: no cover
 
+    def children(self) -> Sequence["FormulaNode"]:
+        """
+        Returns the nodes directly below this one in the tree. Derived classes
+        declare their children by overriding this; the default finds them among
+        the instance attributes.
+        """
+
+        return tuple(
+            value for value in vars(self).values() if isinstance(value, FormulaNode)
+        )
+
     def __add__(self, other: "FormulaNode") -> "FormulaNode":
         from libddog.metrics.formulas import Add
 
@@ -1,3 +1,5 @@
+from typing import Sequence
+
 from libddog.metrics.bases import FormulaNode
 
 
@@ -11,6 +13,9 @@ class BinaryFormula(FormulaNode):
     def codegen(self) -> str:
         return f"({self.left.codegen()} {self.symbol} {self.right.codegen()})"
 
+    def children(self) -> Sequence[FormulaNode]:
+        return (self.left, self.right)
+
 
 class Add(BinaryFormula):
     symbol = "+"
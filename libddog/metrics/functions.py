@@ -1,11 +1,15 @@
-from typing import Optional
+from typing import Dict, Optional, Sequence, Type
 
 from libddog.metrics.bases import FormulaNode
 from libddog.metrics.exceptions import FormulaValidationError
 
 
 class Function(FormulaNode):
-    pass
+    # every function takes the expression it applies to as the first argument
+    node: FormulaNode
+
+    def children(self) -> Sequence[FormulaNode]:
+        return (self.node,)
 
 
 class FunctionWithSingleNode(Function):
@@ -417,3 +421,17 @@ class clamp_min(Function):
     def codegen(self) -> str:
         func_name = self.__class__.__name__
         return f"{func_name}({self.node.codegen()}, {self.threshold})"
+
+
+def _get_functions_by_name() -> Dict[str, Type[Function]]:
+    # the classes of functions are named after the function, in lowercase,
+    # unlike their base classes
+    return {
+        name: value
+        for name, value in globals().items()
+        if isinstance(value, type) and issubclass(value, Function) and name.islower()
+    }
+
+
+# the functions that can be used in formulas, by name
+FUNCTIONS_BY_NAME = _get_functions_by_name()
@@ -0,0 +1,174 @@
+import contextlib
+import contextvars
+import enum
+import threading
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple, TypeVar
+
+from libddog.metrics.bases import FormulaNode, InternableNode
+
+NodeT = TypeVar("NodeT", bound=InternableNode)
+FormulaNodeT = TypeVar("FormulaNodeT", bound=FormulaNode)
+
+
+class NodeInterner:
+    """
+    Hash-conses AST nodes: the first node of a given shape becomes the canonical
+    one and every equal node constructed afterwards is replaced with it.
+
+    Generated dashboards use the same metrics, filters and formulas over and
+    over again, so sharing these nodes saves memory, and since canonical nodes
+    are frozen their `codegen` result is computed only once.
+    """
+
+    def __init__(self) -> None:
+        self._nodes: Dict[Hashable, InternableNode] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def make_key(
+        self, node: InternableNode, canonical: Dict[int, InternableNode]
+    ) -> Optional[Hashable]:
+        """
+        Returns a key that is equal for nodes of the same shape, or None if the
+        node cannot be interned. Child nodes are represented by the identity of
+        their canonical node, as found in `canonical`.
+        """
+
+        parts: List[Tuple[str, Any]] = []
+        for attr, value in vars(node).items():
+            if attr.startswith("_"):
+                continue
+
+            if isinstance(value, InternableNode):
+                # a parent can only be shared if its children are too
+                child = canonical.get(id(value))
+                if child is None or not child._frozen:
+                    return None
+                parts.append((attr, id(child)))
+
+            elif isinstance(value, list):
+                if not all(isinstance(item, str) for item in value):
+                    return None
+                parts.append((attr, tuple(value)))
+
+            elif value is None or isinstance(value, (str, int, float, enum.Enum)):
+                # include the type so that eg. Int(1) and Float(1.0) differ
+                parts.append((attr, (type(value), value)))
+
+            else:
+                return None
+
+        return (node.__class__, tuple(parts))
+
+    def intern(
+        self,
+        node: NodeT,
+        canonical: Optional[Dict[int, InternableNode]] = None,
+    ) -> NodeT:
+        key = self.make_key(node, canonical or {})
+        if key is None:
+            return node
+
+        with self._lock:
+            existing = self._nodes.get(key)
+            if existing is not None:
+                self.hits += 1
+                assert isinstance(existing, node.__class__)  # help mypy
+                return existing
+
+            self.misses += 1
+
+            # the node is not shared with anyone yet, so it's safe to point it
+            # at the canonical children it's equal to, which frees up its own
+            if canonical:
+                for attr, value in vars(node).items():
+                    if isinstance(value, InternableNode) and not attr.startswith("_"):
+                        setattr(node, attr, canonical[id(value)])
+
+            node.freeze()
+            self._nodes[key] = node
+
+        return node
+
+    def intern_formula(self, formula: FormulaNodeT) -> FormulaNodeT:
+        """
+        Interns every node in the formula tree, bottom up, and returns the
+        canonical root.
+        """
+
+        canonical: Dict[int, InternableNode] = {}
+
+        # iterative post-order walk
+        stack: List[Tuple[FormulaNode, bool]] = [(formula, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in canonical:
+                continue
+
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+                continue
+
+            canonical[id(node)] = self.intern(node, canonical)
+
+        root = canonical[id(formula)]
+        assert isinstance(root, formula.__class__)  # help mypy
+        return root
+
+
+# per thread (and asyncio task), so that a block only interns the nodes
+# constructed inside it
+_active_interner: contextvars.ContextVar[Optional[NodeInterner]] = (
+    contextvars.ContextVar("active_interner", default=None)
+)
+
+
+def get_active_interner() -> Optional[NodeInterner]:
+    return _active_interner.get()
+
+
+@contextlib.contextmanager
+def interning(interner: Optional[NodeInterner] = None) -> Iterator[NodeInterner]:
+    """
+    Interns the query and formula nodes constructed inside the block, eg.
+
+        with interning():
+            dashboards = get_dashboards()
+
+    Interning is opt-in because canonical nodes are shared between queries and
+    must not be mutated, which the libddog API never does but user code that
+    reaches into the AST might.
+    """
+
+    interner = interner or NodeInterner()
+    token = _active_interner.set(interner)
+
+    try:
+        yield interner
+    finally:
+        _active_interner.reset(token)
+
+
+def intern_node(node: NodeT) -> NodeT:
+    "Returns the canonical node equal to `node` if interning is enabled."
+
+    interner = _active_interner.get()
+    if interner is None:
+        return node
+
+    return interner.intern(node)
+
+
+def intern_formula(formula: FormulaNodeT) -> FormulaNodeT:
+    "Returns the canonical formula equal to `formula` if interning is enabled."
+
+    interner = _active_interner.get()
+    if interner is None:
+        return formula
+
+    return interner.intern_formula(formula)
@@ -1,3 +1,5 @@
+from typing import Sequence
+
 from libddog.metrics.bases import FormulaNode
 
 
@@ -8,6 +10,9 @@ class Float(FormulaNode):
     def codegen(self) -> str:
         return f"{self.value}"
 
+    def children(self) -> Sequence[FormulaNode]:
+        return ()
+
 
 class Int(FormulaNode):
     def __init__(self, value: int) -> None:
@@ -16,6 +21,9 @@ class Int(FormulaNode):
     def codegen(self) -> str:
         return f"{self.value}"
 
+    def children(self) -> Sequence[FormulaNode]:
+        return ()
+
 
 class Identifier(FormulaNode):
     def __init__(self, name: str) -> None:
@@ -23,3 +31,6 @@ class Identifier(FormulaNode):
 
     def codegen(self) -> str:
         return f"{self.name}"
+
+    def children(self) -> Sequence[FormulaNode]:
+        return ()
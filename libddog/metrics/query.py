@@ -1,10 +1,14 @@
 import copy
 import enum
+import itertools
+import threading
 from typing import Any, Dict, List, Optional, Type
 
 from libddog.common.bases import Renderable
 from libddog.metrics.bases import QueryNode
+from libddog.metrics.interning import intern_node
 from libddog.metrics.literals import Identifier
+from libddog.metrics.validation import get_deferred_validator
 from libddog.parsing.query_parser import QueryParser
 
 
@@ -12,6 +16,22 @@ class QueryValidationError(Exception):
     pass
 
 
+def validate_token(rule: str, token: str, msg_fmt: str) -> None:
+    """
+    Raises QueryValidationError(msg_fmt % token) if `token` doesn't match `rule`
+    of the query grammar, or defers the check if validation is deferred (see
+    libddog.metrics.validation).
+    """
+
+    validator = get_deferred_validator()
+    if validator is not None:
+        validator.defer_token(rule, token, QueryValidationError, msg_fmt)
+        return
+
+    if not QueryParser.get_instance().is_valid_token(rule, token):
+        raise QueryValidationError(msg_fmt % (token,))
+
+
 def reverse_enum(enum_cls: Type[enum.Enum], literal: str, label: str) -> enum.Enum:
     alternatives: List[enum.Enum] = list(enum_cls)
     for alternative in alternatives:
@@ -205,7 +225,18 @@ class Fill(QueryFunc):
 
 
 class QueryState(QueryNode, Renderable):
-    _instance_counter = 1
+    """
+    A metrics query.
+
+    A query constructed without a `name` gets a provisional one, unique in the
+    process. A Request replaces it with a name that only depends on the
+    position of the query in the request (see `Request.assign_query_names`),
+    so that rendered dashboards do not depend on what else was built before
+    them, or in which thread.
+    """
+
+    _name_counter = itertools.count(1)
+    _name_lock = threading.Lock()
 
     def __init__(
         self,
@@ -224,6 +255,7 @@ class QueryState(QueryNode, Renderable):
         self.agg = agg
         self.funcs = funcs or []
         self.name = name or self.get_next_unique_name()
+        self.auto_named = not name
         self.data_source = data_source
         self.aggregator = aggregator
         self.query = query
@@ -232,8 +264,9 @@ class QueryState(QueryNode, Renderable):
         return copy.deepcopy(self)
 
     def get_next_unique_name(self) -> str:
-        counter = self.__class__._instance_counter
-        self.__class__._instance_counter += 1
+        with self._name_lock:
+            counter = next(self._name_counter)
+
         return "q%s" % counter
 
     def codegen(self) -> str:
@@ -291,8 +324,6 @@ class QueryMonad:
         state = self._state.clone()
         state.filter = state.filter or Filter(conds=[])
 
-        parser = QueryParser.get_instance()
-
         for tmplvar in tmplvars:
             if not tmplvar.startswith("$"):
                 raise QueryValidationError(
@@ -300,10 +331,9 @@ class QueryMonad:
                     % tmplvar
                 )
 
-            if not parser.is_valid_tmpl_var(tmplvar):
-                raise QueryValidationError("Invalid template variable: %r" % tmplvar)
+            validate_token("tvar_name", tmplvar, "Invalid template variable: %r")
 
-            tmpl_cond = TmplVar(tvar=tmplvar[1:])
+            tmpl_cond = intern_node(TmplVar(tvar=tmplvar[1:]))
             if tmpl_cond not in state.filter.conds:
                 state.filter.conds.append(tmpl_cond)
 
@@ -314,12 +344,10 @@ class QueryMonad:
                     % (tag, value)
                 )
 
-            if not parser.is_valid_tag_name(tag):
-                raise QueryValidationError("Invalid tag name: %r" % tag)
-            if not parser.is_valid_tag_value(value):
-                raise QueryValidationError("Invalid tag value: %r" % value)
+            validate_token("tag_name", tag, "Invalid tag name: %r")
+            validate_token("tag_value", value, "Invalid tag value: %r")
 
-            tag_cond = Tag(tag=tag, value=value)
+            tag_cond = intern_node(Tag(tag=tag, value=value))
             if tag_cond not in state.filter.conds:
                 state.filter.conds.append(tag_cond)
 
@@ -329,8 +357,6 @@ class QueryMonad:
         state = self._state.clone()
         state.filter = state.filter or Filter(conds=[])
 
-        parser = QueryParser.get_instance()
-
         for tmplvar in tmplvars:
             if not tmplvar.startswith("$"):
                 raise QueryValidationError(
@@ -338,10 +364,11 @@ class QueryMonad:
                     % tmplvar
                 )
 
-            if not parser.is_valid_tmpl_var(tmplvar):
-                raise QueryValidationError("Invalid template variable: %r" % tmplvar)
+            validate_token("tvar_name", tmplvar, "Invalid template variable: %r")
 
-            tmpl_cond = TmplVar(tvar=tmplvar[1:], operator=FilterOperator.NOT_EQUAL)
+            tmpl_cond = intern_node(
+                TmplVar(tvar=tmplvar[1:], operator=FilterOperator.NOT_EQUAL)
+            )
             if tmpl_cond not in state.filter.conds:
                 state.filter.conds.append(tmpl_cond)
 
@@ -352,12 +379,12 @@ class QueryMonad:
                     % (tag, value)
                 )
 
-            if not parser.is_valid_tag_name(tag):
-                raise QueryValidationError("Invalid tag name: %r" % tag)
-            if not parser.is_valid_tag_value(value):
-                raise QueryValidationError("Invalid tag value: %r" % value)
+            validate_token("tag_name", tag, "Invalid tag name: %r")
+            validate_token("tag_value", value, "Invalid tag value: %r")
 
-            tag_cond = Tag(tag=tag, value=value, operator=FilterOperator.NOT_EQUAL)
+            tag_cond = intern_node(
+                Tag(tag=tag, value=value, operator=FilterOperator.NOT_EQUAL)
+            )
             if tag_cond not in state.filter.conds:
                 state.filter.conds.append(tag_cond)
 
@@ -383,8 +410,6 @@ class QueryMonad:
     def by(self, *tags: str) -> "QueryMonad":
         state = self._state.clone()
 
-        parser = QueryParser.get_instance()
-
         # 'func' has to be set before 'by' - otherwise it would be possible to
         # construct queries with 'by' only and that wouldn't be valid syntax
         if not state.agg:
@@ -394,20 +419,21 @@ class QueryMonad:
                 "aggregation function is not set yet" % tags_fmt
             )
 
-        by = state.agg.by or By(tags=[])
+        # build a new By rather than extending the existing one, which may be
+        # shared with other queries if it was interned
+        by_tags = list(state.agg.by.tags) if state.agg.by else []
         for tag in tags:
             if tag.startswith("$"):
                 raise QueryValidationError(
                     "Aggregation by %r must be a tag, not a template variable" % tag
                 )
 
-            if not parser.is_valid_tag_name(tag):
-                raise QueryValidationError("Invalid tag name: %r" % tag)
+            validate_token("tag_name", tag, "Invalid tag name: %r")
 
-            if tag not in by.tags:
-                by.tags.append(tag)
+            if tag not in by_tags:
+                by_tags.append(tag)
 
-        state.agg.by = by
+        state.agg.by = intern_node(By(tags=by_tags))
         return self.__class__(state)
 
     def as_count(self) -> "QueryMonad":
@@ -484,5 +510,5 @@ class QueryMonad:
 
 
 def Query(metric: str, name: Optional[str] = None) -> QueryMonad:
-    state = QueryState(metric=Metric(name=metric), name=name)
+    state = QueryState(metric=intern_node(Metric(name=metric)), name=name)
     return QueryMonad(state)
@@ -1,23 +1,117 @@
-from typing import List
+import copy
+from typing import Dict, FrozenSet, List, Mapping, Tuple
 
 from libddog.metrics.bases import FormulaNode
 from libddog.metrics.literals import Identifier
 
 
 def find_identifiers(node: FormulaNode) -> List[Identifier]:
-    if isinstance(node, Identifier):
-        return [node]
+    "Returns the identifiers found in the formula, in the order they appear."
 
-    children = []
-    for attname in dir(node):
-        value = getattr(node, attname)
-        if not isinstance(value, FormulaNode):
+    identifiers = []
+
+    stack = [node]
+    while stack:
+        current = stack.pop()
+
+        if isinstance(current, Identifier):
+            identifiers.append(current)
             continue
-        children.append(value)
 
-    identifiers = []
-    for child in children:
-        idents = find_identifiers(child)
-        identifiers.extend(idents)
+        # push in reverse so that the leftmost child is visited first
+        for child in reversed(current.children()):
+            if isinstance(child, FormulaNode):
+                stack.append(child)
 
     return identifiers
+
+
+def find_identifier_names(node: FormulaNode) -> FrozenSet[str]:
+    """
+    Returns the names of the identifiers found in the formula.
+
+    The result is cached on every node visited, so asking again about the same
+    formula (or a formula sharing subtrees with it) is cheap.
+    """
+
+    if node._identifier_names is not None:
+        return node._identifier_names
+
+    # post-order walk: a node's names are computed after those of its children
+    stack: List[Tuple[FormulaNode, bool]] = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+
+        if current._identifier_names is not None:
+            continue
+
+        if isinstance(current, Identifier):
+            current._identifier_names = frozenset((current.name,))
+            continue
+
+        children = [
+            child for child in current.children() if isinstance(child, FormulaNode)
+        ]
+
+        if children_done:
+            names: FrozenSet[str] = frozenset()
+            for child in children:
+                assert child._identifier_names is not None  # help mypy
+                names = names | child._identifier_names
+            current._identifier_names = names
+            continue
+
+        stack.append((current, True))
+        for child in children:
+            if child._identifier_names is None:
+                stack.append((child, False))
+
+    assert node._identifier_names is not None  # help mypy
+    return node._identifier_names
+
+
+def rename_identifiers(node: FormulaNode, names: Mapping[str, str]) -> FormulaNode:
+    """
+    Returns the formula with the identifiers in `names` renamed, all at once
+    (so names can be swapped).
+
+    Nodes may be interned and shared with other formulas, so they are never
+    modified: subtrees that contain none of the identifiers are reused as they
+    are, the nodes above a renamed identifier are copied.
+    """
+
+    renamed: Dict[int, FormulaNode] = {}
+
+    # post-order walk: a node is copied after its children have been
+    stack: List[Tuple[FormulaNode, bool]] = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+
+        if id(current) in renamed:
+            continue
+
+        if names.keys().isdisjoint(find_identifier_names(current)):
+            renamed[id(current)] = current
+            continue
+
+        if isinstance(current, Identifier):
+            renamed[id(current)] = Identifier(names[current.name])
+            continue
+
+        if not children_done:
+            stack.append((current, True))
+            for child in current.children():
+                stack.append((child, False))
+            continue
+
+        clone = copy.copy(current)
+        clone._frozen = False
+        clone._codegen_cache = None
+        clone._identifier_names = None
+        for attname, value in vars(current).items():
+            if isinstance(value, FormulaNode):
+                setattr(clone, attname, renamed[id(value)])
+
+        renamed[id(current)] = clone
+
+    return renamed[id(node)]
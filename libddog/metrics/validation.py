@@ -0,0 +1,242 @@
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from types import FrameType
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from libddog.parsing.query_parser import QueryParser
+
+# (filename, lineno, funcname) of each frame leading up to a deferred check,
+# outermost first
+CallSite = List[Tuple[str, int, str]]
+
+LIBDDOG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_call_site(limit: int = 20) -> CallSite:
+    """
+    Returns the stack of the caller of libddog, ie. without the frames of
+    libddog itself, up to `limit` frames deep.
+
+    Only the location of each frame is recorded, the source lines are looked
+    up if the check fails.
+    """
+
+    prefix = os.path.join(LIBDDOG_DIR, "")
+
+    frame = sys._getframe(1)
+    while frame.f_back is not None and frame.f_code.co_filename.startswith(prefix):
+        frame = frame.f_back
+
+    site: CallSite = []
+    current: Optional[FrameType] = frame
+    while current is not None and len(site) < limit:
+        code = current.f_code
+        site.append((code.co_filename, current.f_lineno, code.co_name))
+        current = current.f_back
+
+    site.reverse()
+    return site
+
+
+def format_call_site(site: CallSite) -> str:
+    summary = traceback.StackSummary.from_list(
+        [(filename, lineno, name, None) for filename, lineno, name in site]
+    )
+    return "".join(summary.format())
+
+
+class PendingCheck:
+    """
+    A check that was deferred. `seq` orders checks by when they were made, so
+    that the error reported is the one the check would have raised first.
+    """
+
+    def __init__(self, *, seq: int, site: CallSite) -> None:
+        self.seq = seq
+        self.site = site
+
+    def make_error(self, exc: Exception) -> Exception:
+        """
+        Returns `exc` with the call site that made the check in its message.
+
+        The exception is annotated rather than rebuilt, since not every
+        exception can be constructed from its message alone.
+        """
+
+        note = "The check was deferred at (most recent call last):\n%s" % (
+            format_call_site(self.site).rstrip()
+        )
+
+        if len(exc.args) == 1 and isinstance(exc.args[0], str):
+            exc.args = ("%s\n\n%s" % (exc.args[0], note),)
+        elif hasattr(exc, "add_note"):  # python 3.11+
+            exc.add_note(note)
+
+        return exc
+
+
+class PendingTokenCheck(PendingCheck):
+    def __init__(
+        self,
+        *,
+        seq: int,
+        site: CallSite,
+        exc_class: Type[Exception],
+        msg_fmt: str,
+    ) -> None:
+        super().__init__(seq=seq, site=site)
+        self.exc_class = exc_class
+        self.msg_fmt = msg_fmt
+
+
+class PendingCallCheck(PendingCheck):
+    def __init__(self, *, seq: int, site: CallSite, check: Callable[[], None]) -> None:
+        super().__init__(seq=seq, site=site)
+        self.check = check
+
+
+def check_tokens(tokens: List[Tuple[str, str]]) -> List[bool]:
+    "Checks each (rule, token) against the query grammar."
+
+    parser = QueryParser.get_instance()
+    return [parser.is_valid_token(rule, token) for rule, token in tokens]
+
+
+class DeferredValidator:
+    """
+    Collects the checks made while building queries and requests, so that
+    they can be run all at once.
+
+    Tokens (tag names, tag values, template variables) are only checked once
+    however many queries use them, and can be checked in `jobs` processes.
+    """
+
+    def __init__(self, *, jobs: int = 1) -> None:
+        self.jobs = jobs
+        self.tokens: Dict[Tuple[str, str], PendingTokenCheck] = {}
+        self.calls: List[PendingCallCheck] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tokens) + len(self.calls)
+
+    def defer_token(
+        self, rule: str, token: str, exc_class: Type[Exception], msg_fmt: str
+    ) -> None:
+        """
+        Defers checking that `token` matches `rule` of the query grammar. If it
+        doesn't `exc_class(msg_fmt % token)` is raised.
+        """
+
+        key = (rule, token)
+        if key in self.tokens:
+            return
+
+        site = get_call_site()
+        with self._lock:
+            if key not in self.tokens:
+                self._seq += 1
+                self.tokens[key] = PendingTokenCheck(
+                    seq=self._seq, site=site, exc_class=exc_class, msg_fmt=msg_fmt
+                )
+
+    def defer_call(self, check: Callable[[], None]) -> None:
+        "Defers calling `check`, which raises if the check fails."
+
+        site = get_call_site()
+        with self._lock:
+            self._seq += 1
+            self.calls.append(PendingCallCheck(seq=self._seq, site=site, check=check))
+
+    def get_invalid_tokens(self, keys: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        if self.jobs <= 1 or len(keys) < self.jobs:
+            results = check_tokens(keys)
+
+        else:
+            chunk_size = -(-len(keys) // (self.jobs * 4))
+            chunks = [
+                keys[idx : idx + chunk_size] for idx in range(0, len(keys), chunk_size)
+            ]
+
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                results = [
+                    valid
+                    for chunk_results in executor.map(check_tokens, chunks)
+                    for valid in chunk_results
+                ]
+
+        return [key for key, valid in zip(keys, results) if not valid]
+
+    def run(self) -> None:
+        """
+        Runs the pending checks and raises the error of the earliest check that
+        fails, annotated with where the check was made.
+        """
+
+        with self._lock:
+            tokens, self.tokens = self.tokens, {}
+            calls, self.calls = self.calls, []
+
+        failures: List[Tuple[PendingCheck, Exception]] = []
+
+        for key in self.get_invalid_tokens(list(tokens)):
+            token_check = tokens[key]
+            error = token_check.exc_class(token_check.msg_fmt % (key[1],))
+            failures.append((token_check, error))
+
+        for call_check in calls:
+            try:
+                call_check.check()
+            except Exception as exc:
+                failures.append((call_check, exc))
+
+        if failures:
+            check, error = min(failures, key=lambda failure: failure[0].seq)
+            raise check.make_error(error) from None
+
+
+# per thread (and asyncio task), so that only the queries built inside the
+# block are deferred
+_active_validator: contextvars.ContextVar[Optional[DeferredValidator]] = (
+    contextvars.ContextVar("active_validator", default=None)
+)
+
+
+@contextlib.contextmanager
+def deferred_validation(jobs: int = 1) -> Iterator[DeferredValidator]:
+    """
+    Defers the validation of the queries and requests constructed inside the
+    block to when the block exits, eg.
+
+        with deferred_validation():
+            dashboards = get_dashboards()
+
+    Errors are raised on exit, with the stack of the call that made the
+    invalid query or request in the message.
+
+    Deferring is opt-in because an invalid query is only reported once the
+    whole block has run, so code in the block must not rely on the queries it
+    builds being valid.
+    """
+
+    validator = DeferredValidator(jobs=jobs)
+    token = _active_validator.set(validator)
+
+    try:
+        yield validator
+    finally:
+        _active_validator.reset(token)
+
+    validator.run()
+
+
+def get_deferred_validator() -> Optional[DeferredValidator]:
+    "Returns the validator collecting checks, if validation is deferred."
+
+    return _active_validator.get()
@@ -1,5 +1,11 @@
-import pprint
-from typing import Any, Dict, Iterator
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from parsimonious.nodes import Node
+
+from libddog.parsing.query_parser import QueryParser
+
+_logger = logging.getLogger(__name__)
 
 
 class QueriedDoc:
@@ -9,7 +15,14 @@ class QueriedDoc:
 
 
 class QueryFound:
-    def __init__(self, *, doc: QueriedDoc, id: str, title: str, query: str) -> None:
+    def __init__(
+        self,
+        *,
+        doc: QueriedDoc,
+        id: Optional[int],
+        title: Optional[str],
+        query: str,
+    ) -> None:
         self.doc = doc
         self.id = id
         self.title = title
@@ -26,7 +39,7 @@ def get_queries(doc: Dict[Any, Any]) -> Iterator[QueryFound]:
     qdoc = QueriedDoc(id=id, title=title)
 
     def parse_widget(widget: Dict[Any, Any]) -> Iterator[QueryFound]:
-        widget_id = widget["id"]
+        widget_id = widget.get("id")  # not set on widgets that were never saved
         defn = widget["definition"]
         widget_title = defn.get("title")
         requests = defn.get("requests", [])
@@ -39,11 +52,11 @@ def get_queries(doc: Dict[Any, Any]) -> Iterator[QueryFound]:
         # if it's an event widget or something - skip it
         omit_types = ("note", "event_stream", "event_timeline")
         if widget_type in omit_types:
-            print("Skipping widget type: %s" % widget_type)
+            _logger.debug("Skipping widget type: %s", widget_type)
             return
 
         # sometimes 'requests' is just an object :/
-        if not type(requests) == list:
+        if not isinstance(requests, list):
             requests = [requests]
 
         for req in requests:
@@ -62,10 +75,77 @@ def get_queries(doc: Dict[Any, Any]) -> Iterator[QueryFound]:
                         doc=qdoc, id=widget_id, title=widget_title, query=query
                     )
 
+            # requests using formulas list their queries separately
+            for query_dct in req.get("queries") or []:
+                query = query_dct.get("query")
+                if query and query_dct.get("data_source", "metrics") == "metrics":
+                    yield QueryFound(
+                        doc=qdoc, id=widget_id, title=widget_title, query=query
+                    )
+
     for widget in doc["widgets"]:
         try:
             yield from parse_widget(widget)
         except Exception:
-            print("Failed to parse widget:")
-            pprint.pprint(widget)
+            _logger.debug("Failed to parse widget: %r", widget)
             raise
+
+
+class QueryTerms:
+    """
+    The metrics, tags and template variables a query string refers to.
+
+    `tags` contains (name, value) pairs: the value is None for tags that are
+    only grouped by, or filtered on without a value.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: List[str] = []
+        self.tags: List[Tuple[str, Optional[str]]] = []
+        self.tmpl_vars: List[str] = []
+
+
+def find_nodes(node: Node, expr_name: str) -> Iterator[Node]:
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.expr_name == expr_name:
+            yield current
+        else:
+            stack.extend(reversed(current.children))
+
+
+def get_query_terms(query: str, parser: Optional[QueryParser] = None) -> QueryTerms:
+    """
+    Parses `query` (which can also be a formula over several queries) and
+    returns the terms found in it, in the order they appear.
+
+    Raises parsimonious.exceptions.ParseError if the query cannot be parsed.
+    """
+
+    parser = parser or QueryParser.get_instance()
+    terms = QueryTerms()
+
+    stack = [parser.parse_st(query)]
+    while stack:
+        node = stack.pop()
+
+        if node.expr_name == "metric_name":
+            terms.metrics.append(node.text)
+
+        elif node.expr_name == "tvar_name":
+            terms.tmpl_vars.append(node.text[1:])
+
+        elif node.expr_name == "filter_keyval":
+            tag_name = next(find_nodes(node, "tag_name")).text
+            tag_value = next(find_nodes(node, "tag_value"), None)
+            terms.tags.append((tag_name, tag_value.text if tag_value else None))
+
+        elif node.expr_name == "by_item" and not node.text.startswith("$"):
+            terms.tags.append((node.text, None))
+
+        else:
+            # push in reverse so that terms are found in order
+            stack.extend(reversed(node.children))
+
+    return terms
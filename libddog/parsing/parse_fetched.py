@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import libddog
+from libddog.common.types import JsonDict
+from libddog.parsing.extract_queries import get_queries
+from libddog.parsing.query_parser import ParserBackend, QueryParser
+
+
+def get_parser_digest() -> str:
+    """
+    Returns a content hash of the code that decides the outcome of parsing a
+    fetched dashboard: the grammar, its parsers and the query extraction.
+    """
+
+    proj_root = Path(__file__).parent
+
+    hasher = hashlib.sha256(libddog.__version__.encode())
+    filenames = (
+        "grammar.txt",
+        "query_parser.py",
+        "recursive_descent.py",
+        "extract_queries.py",
+    )
+    for filename in filenames:
+        hasher.update(proj_root.joinpath(filename).read_bytes())
+
+    return hasher.hexdigest()
+
+
+class ParsedFile:
+    """
+    The outcome of parsing the queries of one fetched dashboard, along with
+    what identifies the content of the file that was parsed.
+
+    `error` is set if the file itself could not be loaded, in which case no
+    queries were parsed.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int,
+        mtime_ns: int,
+        digest: str,
+        num_queries: int = 0,
+        failures: Optional[List[str]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.num_queries = num_queries
+        self.failures = failures or []
+        self.error = error
+
+    def as_dict(self) -> JsonDict:
+        return {
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "digest": self.digest,
+            "num_queries": self.num_queries,
+            "failures": self.failures,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, dct: JsonDict) -> "ParsedFile":
+        return cls(
+            size=dct["size"],
+            mtime_ns=dct["mtime_ns"],
+            digest=dct["digest"],
+            num_queries=dct["num_queries"],
+            failures=dct["failures"],
+            error=dct["error"],
+        )
+
+
+class ParseManifest:
+    """
+    An on-disk record of the outcome of parsing each file in a download
+    directory, so that files that haven't changed since the last run don't
+    have to be parsed again.
+
+    The entries are only returned if they were recorded by the same version of
+    the grammar and query extraction, and with the same parser `backend`,
+    since changing any of them can change the outcome for every file.
+
+    The backend defaults to the grammar, since the point of parsing fetched
+    dashboards is to check grammar.txt against them.
+    """
+
+    _format_version = 2
+
+    def __init__(
+        self, filepath: Path, *, backend: ParserBackend = ParserBackend.GRAMMAR
+    ) -> None:
+        self.filepath = filepath
+        self.backend = backend
+
+    def get(self) -> Dict[str, ParsedFile]:
+        try:
+            with open(self.filepath, "r") as fl:
+                content: Any = json.load(fl)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+        if not isinstance(content, dict):
+            return {}
+
+        if content.get("format_version") != self._format_version:
+            return {}
+
+        if content.get("parser_digest") != get_parser_digest():
+            return {}
+
+        if content.get("backend") != self.backend.value:
+            return {}
+
+        entries = content.get("entries")
+        if not isinstance(entries, dict):
+            return {}
+
+        try:
+            return {
+                filename: ParsedFile.from_dict(dct) for filename, dct in entries.items()
+            }
+        except (KeyError, TypeError):
+            return {}
+
+    def put(self, entries: Dict[str, ParsedFile]) -> None:
+        content = {
+            "format_version": self._format_version,
+            "parser_digest": get_parser_digest(),
+            "backend": self.backend.value,
+            "entries": {
+                filename: entry.as_dict() for filename, entry in entries.items()
+            },
+        }
+
+        os.makedirs(self.filepath.parent, exist_ok=True)
+
+        # write to a temp file first so that an interrupted run never leaves a
+        # partially written manifest
+        tmp_filepath = self.filepath.with_suffix(".tmp")
+        with open(tmp_filepath, "w") as fl:
+            json.dump(content, fl, indent=2, sort_keys=True)
+            fl.write("\n")
+
+        os.replace(tmp_filepath, self.filepath)
+
+
+def parse_file_content(
+    content: bytes, *, size: int, mtime_ns: int, digest: str, parser: QueryParser
+) -> ParsedFile:
+    parsed = ParsedFile(size=size, mtime_ns=mtime_ns, digest=digest)
+
+    try:
+        doc = json.loads(content)
+        queries = [found.query for found in get_queries(doc)]
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        parsed.error = "%s: %s" % (exc.__class__.__name__, exc)
+        return parsed
+
+    for query in queries:
+        parsed.num_queries += 1
+        if not parser.is_valid_query(query):
+            parsed.failures.append(query)
+
+    return parsed
+
+
+class ParseRun:
+    """
+    The outcome of parsing a download directory: `files` has an entry for
+    every file in it, whether it was parsed on this run (`reparsed`) or its
+    outcome was taken from the manifest.
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, ParsedFile] = {}
+        self.reparsed: List[str] = []
+
+    @property
+    def num_queries(self) -> int:
+        return sum(parsed.num_queries for parsed in self.files.values())
+
+    @property
+    def num_failures(self) -> int:
+        return sum(len(parsed.failures) for parsed in self.files.values())
+
+    @property
+    def num_errors(self) -> int:
+        return sum(1 for parsed in self.files.values() if parsed.error)
+
+
+def parse_fetched(
+    download_dir: Path,
+    manifest: ParseManifest,
+    parser: Optional[QueryParser] = None,
+) -> ParseRun:
+    """
+    Parses the queries of every dashboard in `download_dir`, skipping the
+    files whose content hasn't changed since the outcome recorded in
+    `manifest`, and records the outcome of this run in `manifest`.
+
+    The queries are parsed with the backend of `manifest` unless `parser` is
+    given.
+
+    A file whose size and modification time are unchanged is assumed to be
+    unchanged without reading it. Otherwise it's hashed, and only parsed if
+    its content has changed.
+    """
+
+    parser = parser or QueryParser(backend=manifest.backend)
+    previous = manifest.get()
+    run = ParseRun()
+
+    for filepath in sorted(download_dir.iterdir()):
+        if filepath.name.startswith(".") or not filepath.is_file():
+            continue
+
+        stat = filepath.stat()
+        entry = previous.get(filepath.name)
+
+        if (
+            entry is not None
+            and entry.size == stat.st_size
+            and entry.mtime_ns == stat.st_mtime_ns
+        ):
+            run.files[filepath.name] = entry
+            continue
+
+        content = filepath.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+
+        if entry is not None and entry.digest == digest:
+            # touched but not changed
+            entry.size = stat.st_size
+            entry.mtime_ns = stat.st_mtime_ns
+            run.files[filepath.name] = entry
+            continue
+
+        run.files[filepath.name] = parse_file_content(
+            content,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            digest=digest,
+            parser=parser,
+        )
+        run.reparsed.append(filepath.name)
+
+    manifest.put(run.files)
+    return run
@@ -1,26 +1,49 @@
+"""
+Parses the formulas of requests, which combine the queries of the request by
+name, eg. "100 * (q_4xx / q_all)", into FormulaNode trees.
+
+Unlike queries (see grammar.txt), formulas have the usual precedence of
+arithmetic operators, so "a + b * c" is Add(a, Mul(b, c)). The language is:
+
+    formula     = ws sum ws
+    sum         = product ( ws ("+" / "-") ws product )*
+    product     = atom ( ws ("*" / "/") ws atom )*
+    atom        = number / func_call / identifier / "(" ws sum ws ")"
+    func_call   = identifier "(" ws arg ( ws "," ws arg )* ws ")"
+    arg         = sum / string
+    number      = ~"-?[0-9]+(\\.[0-9]+)?"
+    identifier  = ~"[a-zA-Z_][a-zA-Z_0-9]*"
+    string      = ~"'[^']*'" / ~'"[^"]*"'
+
+Operators are left associative. Since BinaryFormula.codegen() puts every
+operation in parentheses, parsing the formula generated by a tree returns the
+same tree.
+"""
+
 import re
-from typing import List, Set
+from typing import Any, Dict, List, Set, Type
 
-import libddog.metrics.functions
-from libddog.metrics.functions import Function
+from libddog.metrics.bases import FormulaNode
+from libddog.metrics.formulas import Add, BinaryFormula, Div, Mul, Sub
+from libddog.metrics.functions import FUNCTIONS_BY_NAME
+from libddog.metrics.literals import Float, Identifier, Int
+from libddog.parsing.query_parser import UnsupportedQueryError
+from libddog.parsing.recursive_descent import Tokenizer
 
 rx_identifier = re.compile("[a-zA-Z_][a-zA-Z_0-9]+")
 
+rx_name = re.compile("[a-zA-Z_][a-zA-Z_0-9]*")
+rx_number = re.compile(r"-?[0-9]+(\.[0-9]+)?")
+rx_string = re.compile(r"\"[^\"]*\"|'[^']*'")
 
-def get_func_names() -> List[str]:
-    # TODO: will also include base classes which are not function names
-    names = []
-    mod = libddog.metrics.functions
+SUM_OPS: Dict[str, Type[BinaryFormula]] = {"+": Add, "-": Sub}
+PRODUCT_OPS: Dict[str, Type[BinaryFormula]] = {"*": Mul, "/": Div}
 
-    for attname in dir(mod):
-        cls = getattr(mod, attname)
-        try:
-            if issubclass(cls, Function):
-                names.append(cls.__name__)
-        except TypeError:
-            pass
+FUNC_NAMES = frozenset(FUNCTIONS_BY_NAME)
 
-    return names
+
+def get_func_names() -> List[str]:
+    return list(FUNCTIONS_BY_NAME)
 
 
 def parse_formula_identifiers(text: str) -> Set[str]:
@@ -43,4 +66,135 @@ def parse_formula_identifiers(text: str) -> Set[str]:
 
         idents.add(match.group())
 
-    return idents - set(get_func_names())
+    return idents - FUNC_NAMES
+
+
+class FormulaParser(Tokenizer):
+    """
+    Parses a formula string, with a method for each rule of the language.
+    Unlike RecursiveDescentParser, a rule that doesn't match raises, since
+    no rule has alternatives that need to be tried after a failure.
+    """
+
+    def parse(self) -> FormulaNode:
+        self.skip_ws()
+        node = self.sum()
+        self.skip_ws()
+
+        if self.pos != len(self.text):
+            self.expect("operator")
+            raise self.syntax_error()
+
+        return node
+
+    def binops(self, ops: Dict[str, Type[BinaryFormula]], operand: Any) -> Any:
+        node = operand()
+
+        while True:
+            start = self.pos
+            self.skip_ws()
+
+            symbol = self.peek()
+            if symbol not in ops:
+                self.pos = start
+                return node
+
+            self.pos += 1
+            self.skip_ws()
+            node = ops[symbol](node, operand())
+
+    def sum(self) -> FormulaNode:
+        # sum = product ( ws ("+" / "-") ws product )*
+        node: FormulaNode = self.binops(SUM_OPS, self.product)
+        return node
+
+    def product(self) -> FormulaNode:
+        # product = atom ( ws ("*" / "/") ws atom )*
+        node: FormulaNode = self.binops(PRODUCT_OPS, self.atom)
+        return node
+
+    def atom(self) -> FormulaNode:
+        # atom = number / func_call / identifier / "(" ws sum ws ")"
+        number = self.pattern(rx_number, "number")
+        if number is not None:
+            return Float(float(number)) if "." in number else Int(int(number))
+
+        offset = self.pos
+        name = self.pattern(rx_name, "identifier")
+        if name is not None:
+            if self.peek() == "(":
+                return self.func_call(offset, name)
+            return Identifier(name)
+
+        if self.literal("("):
+            self.skip_ws()
+            node = self.sum()
+            self.skip_ws()
+            self.require(")")
+            return node
+
+        raise self.syntax_error()
+
+    def func_call(self, offset: int, name: str) -> FormulaNode:
+        # func_call = identifier "(" ws arg ( ws "," ws arg )* ws ")"
+        self.require("(")
+        self.skip_ws()
+
+        args = [self.arg()]
+        while True:
+            self.skip_ws()
+            if not self.literal(","):
+                break
+            self.skip_ws()
+            args.append(self.arg())
+
+        self.require(")")
+
+        func_cls = FUNCTIONS_BY_NAME.get(name)
+        if func_cls is None:
+            raise UnsupportedQueryError(
+                "Unknown function %r" % name, query=self.text, offset=offset
+            )
+
+        node, rest = args[0], args[1:]
+        if isinstance(node, str):
+            raise UnsupportedQueryError(
+                "String used as the node of %r" % name, query=self.text, offset=offset
+            )
+
+        # like QueryVisitor, the other arguments are passed as plain values
+        values = [arg.value if isinstance(arg, (Int, Float)) else arg for arg in rest]
+
+        try:
+            func: FormulaNode = func_cls(node, *values)  # type: ignore
+        except Exception as exc:
+            raise UnsupportedQueryError(
+                "Failed to build %r (%s)" % (name, exc), query=self.text, offset=offset
+            ) from exc
+
+        return func
+
+    def arg(self) -> Any:
+        # arg = sum / string
+        string = self.pattern(rx_string, "string")
+        if string is not None:
+            return string[1:-1]
+
+        return self.sum()
+
+    def require(self, literal: str) -> None:
+        if not self.literal(literal):
+            raise self.syntax_error()
+
+
+def parse_formula(text: str) -> FormulaNode:
+    """
+    Parses a formula into a FormulaNode tree, eg. "abs(a) / 2" into
+    Div(abs(Identifier("a")), Int(2)).
+
+    Raises QuerySyntaxError if the formula cannot be parsed, and
+    UnsupportedQueryError if it parses but has no FormulaNode tree (eg. it
+    calls a function that libddog doesn't have).
+    """
+
+    return FormulaParser(text, track_expected=True).parse()
@@ -1,14 +1,63 @@
+import enum
 from pathlib import Path
+from typing import TYPE_CHECKING, Union
 
 from parsimonious import Grammar
 from parsimonious.exceptions import IncompleteParseError, ParseError
 from parsimonious.nodes import Node
 
+if TYPE_CHECKING:
+    from libddog.metrics.bases import FormulaNode, QueryNode
+
+
+class QueryParseError(Exception):
+    """
+    A query string could not be parsed into an AST. `offset` is the position
+    in `query` where parsing failed.
+    """
+
+    def __init__(self, msg: str, *, query: str, offset: int) -> None:
+        super().__init__(
+            "%s at offset %d:\n%s\n%s^" % (msg, offset, query, " " * offset)
+        )
+        self.query = query
+        self.offset = offset
+
+
+class QuerySyntaxError(QueryParseError):
+    "The query string is not in the language of the query grammar."
+
+
+class UnsupportedQueryError(QueryParseError):
+    """
+    The query string is in the language of the query grammar, but uses
+    something that cannot be represented as an AST, eg. an unknown function.
+    """
+
+
+class ParserBackend(enum.Enum):
+    # parsimonious, over grammar.txt, with QueryVisitor to build the AST
+    GRAMMAR = "grammar"
+    # libddog.parsing.recursive_descent, much faster
+    RECURSIVE_DESCENT = "recursive-descent"
+
 
 class QueryParser:
+    """
+    Parses query strings.
+
+    `parse_st` always returns the parsimonious syntax tree of a query. The
+    other methods use `backend`, so that the recursive-descent parser can be
+    checked against the grammar it implements.
+    """
+
     _instance = None
 
-    def __init__(self) -> None:
+    def __init__(
+        self, *, backend: ParserBackend = ParserBackend.RECURSIVE_DESCENT
+    ) -> None:
+        self.backend = backend
+
         proj_root = Path(__file__).parent
         grammar_filepath = proj_root.joinpath("grammar.txt").absolute()
         content = open(grammar_filepath).read()
@@ -24,13 +73,64 @@ class QueryParser:
     def parse_st(self, query_string: str) -> Node:
         return self.grammar.parse(query_string)
 
-    # def parse_ast(self, query_string: str) -> QueryNode:
-    #     from libddog.parsing.query_visitor import QueryVisitor
+    def parse_ast(self, query_string: str) -> "Union[FormulaNode, QueryNode]":
+        """
+        Parses a query, or a formula over queries, into the AST that would
+        generate it.
+
+        Raises QuerySyntaxError if the query cannot be parsed, and
+        UnsupportedQueryError if it parses but has no AST.
+        """
+
+        if self.backend is ParserBackend.RECURSIVE_DESCENT:
+            from libddog.parsing.recursive_descent import parse_query
+
+            return parse_query(query_string)
 
-    #     st = self.parse_st(query_string)
-    #     visitor = QueryVisitor()
-    #     ast: QueryNode = visitor.visit(st)
-    #     return ast
+        from parsimonious.exceptions import VisitationError
+
+        from libddog.parsing.query_visitor import QueryVisitor, find_string_operand
+
+        try:
+            st = self.parse_st(query_string)
+        except (IncompleteParseError, ParseError) as exc:
+            raise QuerySyntaxError(
+                "Failed to parse query", query=query_string, offset=exc.pos
+            ) from exc
+
+        try:
+            ast: Union[FormulaNode, QueryNode] = QueryVisitor().visit(st)
+        except VisitationError as exc:
+            # the first line of the message is the original error, the rest
+            # is the whole parse tree
+            raise UnsupportedQueryError(
+                "Failed to build AST (%s)" % str(exc).splitlines()[0],
+                query=query_string,
+                offset=0,
+            ) from exc
+
+        # strings are only meaningful as the arguments of functions
+        if find_string_operand(ast) is not None:
+            raise UnsupportedQueryError(
+                "String outside of function arguments", query=query_string, offset=0
+            )
+
+        return ast
+
+    def is_valid_query(self, query_string: str) -> bool:
+        "Checks that the query is in the language of the grammar."
+
+        if self.backend is ParserBackend.RECURSIVE_DESCENT:
+            from libddog.parsing.recursive_descent import check_query_syntax
+
+            return check_query_syntax(query_string) is None
+
+        try:
+            self.parse_st(query_string)
+        except (IncompleteParseError, ParseError):
+            return False
+
+        return True
 
     def is_valid_token(self, rule: str, token: str) -> bool:
         try:
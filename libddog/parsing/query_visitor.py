@@ -1,12 +1,11 @@
 import enum
-from typing import Any, List, Type
+from typing import Any, Iterable, List, Optional, Type
 
 from parsimonious.nodes import Node, NodeVisitor
 
 import libddog.metrics.formulas
-import libddog.metrics.functions
 from libddog.metrics.formulas import BinaryFormula, Comma
-from libddog.metrics.functions import Function
+from libddog.metrics.functions import FUNCTIONS_BY_NAME, Function
 from libddog.metrics.literals import Int
 from libddog.metrics.query import (
     AggFunc,
@@ -34,8 +33,12 @@ def resolve_binop(symbol: str) -> Type[BinaryFormula]:
     mod = libddog.metrics.formulas
     for attname in dir(mod):
         cls = getattr(mod, attname)
-        if issubclass(cls, BinaryFormula) and cls.symbol == symbol:
-            return cls  # type: ignore
+        if (
+            isinstance(cls, type)
+            and issubclass(cls, BinaryFormula)
+            and cls.symbol == symbol
+        ):
+            return cls
 
     raise ParseError("Failed to resolve binary operator using input: %r" % symbol)
 
@@ -50,16 +53,42 @@ def reverse_enum(enum_cls: Type[enum.Enum], literal: str) -> enum.Enum:
 
 
 def resolve_func(func_name: str) -> Type[Function]:
-    mod = libddog.metrics.functions
-    for attname in dir(mod):
-        cls = getattr(mod, attname)
-        try:
-            if issubclass(cls, Function) and func_name == attname:
-                return cls  # type: ignore
-        except TypeError:
-            pass  # issubclass raised
+    func = FUNCTIONS_BY_NAME.get(func_name)
+    if func is None:
+        raise ParseError("Failed to resolve function name using input: %r" % func_name)
+
+    return func
+
+
+def iter_comma_operands(node: Any) -> Iterable[Any]:
+    "Comma(a, Comma(b, c)) -> a, b, c"
+
+    while isinstance(node, Comma):
+        yield node.left
+        node = node.right
 
-    raise ParseError("Failed to resolve function name using input: %r" % func_name)
+    yield node
+
+
+def find_string_operand(node: Any) -> Optional[str]:
+    """
+    Returns a string found as the operand of a binary operator anywhere in
+    the tree. Strings are only meaningful as the arguments of functions,
+    which have been taken out of the tree by then.
+    """
+
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, str):
+            return current
+
+        if isinstance(current, BinaryFormula):
+            stack.extend([current.left, current.right])
+        elif isinstance(current, Function):
+            stack.extend(current.children())
+
+    return None
 
 
 class QueryVisitor(NodeVisitor):  # type: ignore
@@ -82,10 +111,6 @@ class QueryVisitor(NodeVisitor):  # type: ignore
 
         if operator and right:
             binop_cls = resolve_binop(operator)
-            if isinstance(right, int):
-                right = Int(right)
-            # elif isinstance(right, str):
-            #     right = Str(right)
             binop = binop_cls(left, right)
 
         return binop
@@ -96,34 +121,30 @@ class QueryVisitor(NodeVisitor):  # type: ignore
     def visit_func_call(self, node: Node, visited_children: List[Node]) -> Any:
         name = visited_children[0]
 
-        fst = visited_children[3]
-        args = [fst]
-
         # we run into a problem here because the arguments to the function have
         # already been parsed as a Comma binop and we have to actually undo that
         # here
-        if isinstance(fst, Comma):
-            left: Any = fst.left
-            right: Any = fst.right
-
-            assert not isinstance(left, Comma)
-            assert not isinstance(right, Comma)
+        node, *rest = iter_comma_operands(visited_children[3])
+        if isinstance(node, str):
+            raise ParseError("String used as the node of %r" % name)
 
-            if isinstance(left, Int):
-                left = left.value
-            if isinstance(right, Int):
-                right = right.value
+        # the other arguments are passed as plain values
+        args = [arg.value if isinstance(arg, Int) else arg for arg in rest]
+        if not all(isinstance(arg, (int, str)) for arg in args):
+            raise ParseError("Expression used as an argument of %r" % name)
 
-            args = [left, right]
-
-        func = resolve_func(name)
-        return func(*args)
+        func: Any = resolve_func(name)
+        return func(node, *args)
 
     def visit_paren_expr(self, node: Node, visited_children: List[Node]) -> Any:
         return visited_children[2]
 
     def visit_operand(self, node: Node, visited_children: List[Node]) -> Any:
-        return visited_children[0]
+        operand = visited_children[0]
+        if isinstance(operand, int):
+            operand = Int(operand)
+
+        return operand
 
     def visit_binop(self, node: Node, visited_children: List[Node]) -> Any:
         return node.text
@@ -135,7 +156,7 @@ class QueryVisitor(NodeVisitor):  # type: ignore
 
     def visit_query(self, node: Node, visited_children: List[Node]) -> Any:
         agg_func = None
-        if visited_children[0]:
+        if isinstance(visited_children[0], list):
             agg_func = visited_children[0][0]
 
         name = visited_children[1]
@@ -157,6 +178,10 @@ class QueryVisitor(NodeVisitor):  # type: ignore
             for rest in visited_children[5]:
                 funcs.append(rest[0])
 
+        # 'by' and 'as' are part of the aggregation
+        if not agg_func and (by or as_):
+            raise ParseError("'by' or 'as' without an aggregation")
+
         agg = None
         if agg_func:
             agg = Aggregation(func=agg_func, by=by, as_=as_)
@@ -175,12 +200,7 @@ class QueryVisitor(NodeVisitor):  # type: ignore
         return reverse_enum(AggFunc, node.text)
 
     def visit_metric_name(self, node: Node, visited_children: List[Node]) -> Any:
-        elems = [visited_children[0].text]
-
-        for dot, part in visited_children[1]:
-            elems.extend([dot.text, part[0].text])
-
-        return "".join(elems)
+        return node.text
 
     def visit_filter(self, node: Node, visited_children: List[Node]) -> Any:
         cond = visited_children[2]
@@ -190,12 +210,17 @@ class QueryVisitor(NodeVisitor):  # type: ignore
             cond = rest[3]
             conds.append(cond)
 
-        return Filter(conds=conds)
+        # {*} is the same as no filter at all
+        conds = [cond for cond in conds if cond is not None]
+        return Filter(conds=conds) if conds else None
 
     def visit_filter_item(self, node: Node, visited_children: List[Node]) -> Any:
         if isinstance(visited_children[0], Tag):
             return visited_children[0]
 
+        elif node.text == "*":
+            return None
+
         elif visited_children[0].startswith("$") and len(visited_children[0]) > 1:
             return TmplVar(tvar=visited_children[0][1:])
 
@@ -235,7 +260,10 @@ class QueryVisitor(NodeVisitor):  # type: ignore
 
     def visit_rollup(self, node: Node, visited_children: List[Node]) -> Any:
         func = visited_children[4]
-        period = visited_children[5][0][3]
+        period = None
+        if isinstance(visited_children[5], list):
+            period = visited_children[5][0][3]
+
         return Rollup(func=func, period_s=period)
 
     def visit_rollup_func(self, node: Node, visited_children: List[Node]) -> Any:
@@ -243,7 +271,10 @@ class QueryVisitor(NodeVisitor):  # type: ignore
 
     def visit_fill(self, node: Node, visited_children: List[Node]) -> Any:
         func = visited_children[4]
-        limit = visited_children[5][0][3]
+        limit = None
+        if isinstance(visited_children[5], list):
+            limit = visited_children[5][0][3]
+
         return Fill(func=func, limit_s=limit)
 
     def visit_fill_arg(self, node: Node, visited_children: List[Node]) -> Any:
@@ -261,6 +292,10 @@ class QueryVisitor(NodeVisitor):  # type: ignore
     def visit_tag_name(self, node: Node, visited_children: List[Node]) -> Any:
         return node.text
 
+    def visit_string(self, node: Node, visited_children: List[Node]) -> Any:
+        # without the quotes
+        return node.text[1:-1]
+
     def visit_tvar_name(self, node: Node, visited_children: List[Node]) -> Any:
         dollar = node.children[0].text
         tvar = node.children[1].text
@@ -0,0 +1,791 @@
+"""
+A hand-written parser for the language of grammar.txt, which builds the AST
+of a query directly instead of building a parsimonious syntax tree first.
+
+It implements the grammar exactly, PEG semantics included: the alternatives of
+a rule are tried in order, and an optional part that fails part of the way
+through matches nothing. It also builds the same trees as QueryVisitor, so
+binary operators are right associative and have no precedence, like in the
+grammar. tests_unit/parsing/test_recursive_descent.py checks both against the
+grammar.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Type, Union
+
+from libddog.metrics.bases import FormulaNode, QueryNode
+from libddog.metrics.formulas import Add, BinaryFormula, Comma, Div, Mul, Sub
+from libddog.metrics.literals import Int
+from libddog.metrics.query import (
+    AggFunc,
+    Aggregation,
+    As,
+    By,
+    Fill,
+    FillFunc,
+    Filter,
+    FilterCond,
+    FilterOperator,
+    Metric,
+    QueryState,
+    Rollup,
+    RollupFunc,
+    Tag,
+    TmplVar,
+)
+from libddog.parsing.query_parser import (
+    QuerySyntaxError,
+    UnsupportedQueryError,
+)
+from libddog.parsing.query_visitor import find_string_operand, resolve_func
+
+
+class KeywordTrie:
+    """
+    Matches one of a list of keywords at a position in a string, in a single
+    pass over the string whatever the number of keywords.
+
+    Like an ordered choice of literals in a PEG, if several keywords match the
+    one that comes first in the list wins.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords = list(keywords)
+        self.max_len = max(len(keyword) for keyword in self.keywords)
+
+        # each node maps a character to the next node, and "" to the index of
+        # the keyword that ends at this node
+        self.root: Dict[str, Any] = {}
+        for idx, keyword in enumerate(self.keywords):
+            node = self.root
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = idx
+
+    def match(self, text: str, pos: int) -> Optional[str]:
+        best: Optional[int] = None
+
+        node: Any = self.root
+        for char in text[pos : pos + self.max_len]:
+            node = node.get(char)
+            if node is None:
+                break
+
+            idx = node.get("")
+            if idx is not None and (best is None or idx < best):
+                best = idx
+
+        return None if best is None else self.keywords[best]
+
+
+# the literals of the grammar rules of the same names, in the same order
+FUNC_NAMES = KeywordTrie(
+    [
+        "abs",
+        "anomalies",
+        "autosmooth",
+        "clamp_max",
+        "clamp_min",
+        "count_nonzero",
+        "count_not_null",
+        "cumsum",
+        "cutoff_max",
+        "cutoff_min",
+        "day_before",
+        "default_zero",
+        "derivative",
+        "diff",
+        "dt",
+        "ewma_10",
+        "ewma_20",
+        "ewma_3",
+        "ewma_5",
+        "exclude_null",
+        "forecast",
+        "hour_before",
+        "integral",
+        "log10",
+        "log2",
+        "median_3",
+        "median_5",
+        "median_7",
+        "median_9",
+        "monotonic_diff",
+        "month_before",
+        "moving_rollup",
+        "outliers",
+        "per_hour",
+        "per_minute",
+        "per_second",
+        "piecewise_constant",
+        "robust_trend",
+        "timeshift",
+        "top10",
+        "top",
+        "trend_line",
+        "week_before",
+    ]
+)
+AGG_FUNCS = KeywordTrie(["avg", "max", "min", "sum"])
+ROLLUP_FUNCS = KeywordTrie(["avg", "count", "max", "min", "sum"])
+FILL_FUNCS = KeywordTrie(["last", "linear", "null", "zero"])
+AS_FUNCS = KeywordTrie(["rate", "count"])
+
+BINOPS: Dict[str, Type[BinaryFormula]] = {
+    "+": Add,
+    "-": Sub,
+    "*": Mul,
+    "/": Div,
+    ",": Comma,
+}
+
+# the regular expressions of the grammar, combined where the grammar uses a
+# sequence or choice of them
+rx_ws = re.compile(r"\s*")
+rx_metric_name = re.compile(r"[_a-zA-Z][_a-zA-Z0-9]*(?:\.[_a-zA-Z0-9]*)*")
+rx_tag_name = re.compile(r"[_a-zA-Z][-_./a-zA-Z0-9]*")
+rx_tag_value = re.compile(r"\*[-./:_a-zA-Z0-9]*|[-./:_a-zA-Z0-9]+\*?")
+rx_string = re.compile(r"\"[^\"]*\"|'[^']*'")
+rx_integer = re.compile(r"-?[0-9]+")
+
+OPERAND_FST = frozenset("_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+INTEGER_FST = frozenset("-0123456789")
+
+# returned by rules that failed to match
+FAILED: Any = object()
+
+
+class QuotedString(str):
+    "A string operand, which remembers where it was found for error messages."
+
+    offset = 0
+
+
+class Tokenizer:
+    """
+    Matches the tokens of the query language at the current position in the
+    query string.
+
+    Which tokens can appear depends on where we are in the query (eg. ':' is
+    part of a tag value but not of a tag name), so tokens are matched on
+    demand by the parser rather than split up front.
+
+    If `track_expected` is set, a token that isn't found is recorded as
+    expected, so that a failed parse can report the furthest position reached
+    and what could have come next. It's only needed to report an error, so a
+    failed parse is simply done again with it set.
+    """
+
+    def __init__(self, text: str, *, track_expected: bool = False) -> None:
+        self.text = text
+        self.pos = 0
+        self.track_expected = track_expected
+        self.fail_pos = 0
+        self.expected: Set[str] = set()
+
+    def expect(self, what: str) -> None:
+        if self.pos > self.fail_pos:
+            self.fail_pos = self.pos
+            self.expected = {what}
+        elif self.pos == self.fail_pos:
+            self.expected.add(what)
+
+    def skip_ws(self) -> None:
+        self.pos = rx_ws.match(self.text, self.pos).end()  # type: ignore
+
+    def peek(self) -> str:
+        return self.text[self.pos : self.pos + 1]
+
+    def literal(self, literal: str) -> bool:
+        if self.text.startswith(literal, self.pos):
+            self.pos += len(literal)
+            return True
+
+        if self.track_expected:
+            self.expect(repr(literal))
+        return False
+
+    def keyword(self, trie: KeywordTrie, what: str) -> Optional[str]:
+        keyword = trie.match(self.text, self.pos)
+        if keyword is None:
+            if self.track_expected:
+                self.expect(what)
+            return None
+
+        self.pos += len(keyword)
+        return keyword
+
+    def pattern(self, rx: "re.Pattern[str]", what: str) -> Optional[str]:
+        match = rx.match(self.text, self.pos)
+        if match is None:
+            if self.track_expected:
+                self.expect(what)
+            return None
+
+        self.pos = match.end()
+        return match.group()
+
+    def syntax_error(self) -> QuerySyntaxError:
+        expected = " or ".join(sorted(self.expected))
+        return QuerySyntaxError(
+            "Expected %s" % expected, query=self.text, offset=self.fail_pos
+        )
+
+
+class RecursiveDescentParser(Tokenizer):
+    """
+    Parses a query string, with a method for each rule of the grammar.
+
+    A rule returns FAILED, with the position unchanged, if it doesn't match.
+    If `build` is false only the syntax is checked and rules return None
+    instead of nodes.
+
+    Something that is valid syntax but can't be turned into an AST does not
+    stop the parse, so that a syntax error further on is still reported
+    first. The first such problem is kept in `unsupported`.
+    """
+
+    def __init__(
+        self, text: str, *, build: bool = True, track_expected: bool = False
+    ) -> None:
+        super().__init__(text, track_expected=track_expected)
+        self.build = build
+        self.unsupported: Optional[UnsupportedQueryError] = None
+
+    def unsupported_at(self, offset: int, msg: str) -> None:
+        if self.build and self.unsupported is None:
+            self.unsupported = UnsupportedQueryError(
+                msg, query=self.text, offset=offset
+            )
+
+    def parse(self) -> Any:
+        node = self.formula()
+        if node is FAILED or self.pos != len(self.text):
+            if not self.track_expected:
+                # parse again to find out what was expected, which raises
+                retry = RecursiveDescentParser(
+                    self.text, build=False, track_expected=True
+                )
+                retry.parse()
+
+            if node is not FAILED:
+                self.expect("end of query")
+            raise self.syntax_error()
+
+        if self.unsupported is not None:
+            raise self.unsupported
+
+        if self.build:
+            # strings are only meaningful as the arguments of functions
+            operand = find_string_operand(node)
+            if isinstance(operand, QuotedString):
+                raise UnsupportedQueryError(
+                    "String outside of function arguments",
+                    query=self.text,
+                    offset=operand.offset,
+                )
+
+        return node
+
+    # formulas
+
+    def formula(self) -> Any:
+        # formula = expr_ex_formula ( ws binop ws expr )*
+        #
+        # the nested expr consumes every operator that follows, so the
+        # repetition can only match once
+        left = self.expr_ex_formula()
+        if left is FAILED:
+            return FAILED
+
+        start = self.pos
+        self.skip_ws()
+
+        symbol = self.peek()
+        if symbol not in BINOPS:
+            if self.track_expected:
+                self.expect("operator")
+            self.pos = start
+            return left
+
+        offset = self.pos
+        self.pos += 1
+        self.skip_ws()
+
+        right = self.formula()
+        if right is FAILED:
+            self.pos = start
+            return left
+
+        if not self.build:
+            return None
+
+        for operand in (left, right):
+            if symbol != "," and isinstance(operand, QuotedString):
+                self.unsupported_at(
+                    operand.offset, "String used as an operand of %r" % symbol
+                )
+
+        return BINOPS[symbol](left, right)
+
+    def expr_ex_formula(self) -> Any:
+        # expr_ex_formula = func_call / paren_expr / operand
+        node = self.func_call()
+        if node is not FAILED:
+            return node
+
+        node = self.paren_expr()
+        if node is not FAILED:
+            return node
+
+        return self.operand()
+
+    def func_call(self) -> Any:
+        # func_call = func_name "(" ws expr ( ws "," ws expr )* ws ")"
+        #
+        # like in formula, expr consumes the commas that follow so that the
+        # arguments form a single Comma expression
+        start = self.pos
+
+        name = self.keyword(FUNC_NAMES, "function name")
+        if name is None:
+            return FAILED
+
+        if not self.literal("("):
+            self.pos = start
+            return FAILED
+
+        self.skip_ws()
+        args = self.formula()
+        if args is FAILED:
+            self.pos = start
+            return FAILED
+
+        self.skip_ws()
+        if not self.literal(")"):
+            self.pos = start
+            return FAILED
+
+        if not self.build:
+            return None
+
+        return self.build_func_call(start, name, args)
+
+    def build_func_call(self, offset: int, name: str, args: Any) -> Any:
+        values = list(iter_comma_operands(args))
+
+        node = values[0]
+        if isinstance(node, QuotedString):
+            self.unsupported_at(node.offset, "String used as the node of %r" % name)
+            return None
+
+        # like QueryVisitor, the other arguments are passed as plain values
+        rest: List[Any] = []
+        for value in values[1:]:
+            if isinstance(value, Int):
+                rest.append(value.value)
+            elif isinstance(value, QuotedString):
+                rest.append(str(value))
+            else:
+                self.unsupported_at(
+                    offset, "Expression used as an argument of %r" % name
+                )
+                return None
+
+        try:
+            func_cls: Any = resolve_func(name)
+            return func_cls(node, *rest)
+        except Exception as exc:
+            self.unsupported_at(offset, "Failed to build %r (%s)" % (name, exc))
+            return None
+
+    def paren_expr(self) -> Any:
+        # paren_expr = "(" ws expr ws ")"
+        start = self.pos
+
+        if not self.literal("("):
+            return FAILED
+
+        self.skip_ws()
+        node = self.formula()
+        if node is FAILED:
+            self.pos = start
+            return FAILED
+
+        self.skip_ws()
+        if not self.literal(")"):
+            self.pos = start
+            return FAILED
+
+        return node
+
+    def operand(self) -> Any:
+        # operand = query / string / integer
+        char = self.peek()
+
+        if char in OPERAND_FST:
+            return self.query()
+
+        if char in ("'", '"'):
+            offset = self.pos
+            string = self.pattern(rx_string, "string")
+            if string is None:
+                return FAILED
+
+            if not self.build:
+                return None
+
+            quoted = QuotedString(string[1:-1])
+            quoted.offset = offset
+            return quoted
+
+        if char in INTEGER_FST:
+            integer = self.pattern(rx_integer, "integer")
+            if integer is None:
+                return FAILED
+            return Int(int(integer)) if self.build else None
+
+        if self.track_expected:
+            self.expect("query")
+        return FAILED
+
+    # queries
+
+    def query(self) -> Any:
+        # query = agg? metric_name filter? by? as? query_func*
+        start = self.pos
+
+        agg_func = self.agg()
+
+        name = self.pattern(rx_metric_name, "metric name")
+        if name is None:
+            self.pos = start
+            return FAILED
+
+        filter = self.filter()
+        by_offset = rx_ws.match(self.text, self.pos).end()  # type: ignore
+        by = self.by()
+        as_offset = self.pos
+        as_ = self.as_()
+
+        funcs: List[Any] = []
+        while True:
+            func = self.rollup()
+            if func is FAILED:
+                func = self.fill()
+            if func is FAILED:
+                break
+            funcs.append(func)
+
+        if not self.build:
+            return None
+
+        # 'by' and 'as' are part of the aggregation, like in QueryVisitor
+        agg = None
+        if agg_func is None:
+            if by is not FAILED:
+                self.unsupported_at(by_offset, "'by' without an aggregation")
+            elif as_ is not FAILED:
+                self.unsupported_at(as_offset, "'as' without an aggregation")
+        else:
+            agg = Aggregation(
+                func=agg_func,
+                by=None if by is FAILED else by,
+                as_=None if as_ is FAILED else as_,
+            )
+
+        return QueryState(
+            metric=Metric(name=name),
+            agg=agg,
+            filter=None if filter is FAILED else filter,
+            funcs=funcs,
+        )
+
+    def agg(self) -> Optional[AggFunc]:
+        # agg = agg_func ":"
+        start = self.pos
+
+        func = self.keyword(AGG_FUNCS, "aggregation")
+        if func is None:
+            return None
+
+        if not self.literal(":"):
+            self.pos = start
+            return None
+
+        return AggFunc(func)
+
+    def filter(self) -> Any:
+        # filter = "{" ws filter_item ( ws "," ws filter_item )* ws "}"
+        start = self.pos
+
+        if not self.literal("{"):
+            return FAILED
+
+        self.skip_ws()
+        item = self.filter_item()
+        if item is FAILED:
+            self.pos = start
+            return FAILED
+
+        items = [item]
+        while True:
+            item_start = self.pos
+            self.skip_ws()
+            if not self.literal(","):
+                self.pos = item_start
+                break
+
+            self.skip_ws()
+            item = self.filter_item()
+            if item is FAILED:
+                self.pos = item_start
+                break
+
+            items.append(item)
+
+        self.skip_ws()
+        if not self.literal("}"):
+            self.pos = start
+            return FAILED
+
+        if not self.build:
+            return None
+
+        conds: List[FilterCond] = [item for item in items if item is not None]
+
+        # {*} is the same as no filter at all
+        return Filter(conds=conds) if conds else None
+
+    def filter_item(self) -> Any:
+        # filter_item = tvar_name / filter_keyval / "*" / "$"
+        tvar = self.tvar_name()
+        if tvar is not None:
+            return TmplVar(tvar=tvar[1:]) if self.build else None
+
+        tag = self.filter_keyval()
+        if tag is not FAILED:
+            return tag
+
+        if self.literal("*"):
+            return None
+
+        offset = self.pos
+        if self.literal("$"):
+            self.unsupported_at(offset, "Unsupported filter item: '$'")
+            return None
+
+        return FAILED
+
+    def filter_keyval(self) -> Any:
+        # filter_keyval = "!"? tag_name ( ":" tag_value )?
+        start = self.pos
+
+        negated = self.literal("!")
+
+        tag = self.pattern(rx_tag_name, "tag name")
+        if tag is None:
+            self.pos = start
+            return FAILED
+
+        value = None
+        value_start = self.pos
+        if self.literal(":"):
+            value = self.pattern(rx_tag_value, "tag value")
+            if value is None:
+                self.pos = value_start
+
+        if not self.build:
+            return None
+
+        operator = FilterOperator.NOT_EQUAL if negated else FilterOperator.EQUAL
+        return Tag(tag=tag, value=value, operator=operator)
+
+    def tvar_name(self) -> Optional[str]:
+        # tvar_name = "$" tag_name
+        start = self.pos
+
+        if not self.literal("$"):
+            return None
+
+        tag = self.pattern(rx_tag_name, "tag name")
+        if tag is None:
+            self.pos = start
+            return None
+
+        return "$" + tag
+
+    def by(self) -> Any:
+        # by = ~r"\s*" "by" ws "{" ws by_item ( ws "," ws by_item )* ws "}"
+        start = self.pos
+
+        self.skip_ws()
+        if not self.literal("by"):
+            self.pos = start
+            return FAILED
+
+        self.skip_ws()
+        if not self.literal("{"):
+            self.pos = start
+            return FAILED
+
+        self.skip_ws()
+        item = self.by_item()
+        if item is None:
+            self.pos = start
+            return FAILED
+
+        tags = [item]
+        while True:
+            item_start = self.pos
+            self.skip_ws()
+            if not self.literal(","):
+                self.pos = item_start
+                break
+
+            self.skip_ws()
+            item = self.by_item()
+            if item is None:
+                self.pos = item_start
+                break
+
+            tags.append(item)
+
+        self.skip_ws()
+        if not self.literal("}"):
+            self.pos = start
+            return FAILED
+
+        return By(tags=tags) if self.build else None
+
+    def by_item(self) -> Optional[str]:
+        # by_item = tvar_name / tag_name
+        tvar = self.tvar_name()
+        if tvar is not None:
+            return tvar
+
+        return self.pattern(rx_tag_name, "tag name")
+
+    def as_(self) -> Any:
+        # as = "." "as_" as_func "(" ")"
+        start = self.pos
+
+        if not self.literal(".as_"):
+            return FAILED
+
+        func = self.keyword(AS_FUNCS, "'rate' or 'count'")
+        if func is None or not self.literal("()"):
+            self.pos = start
+            return FAILED
+
+        return As(func) if self.build else None
+
+    def rollup(self) -> Any:
+        # rollup = "." "rollup" "(" ws rollup_func ( ws "," ws integer )? ws ")"
+        start = self.pos
+
+        if not self.literal(".rollup("):
+            return FAILED
+
+        self.skip_ws()
+        func = self.keyword(ROLLUP_FUNCS, "rollup function")
+        if func is None:
+            self.pos = start
+            return FAILED
+
+        period = self.optional_integer_arg()
+
+        self.skip_ws()
+        if not self.literal(")"):
+            self.pos = start
+            return FAILED
+
+        if not self.build:
+            return None
+
+        return Rollup(func=RollupFunc(func), period_s=period)
+
+    def fill(self) -> Any:
+        # fill = "." "fill" "(" ws fill_arg ( ws "," ws integer )? ws ")"
+        # fill_arg = "last" / "linear" / "null" / "zero" / integer
+        start = self.pos
+
+        if not self.literal(".fill("):
+            return FAILED
+
+        self.skip_ws()
+        arg_start = self.pos
+        arg: Optional[str] = self.keyword(FILL_FUNCS, "fill function")
+        if arg is None:
+            arg = self.pattern(rx_integer, "integer")
+        if arg is None:
+            self.pos = start
+            return FAILED
+
+        limit = self.optional_integer_arg()
+
+        self.skip_ws()
+        if not self.literal(")"):
+            self.pos = start
+            return FAILED
+
+        if not self.build:
+            return None
+
+        func = FillFunc.ZERO
+        if arg in FILL_FUNCS.keywords:
+            func = FillFunc(arg)
+        elif int(arg) != 0:
+            # as with QueryVisitor, only 0 can be used in place of 'zero'
+            self.unsupported_at(arg_start, "Unsupported fill value: %r" % arg)
+
+        return Fill(func=func, limit_s=limit)
+
+    def optional_integer_arg(self) -> Optional[int]:
+        # ( ws "," ws integer )?
+        start = self.pos
+
+        self.skip_ws()
+        if not self.literal(","):
+            self.pos = start
+            return None
+
+        self.skip_ws()
+        integer = self.pattern(rx_integer, "integer")
+        if integer is None:
+            self.pos = start
+            return None
+
+        return int(integer)
+
+
+def iter_comma_operands(node: Any) -> Iterable[Any]:
+    "Comma(a, Comma(b, c)) -> a, b, c"
+
+    while isinstance(node, Comma):
+        yield node.left
+        node = node.right
+
+    yield node
+
+
+def parse_query(query: str) -> Union[FormulaNode, QueryNode]:
+    """
+    Parses a query, or a formula over queries, into an AST.
+
+    Raises QuerySyntaxError or UnsupportedQueryError.
+    """
+
+    node: Union[FormulaNode, QueryNode] = RecursiveDescentParser(query).parse()
+    return node
+
+
+def check_query_syntax(query: str) -> Optional[QuerySyntaxError]:
+    "Returns the syntax error in `query`, if any, without building an AST."
+
+    try:
+        RecursiveDescentParser(query, build=False).parse()
+    except QuerySyntaxError as exc:
+        return exc
+
+    return None
@@ -5,3 +5,14 @@ def sanitize_title_for_filename(title: str) -> str:
     # replace any non-alpha char with '_'
     title = re.sub("[^a-zA-Z0-9]", "_", title)
     return title
+
+
+def format_size(num_bytes: int) -> str:
+    # 999 -> 999B, 12345 -> 12.1K, 2345678 -> 2.2M
+    if num_bytes < 1024:
+        return f"{num_bytes}B"
+
+    if num_bytes < 1024 * 1024:
+        return "%.1fK" % (num_bytes / 1024)
+
+    return "%.1fM" % (num_bytes / (1024 * 1024))
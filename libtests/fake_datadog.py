@@ -0,0 +1,514 @@
+"""
+A stand-in for the parts of the Datadog API that libddog uses, served over HTTP
+from a background thread so that the real client can be pointed at it.
+
+    with FakeDatadogServer(latency_s=0.01) as server:
+        os.environ.update(server.environ)
+        ...
+
+It can also be run on its own to try out `ddog` without a Datadog account:
+
+    $ python -m libtests.fake_datadog --port 8126 --latency 0.05
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from libddog.common.types import JsonDict
+
+API_KEY = "fake-api-key"
+APP_KEY = "fake-application-key"
+
+
+def format_timestamp(dt: datetime) -> str:
+    # the format used by Datadog: 2021-08-31T00:42:23.191914+00:00
+    return dt.isoformat(timespec="microseconds")
+
+
+class InjectedError:
+    def __init__(
+        self,
+        *,
+        status: int,
+        method: Optional[str],
+        path: Optional[str],
+        count: int,
+        errors: List[str],
+        after_processing: bool = False,
+    ) -> None:
+        self.status = status
+        self.method = method
+        self.path = path
+        self.count = count
+        self.errors = errors
+        self.after_processing = after_processing
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.method is not None and self.method != method:
+            return False
+
+        if self.path is not None and not path.startswith(self.path):
+            return False
+
+        return self.count > 0
+
+
+class FakeDatadogState:
+    """
+    The data and behaviour of the fake API, kept apart from the HTTP plumbing.
+    Every method returns an HTTP status code, a JSON payload and any extra
+    headers.
+    """
+
+    rx_dashboard = re.compile("^/api/v1/dashboard(?:/(?P<id>[^/]+))?$")
+    rx_app_key = re.compile(
+        "^/api/v2/current_user/application_keys(?:/(?P<id>[^/]+))?$"
+    )
+
+    def __init__(
+        self,
+        *,
+        api_key: str = API_KEY,
+        app_key: str = APP_KEY,
+        latency_s: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_limit_period_s: float = 10.0,
+        seed: int = 0,
+    ) -> None:
+        self.api_key = api_key
+        self.app_key = app_key
+        self.latency_s = latency_s
+        self.rate_limit = rate_limit
+        self.rate_limit_period_s = rate_limit_period_s
+
+        self.dashboards: Dict[str, JsonDict] = {}
+        self.deleted_dashboards: Dict[str, JsonDict] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.injected_errors: List[InjectedError] = []
+
+        self.user = {
+            "email": "fake.user@example.com",
+            "handle": "fake.user@example.com",
+            "name": "Fake User",
+        }
+        self.app_key_id = "00000000-0000-0000-0000-000000000001"
+        self.app_key_name = "fake key"
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def generate_id(self) -> str:
+        # ids look like: abc-123-x9z
+        alphabet = "abcdefghijklmnopqrstuvwxyz0123456789"
+        while True:
+            parts = ["".join(self._random.choices(alphabet, k=3)) for _ in range(3)]
+            id = "-".join(parts)
+            if id not in self.dashboards:
+                return id
+
+    def inject_error(
+        self,
+        *,
+        status: int = 500,
+        method: Optional[str] = None,
+        path: Optional[str] = None,
+        count: int = 1,
+        errors: Optional[List[str]] = None,
+        after_processing: bool = False,
+    ) -> None:
+        """
+        Makes the next `count` requests matching `method` and starting with
+        `path` (both optional) fail with `status`.
+
+        With `after_processing` the request takes effect before the error is
+        returned, like when a response is lost on its way back to the client.
+        """
+
+        error = InjectedError(
+            status=status,
+            method=method,
+            path=path,
+            count=count,
+            errors=errors or [f"Injected error {status}"],
+            after_processing=after_processing,
+        )
+        with self._lock:
+            self.injected_errors.append(error)
+
+    def check_rate_limit(self) -> Tuple[bool, Dict[str, str]]:
+        if self.rate_limit is None:
+            return True, {}
+
+        now = time.monotonic()
+        if now - self._window_start >= self.rate_limit_period_s:
+            self._window_start = now
+            self._window_count = 0
+
+        self._window_count += 1
+        allowed = self._window_count <= self.rate_limit
+
+        reset_s = self.rate_limit_period_s - (now - self._window_start)
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Period": "%g" % self.rate_limit_period_s,
+            "X-RateLimit-Remaining": str(max(self.rate_limit - self._window_count, 0)),
+            # real Datadog returns whole seconds, we allow short test periods
+            "X-RateLimit-Reset": "%g" % (math.ceil(reset_s * 1000) / 1000),
+            "X-RateLimit-Name": "dashboards",
+        }
+        return allowed, headers
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: Any,
+        query: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Optional[JsonDict], Dict[str, str]]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        with self._lock:
+            self.requests.append((method, path))
+
+            allowed, extra_headers = self.check_rate_limit()
+            if not allowed:
+                return 429, {"errors": ["Rate limit exceeded"]}, extra_headers
+
+            injected = None
+            for error in self.injected_errors:
+                if error.matches(method, path):
+                    error.count -= 1
+                    injected = error
+                    break
+
+            if injected is not None and not injected.after_processing:
+                return injected.status, {"errors": injected.errors}, extra_headers
+
+            if (
+                headers.get("dd-api-key") != self.api_key
+                or headers.get("dd-application-key") != self.app_key
+            ):
+                return 403, {"errors": ["Forbidden"]}, extra_headers
+
+            status, payload = self.route(method, path, body, query or {})
+
+            if injected is not None:
+                return injected.status, {"errors": injected.errors}, extra_headers
+
+            return status, payload, extra_headers
+
+    def route(
+        self, method: str, path: str, body: Any, query: Dict[str, str]
+    ) -> Tuple[int, Optional[JsonDict]]:
+        match = self.rx_dashboard.match(path)
+        if match:
+            id = match.group("id")
+
+            if id is None and method == "GET":
+                return self.list_dashboards(query)
+            if id is None and method == "POST":
+                return self.create_dashboard(body)
+            if id is not None and method == "GET":
+                return self.get_dashboard(id)
+            if id is not None and method == "PUT":
+                return self.update_dashboard(id, body)
+            if id is not None and method == "DELETE":
+                return self.delete_dashboard(id)
+
+        if path == "/api/v1/validate" and method == "GET":
+            return 200, {"valid": True}
+
+        match = self.rx_app_key.match(path)
+        if match and method == "GET":
+            id = match.group("id")
+
+            if id is None:
+                return self.list_app_keys()
+            return self.get_app_key(id)
+
+        return 404, {"errors": ["Not found"]}
+
+    def validate_dashboard(self, body: Any) -> List[str]:
+        if not isinstance(body, dict):
+            return ["Invalid JSON: expected an object"]
+
+        errors = []
+        for key in ("title", "widgets", "layout_type"):
+            if key not in body:
+                errors.append(f"Invalid dashboard: missing required field {key!r}")
+
+        if body.get("layout_type") not in (None, "ordered", "free"):
+            errors.append(f"Invalid layout_type: {body.get('layout_type')!r}")
+
+        return errors
+
+    def list_dashboards(self, query: Dict[str, str]) -> Tuple[int, JsonDict]:
+        """
+        Supports the paging and filtering parameters of the real API: `start`,
+        `count`, `filter[shared]` and `filter[deleted]`. Without `count` every
+        dashboard is returned.
+        """
+
+        summary_keys = (
+            "id",
+            "title",
+            "description",
+            "author_handle",
+            "created_at",
+            "modified_at",
+            "url",
+            "layout_type",
+            "is_read_only",
+        )
+
+        try:
+            start = int(query.get("start", 0))
+            count = int(query["count"]) if "count" in query else None
+        except ValueError:
+            return 400, {"errors": ["Invalid value for start or count"]}
+
+        dashboards = self.dashboards
+        if query.get("filter[deleted]") == "true":
+            dashboards = self.deleted_dashboards
+
+        dcts = list(dashboards.values())
+        if query.get("filter[shared]") == "true":
+            dcts = [dct for dct in dcts if dct.get("is_shared")]
+
+        end = start + count if count is not None else None
+        summaries = [
+            {key: dct.get(key) for key in summary_keys} for dct in dcts[start:end]
+        ]
+        return 200, {"dashboards": summaries}
+
+    def create_dashboard(self, body: Any) -> Tuple[int, JsonDict]:
+        errors = self.validate_dashboard(body)
+        if errors:
+            return 400, {"errors": errors}
+
+        id = self.generate_id()
+        now = format_timestamp(datetime.now(timezone.utc))
+        dct = dict(body)
+        dct.update(
+            {
+                "id": id,
+                "author_handle": self.user["handle"],
+                "author_name": self.user["name"],
+                "created_at": now,
+                "modified_at": now,
+                "url": f"/dashboard/{id}",
+                "is_read_only": body.get("is_read_only", False),
+            }
+        )
+        self.dashboards[id] = dct
+        return 200, dct
+
+    def get_dashboard(self, id: str) -> Tuple[int, JsonDict]:
+        dct = self.dashboards.get(id)
+        if dct is None:
+            return 404, {"errors": ["Dashboard not found"]}
+
+        return 200, dct
+
+    def update_dashboard(self, id: str, body: Any) -> Tuple[int, JsonDict]:
+        existing = self.dashboards.get(id)
+        if existing is None:
+            return 404, {"errors": ["Dashboard not found"]}
+
+        errors = self.validate_dashboard(body)
+        if errors:
+            return 400, {"errors": errors}
+
+        dct = dict(body)
+        for key in ("id", "author_handle", "author_name", "created_at", "url"):
+            dct[key] = existing[key]
+        dct["modified_at"] = format_timestamp(datetime.now(timezone.utc))
+        dct.setdefault("is_read_only", False)
+
+        self.dashboards[id] = dct
+        return 200, dct
+
+    def delete_dashboard(self, id: str) -> Tuple[int, JsonDict]:
+        dct = self.dashboards.pop(id, None)
+        if dct is None:
+            return 404, {"errors": ["Dashboard not found"]}
+
+        self.deleted_dashboards[id] = dct
+
+        return 200, {"deleted_dashboard_id": id}
+
+    def list_app_keys(self) -> Tuple[int, JsonDict]:
+        data = [
+            {
+                "id": self.app_key_id,
+                "type": "application_keys",
+                "attributes": {"name": self.app_key_name},
+            }
+        ]
+        return 200, {"data": data}
+
+    def get_app_key(self, id: str) -> Tuple[int, JsonDict]:
+        if id != self.app_key_id:
+            return 404, {"errors": ["Application key not found"]}
+
+        payload = {
+            "data": {
+                "id": self.app_key_id,
+                "type": "application_keys",
+                "attributes": {"name": self.app_key_name, "key": self.app_key},
+            },
+            "included": [{"type": "users", "attributes": dict(self.user)}],
+        }
+        return 200, payload
+
+
+class FakeDatadogRequestHandler(BaseHTTPRequestHandler):
+    server: "FakeDatadogHttpServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # keep test output clean
+
+    def dispatch(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        body: Any = None
+        if raw:
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                self.respond(400, {"errors": ["Invalid JSON"]}, {})
+                return
+
+        headers = {key.lower(): value for key, value in self.headers.items()}
+        path, _, query_string = self.path.partition("?")
+        query = dict(parse_qsl(query_string))
+
+        status, payload, extra_headers = self.server.state.handle(
+            self.command, path, headers, body, query
+        )
+        self.respond(status, payload, extra_headers)
+
+    def respond(
+        self, status: int, payload: Optional[JsonDict], headers: Dict[str, str]
+    ) -> None:
+        block = json.dumps(payload).encode("utf-8") if payload is not None else b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(block)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(block)
+
+    do_GET = dispatch
+    do_POST = dispatch
+    do_PUT = dispatch
+    do_DELETE = dispatch
+
+
+class FakeDatadogHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], state: FakeDatadogState) -> None:
+        super().__init__(address, FakeDatadogRequestHandler)
+        self.state = state
+
+
+class FakeDatadogServer:
+    """
+    Runs the fake API on localhost in a background thread. The state of the
+    fake (its dashboards, latency, rate limit, injected errors) is available as
+    `state` and can be changed while the server is running.
+    """
+
+    def __init__(self, *, port: int = 0, **state_kwargs: Any) -> None:
+        self.state = FakeDatadogState(**state_kwargs)
+        self.port = port
+
+        self._server: Optional[FakeDatadogHttpServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        assert self._server is not None, "server is not running"
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    @property
+    def environ(self) -> Dict[str, str]:
+        "The environment variables that point a DatadogClient at this server."
+
+        return {
+            "DATADOG_HOST": self.host,
+            "DATADOG_API_KEY": self.state.api_key,
+            "DATADOG_APPLICATION_KEY": self.state.app_key,
+        }
+
+    def start(self) -> None:
+        self._server = FakeDatadogHttpServer(("127.0.0.1", self.port), self.state)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-datadog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeDatadogServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Datadog API")
+    parser.add_argument("--port", type=int, default=8126)
+    parser.add_argument("--latency", type=float, default=0.0, help="in seconds")
+    parser.add_argument("--rate-limit", type=int, default=None, help="per period")
+    parser.add_argument("--rate-limit-period", type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = FakeDatadogServer(
+        port=args.port,
+        latency_s=args.latency,
+        rate_limit=args.rate_limit,
+        rate_limit_period_s=args.rate_limit_period,
+    )
+    server.start()
+
+    for key, value in server.environ.items():
+        print(f"export {key}={value}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
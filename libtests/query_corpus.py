@@ -0,0 +1,414 @@
+"""
+Generates synthetic query strings and formulas, in any volume, by walking the
+rules of libddog/parsing/grammar.txt:
+
+    generator = QueryCorpusGenerator(seed=1, formula_depth=(2, 5))
+    queries = generator.corpus(10000)
+
+Every string generated is valid according to the grammar. The output only
+depends on the seed and the parameters, so a corpus can be regenerated rather
+than stored.
+
+The grammar decides the structure: which rules can follow each other, and how
+they nest. Where the grammar alone would produce unrealistic queries (eg.
+random metric names, or functions called with the wrong arguments) the
+generator uses a vocabulary and tables of its own, and every choice made
+along the way is weighted to resemble real dashboards.
+"""
+
+import random
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from parsimonious.expressions import (
+    Expression,
+    Literal,
+    OneOf,
+    Quantifier,
+    Regex,
+)
+from parsimonious.expressions import Sequence as SequenceExpr
+
+import libddog.metrics.functions
+from libddog.metrics.functions import FunctionWithSingleNode
+from libddog.parsing.query_parser import QueryParser
+
+METRICS = [
+    "aws.ec2.cpuutilization",
+    "aws.ec2.network_in",
+    "aws.ec2.network_out",
+    "aws.elb.request_count",
+    "aws.elb.latency",
+    "aws.elb.httpcode_backend_5xx",
+    "aws.rds.free_storage_space",
+    "aws.rds.database_connections",
+    "aws.sqs.approximate_number_of_messages_visible",
+    "kubernetes.cpu.usage.total",
+    "kubernetes.memory.usage",
+    "kubernetes.containers.restarts",
+    "trace.http.request.hits",
+    "trace.http.request.errors",
+    "trace.http.request.duration.by.service.99p",
+    "system.load.1",
+    "system.disk.in_use",
+]
+
+TAGS = [
+    "availability-zone",
+    "host",
+    "service",
+    "env",
+    "version",
+    "pod_name",
+    "kube_namespace",
+    "kubernetes.io/role",
+    "region",
+    "status_code",
+]
+
+TAG_VALUES = [
+    "prod",
+    "staging",
+    "web",
+    "api",
+    "worker",
+    "ap-southeast-2a",
+    "us-east-1",
+    "2.0.1",
+    "i-0123456789abcdef0",
+    "arn:aws:rds:db-1",
+    "/var/lib/docker",
+    "5*",
+    "*-east-1",
+    "*",
+]
+
+TMPL_VARS = ["region", "env", "service", "az", "cluster"]
+
+# the arguments that follow the expression a function applies to, for the
+# functions that take any
+FUNCTION_ARGS: Dict[str, Callable[[random.Random], List[str]]] = {
+    "timeshift": lambda rnd: [str(-rnd.choice([300, 3600, 86400, 604800]))],
+    "moving_rollup": lambda rnd: [
+        str(rnd.choice([60, 300, 3600])),
+        "'%s'" % rnd.choice(["avg", "sum", "max"]),
+    ],
+    "top": lambda rnd: [
+        str(rnd.choice([5, 10, 25])),
+        "'%s'" % rnd.choice(["mean", "max", "last"]),
+        "'%s'" % rnd.choice(["desc", "asc"]),
+    ],
+    "outliers": lambda rnd: ["'%s'" % rnd.choice(["DBSCAN", "MAD"]), "3"],
+    "anomalies": lambda rnd: ["'%s'" % rnd.choice(["basic", "agile"]), "2"],
+    "forecast": lambda rnd: ["'%s'" % rnd.choice(["linear", "seasonal"]), "1"],
+    "exclude_null": lambda rnd: ["'%s'" % rnd.choice(TAGS)],
+    "cutoff_max": lambda rnd: [str(rnd.randint(1, 1000))],
+    "cutoff_min": lambda rnd: [str(rnd.randint(0, 100))],
+    "clamp_max": lambda rnd: [str(rnd.randint(1, 1000))],
+    "clamp_min": lambda rnd: [str(rnd.randint(0, 100))],
+}
+
+# the functions that are used more than others
+FUNCTION_WEIGHTS = {
+    "abs": 3,
+    "per_second": 4,
+    "per_minute": 2,
+    "timeshift": 3,
+    "top": 3,
+    "diff": 2,
+    "cumsum": 2,
+}
+
+
+def get_func_names(grammar_names: Sequence[str]) -> List[str]:
+    "The functions in the grammar that libddog implements, in grammar order."
+
+    names = []
+    for name in grammar_names:
+        cls = getattr(libddog.metrics.functions, name, None)
+        if name in FUNCTION_ARGS or (
+            isinstance(cls, type) and issubclass(cls, FunctionWithSingleNode)
+        ):
+            names.append(name)
+
+    return names
+
+
+class QueryCorpusGenerator:
+    """
+    Generates query strings (the `query` rule of the grammar) and formulas
+    (the `program` rule).
+
+    The parameters are (min, max) ranges:
+    - `formula_depth`: how deeply formulas nest, counting operators,
+      functions and parentheses. Every formula reaches a depth in the range.
+    - `filter_items`: the number of tags and template variables in a filter.
+      0 means no filter.
+    - `by_tags`: the number of tags grouped by. 0 means no 'by'.
+
+    `weights` overrides the weights of the alternatives of a rule of the
+    grammar (eg. {"binop": [1, 1, 5, 5, 0]} for mostly '*' and '/').
+    """
+
+    # the default weights of the alternatives of a rule, in grammar order
+    default_weights: Dict[str, List[float]] = {
+        # formula / func_call / paren_expr: formula covers the others
+        "expr": [1, 0, 0],
+        # query / string / integer: strings are only used as arguments
+        "operand": [9, 0, 1],
+        # + - * / ,: commas are only used between arguments
+        "binop": [3, 2, 2, 3, 0],
+        # tvar_name / filter_keyval / "*" / "$"
+        "filter_item": [4, 6, 0, 0],
+        # tvar_name / tag_name
+        "by_item": [1, 9],
+        "query_func": [3, 1],
+        # last / linear / null / zero / integer (0)
+        "fill_arg": [1, 1, 2, 4, 1],
+    }
+
+    # the probability that an optional part of a rule is generated, by the
+    # name of the part (or its text, for anonymous literals), or failing that
+    # the name of the rule it's in
+    optional_probs: Dict[str, float] = {
+        "agg": 0.9,
+        "as": 0.2,
+        "!": 0.15,
+        "-": 0.05,
+        "filter_keyval": 0.9,  # the value
+        "rollup": 0.7,  # the period
+        "fill": 0.3,  # the limit
+    }
+
+    def __init__(
+        self,
+        *,
+        seed: int = 0,
+        formula_depth: Tuple[int, int] = (1, 3),
+        filter_items: Tuple[int, int] = (0, 3),
+        by_tags: Tuple[int, int] = (0, 2),
+        weights: Optional[Dict[str, List[float]]] = None,
+        parser: Optional[QueryParser] = None,
+    ) -> None:
+        self.random = random.Random(seed)
+        self.formula_depth = formula_depth
+        self.filter_items = filter_items
+        self.by_tags = by_tags
+        self.weights = dict(self.default_weights, **(weights or {}))
+
+        self.grammar = (parser or QueryParser.get_instance()).grammar
+        self.func_names = get_func_names(
+            [member.literal for member in self.grammar["func_name"].members]
+        )
+
+        # the named rules being generated, innermost last
+        self.rule_stack: List[str] = []
+        # how many expr are being generated, ie. the formula depth plus one
+        self.depth = 0
+        self.target_depth = 0
+        # the number of repetitions decided for a rule before entering it
+        self.repeats: Dict[str, int] = {}
+        # whether the query has a filter or a 'by' after the metric name,
+        # without which '.rollup(..)' etc would be parsed as part of the name
+        self.metric_name_ended = False
+        # whether the query has an aggregation, without which it can't have
+        # 'by' or 'as'
+        self.has_agg = False
+
+    # public interface
+
+    def query(self) -> str:
+        "Generates a query, without functions or operators."
+
+        return self.generate(self.grammar["query"])
+
+    def formula(self) -> str:
+        "Generates a formula over queries, eg. 'abs(q1) / (q2 + 10)'."
+
+        self.target_depth = self.random.randint(*self.formula_depth)
+        return self.generate(self.grammar["program"])
+
+    def corpus(self, num: int, *, formula_ratio: float = 0.2) -> List[str]:
+        "Generates `num` strings, of which `formula_ratio` are formulas."
+
+        return [
+            self.formula() if self.random.random() < formula_ratio else self.query()
+            for _ in range(num)
+        ]
+
+    # walking the grammar
+
+    @property
+    def nesting(self) -> int:
+        "How deeply nested the expression being generated is."
+
+        return self.depth - 1
+
+    def generate(self, expr: Expression) -> str:
+        name = expr.name
+        if name:
+            self.rule_stack.append(name)
+            if name == "expr":
+                self.depth += 1
+
+        try:
+            rule_method = getattr(self, "rule_%s" % name, None) if name else None
+            if rule_method is not None:
+                text: str = rule_method(expr)
+            elif isinstance(expr, Literal):
+                text = expr.literal
+            elif isinstance(expr, SequenceExpr):
+                text = "".join(self.generate(member) for member in expr.members)
+            elif isinstance(expr, OneOf):
+                text = self.generate(self.choose(name, expr.members))
+            elif isinstance(expr, Quantifier):
+                member = expr.members[0]
+                count = self.count(expr)
+                text = "".join(self.generate(member) for _ in range(count))
+            elif isinstance(expr, Regex) and expr.re.pattern == r"\s*":
+                text = " "
+            else:
+                raise ValueError("Cannot generate %r" % expr)
+
+        finally:
+            if name:
+                self.rule_stack.pop()
+                if name == "expr":
+                    self.depth -= 1
+
+        return text
+
+    def choose(self, rule: str, members: Sequence[Expression]) -> Expression:
+        weights = self.weights.get(rule) or [1] * len(members)
+        return self.random.choices(members, weights=weights)[0]
+
+    def count(self, expr: Quantifier) -> int:
+        member = expr.members[0]
+        rule = self.rule_stack[-1]
+
+        if expr.max == 1:
+            if member.name == "agg":
+                # 'by' and 'as' are part of the aggregation
+                prob = 1 if self.by_tags[0] else self.optional_probs["agg"]
+                self.has_agg = self.random.random() < prob
+                return 1 if self.has_agg else 0
+
+            if member.name == "by" and not self.has_agg:
+                return 0
+
+            if member.name in ("filter", "by"):
+                # decide how long it is now, 0 if there's none
+                lo, hi = self.filter_items if member.name == "filter" else self.by_tags
+                items = self.random.randint(lo, hi)
+                if member.name == "filter":
+                    self.metric_name_ended = False
+                if not items:
+                    return 0
+
+                self.repeats[member.name] = items - 1
+                self.metric_name_ended = True
+                return 1
+
+            if member.name == "as" and not (self.has_agg and self.metric_name_ended):
+                return 0
+
+            key = member.name or getattr(member, "literal", "") or rule
+            prob = self.optional_probs.get(key, 0.5)
+            return 1 if self.random.random() < prob else 0
+
+        if rule in self.repeats:
+            return self.repeats.pop(rule)
+
+        if rule == "formula":
+            # another operator, if the target depth isn't reached yet
+            if self.nesting < self.target_depth:
+                return self.random.choice([0, 1])
+            return 0
+
+        if member.name == "query_func":
+            if not self.metric_name_ended:
+                return 0
+            return self.random.choices([0, 1, 2], weights=[5, 4, 1])[0]
+
+        raise ValueError("No repetition count for %r in %r" % (expr, rule))
+
+    # rules generated differently from the grammar
+
+    def rule_expr_ex_formula(self, expr: OneOf) -> str:
+        # func_call / paren_expr / operand
+        func_call, paren_expr, operand = expr.members
+
+        # nest further until the target depth is reached
+        if self.nesting >= self.target_depth:
+            return self.generate(operand)
+
+        member = self.random.choices([func_call, paren_expr], [4, 1])[0]
+        return self.generate(member)
+
+    def rule_operand(self, expr: OneOf) -> str:
+        # numbers only on the right of operators, eg. 'q * 100' (an expr
+        # right inside a formula is the right side of an operator)
+        if self.rule_stack[-5:-3] != ["formula", "expr"]:
+            return self.generate(expr.members[0])
+
+        return self.generate(self.choose("operand", expr.members))
+
+    def rule_func_call(self, expr: SequenceExpr) -> str:
+        weights = [FUNCTION_WEIGHTS.get(name, 1) for name in self.func_names]
+        name = self.random.choices(self.func_names, weights)[0]
+
+        args_func = FUNCTION_ARGS.get(name)
+        if args_func is None:
+            return "%s(%s)" % (name, self.generate(self.grammar["expr"]))
+
+        # an operator would take in the arguments that follow, so the first
+        # argument can't be a formula with operators
+        self.depth += 1
+        try:
+            node = self.generate(self.grammar["expr_ex_formula"])
+        finally:
+            self.depth -= 1
+
+        return "%s(%s)" % (name, ", ".join([node] + args_func(self.random)))
+
+    def rule_metric_name(self, expr: Expression) -> str:
+        return self.random.choice(METRICS)
+
+    def rule_tag_name(self, expr: Expression) -> str:
+        if "tvar_name" in self.rule_stack:
+            return self.random.choice(TMPL_VARS)
+
+        return self.random.choice(TAGS)
+
+    def rule_tag_value(self, expr: Expression) -> str:
+        return self.random.choice(TAG_VALUES)
+
+    def rule_integer(self, expr: Expression) -> str:
+        if "fill_arg" in self.rule_stack:
+            # the only integer a fill function can be
+            return "0"
+
+        if "rollup" in self.rule_stack:
+            return str(self.random.choice([10, 60, 300, 3600]))
+
+        if "fill" in self.rule_stack:
+            return str(self.random.choice([30, 60, 300]))
+
+        sign = "-" if self.count(self.grammar["integer"].members[0]) else ""
+        return sign + str(self.random.choice([1, 2, 8, 10, 100, 1000, 1024]))
+
+    def rule_ws(self, expr: Expression) -> str:
+        return self.random.choices(["", " ", "  "], weights=[6, 3, 1])[0]
+
+
+def mutate_query(query: str, rnd: random.Random, chars: str = " ,{}()$!:*.-'") -> str:
+    """
+    Returns `query` with a random character deleted, or one of `chars`
+    inserted, which mostly makes it invalid in an interesting place.
+    """
+
+    if query and rnd.random() < 0.5:
+        idx = rnd.randrange(len(query))
+        return query[:idx] + query[idx + 1 :]
+
+    idx = rnd.randrange(len(query) + 1)
+    return query[:idx] + rnd.choice(chars) + query[idx:]
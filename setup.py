@@ -16,7 +16,7 @@ setup(
     author_email="martin.matusiak@nearmap.com",
     url="https://github.com/nearmap/libddog",
     license="MIT",
-    packages=find_packages('.', exclude=('libtests', 'testdata', 'tests_*',)),
+    packages=find_packages('.', exclude=('benchmarks', 'libtests', 'testdata', 'tests_*',)),
     package_dir={"": "."},
     package_data={
         "libddog": ["py.typed"],
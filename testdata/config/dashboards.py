@@ -1,16 +1,16 @@
-from typing import List
+from typing import Dict
 
 from dashboards import qa_layouts, qa_metrics, qa_minimal, qa_widgets
 
-from libddog.dashboards import Dashboard
+from libddog.dashboards import DashboardFactory
 
 
-def get_dashboards() -> List[Dashboard]:
-    dashes = [
-        qa_layouts.get_dashboard(),
-        qa_metrics.get_dashboard(),
-        qa_minimal.get_dashboard(),
-        qa_widgets.get_dashboard(),
-    ]
+def get_dashboard_factories() -> Dict[str, DashboardFactory]:
+    factories = {
+        "libddog QA: exercise layouts": qa_layouts.get_dashboard,
+        "libddog QA: exercise metrics queries": qa_metrics.get_dashboard,
+        "libddog QA: exercise dashboard lifecycle": qa_minimal.get_dashboard,
+        "libddog QA: exercise widgets": qa_widgets.get_dashboard,
+    }
 
-    return dashes
+    return factories
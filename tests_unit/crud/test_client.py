@@ -0,0 +1,306 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from libddog.crud.client import DatadogClient
+from libddog.crud.dashboards import DashboardManager
+from libddog.crud.errors import (
+    DashboardCreateFailed,
+    DashboardGetFailed,
+    DashboardListFailed,
+    DashboardUpdateFailed,
+    MissingDatadogApiKey,
+)
+from libddog.crud.instrumentation import TimingCollector
+from libddog.crud.retries import RetryPolicy
+from libddog.dashboards import Dashboard, Note
+from libtests.fake_datadog import FakeDatadogServer
+
+
+@pytest.fixture
+def fake_datadog(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeDatadogServer]:
+    with FakeDatadogServer() as server:
+        for key, value in server.environ.items():
+            monkeypatch.setenv(key, value)
+
+        yield server
+
+
+def create_client() -> DatadogClient:
+    client = DatadogClient()
+    client.load_credentials_from_environment()
+    return client
+
+
+def test_client__dashboard_crud(fake_datadog: FakeDatadogServer) -> None:
+    client = create_client()
+    dash = Dashboard(title="crud", widgets=[Note(content="a note")])
+
+    id = client.create_dashboard(dashboard=dash)
+    assert [dct["id"] for dct in client.list_dashboards()] == [id]
+
+    dct = client.get_dashboard(id=id)
+    assert dct["title"] == "crud"
+    assert dct["widgets"] == dash.as_dict()["widgets"]
+
+    dash.title = "crud updated"
+    client.update_dashboard(dashboard=dash, id=id)
+    assert client.get_dashboard(id=id)["title"] == "crud updated"
+
+    client.delete_dashboard(id=id)
+    assert client.list_dashboards() == []
+
+    with pytest.raises(DashboardGetFailed) as exc_info:
+        client.get_dashboard(id=id)
+    assert exc_info.value.http_status_code == 404
+
+
+def test_client__retries_when_rate_limited(fake_datadog: FakeDatadogServer) -> None:
+    fake_datadog.state.rate_limit = 2
+    fake_datadog.state.rate_limit_period_s = 0.2
+    client = create_client()
+
+    for _ in range(5):
+        assert client.list_dashboards() == []
+
+    requests = fake_datadog.state.requests
+    # some requests were rejected and retried
+    assert len(requests) > 5
+
+
+def test_client__injected_error(fake_datadog: FakeDatadogServer) -> None:
+    client = create_client()
+    id = client.create_dashboard_from_dict(
+        {"title": "x", "widgets": [], "layout_type": "ordered"}
+    )
+
+    # creating a dashboard is not idempotent so it's not retried
+    fake_datadog.state.inject_error(
+        status=502, method="POST", errors=["Bad gateway"], count=1
+    )
+
+    with pytest.raises(DashboardCreateFailed) as exc_info:
+        client.create_dashboard_from_dict({"title": "y", "widgets": []})
+    assert exc_info.value.http_status_code == 502
+    assert exc_info.value.errors == ["Bad gateway"]
+
+    # the fake validates dashboards like Datadog does
+    with pytest.raises(DashboardUpdateFailed) as update_exc_info:
+        client.update_dashboard_from_dict({"title": "y"}, id=id)
+    assert update_exc_info.value.http_status_code == 400
+
+
+def test_client__wrong_credentials(
+    fake_datadog: FakeDatadogServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("DATADOG_API_KEY", "wrong")
+    client = create_client()
+
+    with pytest.raises(DashboardListFailed) as exc_info:
+        client.list_dashboards()
+    assert exc_info.value.http_status_code == 403
+
+
+def test_manager__detects_current_user(fake_datadog: FakeDatadogServer) -> None:
+    manager = DashboardManager(proj_path=".")
+
+    identity = manager.current_user_identity
+    assert identity is not None
+    assert identity.email == "fake.user@example.com"
+    assert identity.app_key_name == "fake key"
+
+
+def test_manager__create_is_not_duplicated_when_response_is_lost(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    manager = DashboardManager(proj_path=str(tmp_path))
+    fake_datadog.state.inject_error(status=504, method="POST", after_processing=True)
+
+    id = manager.create_dashboard_from_dict(
+        {"title": "once", "widgets": [], "layout_type": "ordered"}
+    )
+
+    dcts = manager.list_dashboards()
+    assert [dct["id"] for dct in dcts] == [id]
+    assert "libddog-create-key: " not in dcts[0]["description"]
+
+
+def test_manager__create_keeps_the_dashboard_if_the_marker_is_not_removed(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    manager = DashboardManager(proj_path=str(tmp_path))
+    fake_datadog.state.inject_error(status=400, method="PUT")
+
+    id = manager.create_dashboard_from_dict(
+        {"title": "marked", "widgets": [], "layout_type": "ordered"}
+    )
+
+    dcts = manager.list_dashboards()
+    assert [dct["id"] for dct in dcts] == [id]
+    assert "libddog-create-key: " in dcts[0]["description"]
+
+
+def test_manager__create_marker_removal_is_timed(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    collector = TimingCollector()
+    manager = DashboardManager(proj_path=str(tmp_path), instrumentation=collector)
+
+    manager.create_dashboard_from_dict(
+        {"title": "timed", "widgets": [], "layout_type": "ordered"}
+    )
+
+    methods = [method for method, _ in fake_datadog.state.requests]
+    assert methods.count("POST") == 1
+    assert methods.count("PUT") == 1
+    assert "remove create marker" in collector.as_dict()["phases"]
+
+
+def test_manager__create_without_retries_has_no_marker(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    policy = RetryPolicy(max_attempts=1)
+    manager = DashboardManager(proj_path=str(tmp_path), retry_policy=policy)
+
+    manager.create_dashboard_from_dict(
+        {"title": "unmarked", "widgets": [], "layout_type": "ordered"}
+    )
+
+    methods = [method for method, _ in fake_datadog.state.requests]
+    assert methods.count("POST") == 1
+    assert methods.count("PUT") == 0
+
+
+def test_manager__create_is_retried_when_not_created(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    policy = RetryPolicy(backoff_base_s=0.01, seed=0)
+    manager = DashboardManager(proj_path=str(tmp_path), retry_policy=policy)
+    fake_datadog.state.inject_error(status=502, method="POST", count=2)
+
+    id = manager.create_dashboard_from_dict(
+        {"title": "retried", "widgets": [], "layout_type": "ordered"}
+    )
+
+    assert [dct["id"] for dct in manager.list_dashboards()] == [id]
+    methods = [method for method, _ in fake_datadog.state.requests]
+    assert methods.count("POST") == 3
+
+
+def test_manager__create_is_not_retried_when_rejected(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    manager = DashboardManager(proj_path=str(tmp_path))
+
+    with pytest.raises(DashboardCreateFailed) as exc_info:
+        manager.create_dashboard_from_dict({"title": "invalid"})
+    assert exc_info.value.http_status_code == 400
+
+    methods = [method for method, _ in fake_datadog.state.requests]
+    assert methods.count("POST") == 1
+
+
+def test_client__lists_dashboards_in_pages(fake_datadog: FakeDatadogServer) -> None:
+    client = create_client()
+    ids = [
+        client.create_dashboard_from_dict(
+            {"title": f"dash {idx}", "widgets": [], "layout_type": "ordered"}
+        )
+        for idx in range(5)
+    ]
+    fake_datadog.state.requests.clear()
+
+    dcts = client.list_dashboards(page_size=2)
+    assert [dct["id"] for dct in dcts] == ids
+    # the last page is the first one not to be full
+    assert len(fake_datadog.state.requests) == 3
+
+    fake_datadog.state.requests.clear()
+    iterator = client.iter_dashboards(page_size=2)
+    assert next(iterator)["id"] == ids[0]
+    assert len(fake_datadog.state.requests) == 1
+
+    client.delete_dashboard(id=ids[0])
+    assert [dct["id"] for dct in client.list_dashboards(deleted=True)] == [ids[0]]
+    assert client.list_dashboards(shared=True) == []
+
+
+def test_manager__find_first_stops_listing_early(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    manager = DashboardManager(proj_path=str(tmp_path))
+    for idx in range(150):
+        fake_datadog.state.dashboards[f"id-{idx}"] = {
+            "id": f"id-{idx}",
+            "title": f"dash {idx}",
+        }
+
+    dct = manager.find_first_dashboard_with_title("dash 10")
+    assert dct is not None and dct["id"] == "id-10"
+    assert len(fake_datadog.state.requests) == 1
+
+    assert manager.find_first_dashboard_with_title("nonexistent") is None
+    assert len(fake_datadog.state.requests) == 3
+
+
+def test_manager__index_live_dashboards_by_title(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    manager = DashboardManager(proj_path=str(tmp_path))
+    for idx in range(150):
+        fake_datadog.state.dashboards[f"id-{idx}"] = {
+            "id": f"id-{idx}",
+            "title": f"dash {idx % 100}",
+        }
+
+    index = manager.index_live_dashboards_by_title()
+
+    # the first dashboard with each title wins
+    assert len(index) == 100
+    assert index["dash 10"]["id"] == "id-10"
+    assert index["dash 60"]["id"] == "id-60"
+
+    # all the titles are indexed from a single listing of two pages
+    assert len(fake_datadog.state.requests) == 2
+
+
+def test_client__warm_up_and_close(fake_datadog: FakeDatadogServer) -> None:
+    with DatadogClient(pool_size=2) as client:
+        client.load_credentials_from_environment()
+        assert client.validate_api_key() is True
+
+        client.resize_pool(4)
+        assert client.pool_size == 4
+        adapter = client.session.get_adapter(fake_datadog.host)
+        assert adapter._pool_maxsize == 4  # type: ignore
+
+        fake_datadog.state.requests.clear()
+        client.start_warm_up(connections=3).join()
+        assert fake_datadog.state.requests == [("GET", "/api/v1/validate")] * 3
+
+    # the pool was emptied
+    assert not adapter.poolmanager.pools  # type: ignore
+
+
+def test_manager__warm_up_detects_current_user(
+    fake_datadog: FakeDatadogServer, tmp_path: Path
+) -> None:
+    with DashboardManager(proj_path=str(tmp_path)) as manager:
+        thread = manager.start_warm_up(connections=2)
+        assert thread is not None
+        thread.join()
+
+        assert manager._current_user_identity is not None
+        assert manager._current_user_identity.email == "fake.user@example.com"
+
+
+def test_manager__warm_up_without_credentials(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.delenv("DATADOG_API_KEY", raising=False)
+    manager = DashboardManager(proj_path=str(tmp_path))
+
+    assert manager.start_warm_up() is None
+    with pytest.raises(MissingDatadogApiKey):
+        manager.client
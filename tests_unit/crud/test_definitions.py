@@ -0,0 +1,171 @@
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from libddog.crud import definitions
+from libddog.crud.dashboards import DashboardManager
+from libddog.crud.errors import DashboardDefinitionsLoadError
+
+DEFS_WITH_FACTORIES = """\
+from libddog.dashboards import Dashboard
+
+BUILT = []
+
+
+def get_alpha():
+    BUILT.append("alpha")
+    return Dashboard(title="alpha")
+
+
+def get_beta():
+    BUILT.append("beta")
+    return Dashboard(title="beta")
+
+
+def get_dashboard_factories():
+    return {"alpha": get_alpha, "beta": get_beta}
+"""
+
+DEFS_WITH_DASHBOARDS = """\
+from libddog.dashboards import Dashboard
+
+
+def get_dashboards():
+    return [Dashboard(title="alpha"), Dashboard(title="beta")]
+"""
+
+
+@pytest.fixture
+def proj_path(tmp_path: Path) -> Iterator[Path]:
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "__init__.py").write_text("")
+
+    yield tmp_path
+
+    # forget the definitions module so that the next test imports its own
+    for name in list(sys.modules):
+        if name == "config" or name.startswith("config."):
+            del sys.modules[name]
+
+    if str(tmp_path) in sys.path:
+        sys.path.remove(str(tmp_path))
+
+
+def write_defs(proj_path: Path, content: str) -> None:
+    (proj_path / "config" / "dashboards.py").write_text(content)
+
+
+def test_load_definitions__only_matching_factories_are_called(proj_path: Path) -> None:
+    write_defs(proj_path, DEFS_WITH_FACTORIES)
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    assert manager.load_definition_titles() == ["alpha", "beta"]
+
+    dashes = manager.load_definitions(title_pat="b*")
+    assert [dash.title for dash in dashes] == ["beta"]
+
+    module = manager.load_definitions_module()
+    assert module.BUILT == ["beta"]
+
+
+def test_load_definitions__legacy_get_dashboards(proj_path: Path) -> None:
+    write_defs(proj_path, DEFS_WITH_DASHBOARDS)
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    dashes = manager.load_definitions()
+    assert [dash.title for dash in dashes] == ["alpha", "beta"]
+
+    dashes = manager.load_definitions(title_pat="alpha")
+    assert [dash.title for dash in dashes] == ["alpha"]
+
+
+def test_load_definitions__legacy_duplicate_titles(proj_path: Path) -> None:
+    write_defs(
+        proj_path,
+        DEFS_WITH_DASHBOARDS.replace(
+            'Dashboard(title="beta")', 'Dashboard(title="alpha")'
+        ),
+    )
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    with pytest.raises(DashboardDefinitionsLoadError) as exc_info:
+        manager.load_definition_titles()
+
+    assert exc_info.value.errors == [
+        "0th and 1th values returned have the same title: 'alpha'"
+    ]
+
+
+def test_load_definitions__factory_title_mismatch(proj_path: Path) -> None:
+    write_defs(
+        proj_path,
+        DEFS_WITH_FACTORIES.replace('{"alpha": get_alpha', '{"gamma": get_alpha'),
+    )
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    with pytest.raises(DashboardDefinitionsLoadError):
+        manager.load_definitions(title_pat="gamma")
+
+
+def test_definitions_cache__invalidated_on_change(proj_path: Path) -> None:
+    write_defs(proj_path, DEFS_WITH_FACTORIES)
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    assert manager.load_cached_definition_entries() is None
+
+    entries = {"alpha": {"widgets": 0}}
+    manager.save_cached_definition_entries(entries)
+    assert manager.load_cached_definition_entries() == entries
+
+    # any change to an imported project module invalidates the cache
+    write_defs(proj_path, DEFS_WITH_FACTORIES + "\n# changed\n")
+    assert manager.load_cached_definition_entries() is None
+
+
+def test_definitions_cache__invalidated_when_libddog_changes(
+    proj_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    write_defs(proj_path, DEFS_WITH_FACTORIES)
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    assert manager.load_cached_definition_entries() is None
+
+    entries = {"alpha": {"widgets": 0}}
+    manager.save_cached_definition_entries(entries)
+    assert manager.load_cached_definition_entries() == entries
+
+    # eg. a development checkout of libddog was edited, at the same version
+    monkeypatch.setattr(definitions, "get_libddog_digest", lambda: "changed")
+    assert manager.load_cached_definition_entries() is None
+
+
+def test_libddog_digest__stable() -> None:
+    assert definitions.get_libddog_digest() == definitions.get_libddog_digest()
+
+
+def test_render_definitions__in_worker_processes(proj_path: Path) -> None:
+    write_defs(proj_path, DEFS_WITH_FACTORIES)
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    serial = manager.render_definitions(jobs=1)
+    parallel = manager.render_definitions(jobs=2)
+
+    assert [defn.title for defn in parallel] == ["alpha", "beta"]
+    assert [defn.dct for defn in parallel] == [defn.dct for defn in serial]
+    assert [defn.stats for defn in parallel] == [defn.stats for defn in serial]
+
+
+def test_render_definitions__errors_cross_process_boundary(proj_path: Path) -> None:
+    write_defs(
+        proj_path,
+        DEFS_WITH_FACTORIES.replace('{"alpha": get_alpha', '{"gamma": get_alpha'),
+    )
+    manager = DashboardManager(proj_path=str(proj_path))
+
+    with pytest.raises(DashboardDefinitionsLoadError) as exc_info:
+        manager.render_definitions(jobs=2)
+
+    assert "gamma" in exc_info.value.errors[0]
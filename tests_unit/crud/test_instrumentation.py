@@ -0,0 +1,90 @@
+from typing import Iterator
+
+import pytest
+
+from libddog.crud.client import DatadogClient
+from libddog.crud.errors import DashboardGetFailed
+from libddog.crud.instrumentation import TimingCollector, get_endpoint_name
+from libddog.dashboards import Dashboard, Note
+from libtests.fake_datadog import FakeDatadogServer
+
+
+@pytest.fixture
+def fake_datadog(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeDatadogServer]:
+    with FakeDatadogServer() as server:
+        for key, value in server.environ.items():
+            monkeypatch.setenv(key, value)
+
+        yield server
+
+
+def create_client(collector: TimingCollector) -> DatadogClient:
+    client = DatadogClient(instrumentation=collector)
+    client.load_credentials_from_environment()
+    return client
+
+
+def test_get_endpoint_name() -> None:
+    assert get_endpoint_name("/v1/dashboard") == "/v1/dashboard"
+    assert get_endpoint_name("/v1/dashboard/abc-def-ghi") == "/v1/dashboard/{id}"
+    assert (
+        get_endpoint_name("/v2/current_user/application_keys/1234-abcd")
+        == "/v2/current_user/application_keys/{id}"
+    )
+
+
+def test_collector__requests(fake_datadog: FakeDatadogServer) -> None:
+    collector = TimingCollector()
+    client = create_client(collector)
+
+    dash = Dashboard(title="timed", widgets=[Note(content="a note")])
+    id = client.create_dashboard(dashboard=dash)
+    client.get_dashboard(id=id)
+    with pytest.raises(DashboardGetFailed):
+        client.get_dashboard(id="nonexistent")
+
+    dct = collector.as_dict()
+
+    endpoints = {(row["method"], row["endpoint"]): row for row in dct["endpoints"]}
+    assert set(endpoints) == {("GET", "/v1/dashboard/{id}"), ("POST", "/v1/dashboard")}
+
+    post = endpoints[("POST", "/v1/dashboard")]
+    assert post["calls"] == 1
+    assert post["errors"] == 0
+    assert post["bytes_sent"] > 0
+    assert post["bytes_received"] > 0
+    assert post["status_codes"] == {"200": 1}
+
+    get = endpoints[("GET", "/v1/dashboard/{id}")]
+    assert get["calls"] == 2
+    assert get["errors"] == 1
+    assert get["bytes_sent"] == 0
+    assert get["status_codes"] == {"200": 1, "404": 1}
+
+    assert dct["totals"]["calls"] == 3
+    assert len(dct["requests"]) == 3
+    assert dct["phases"]["render"] > 0
+
+    lines = collector.format_table()
+    assert lines[0].startswith("ENDPOINT")
+    assert lines[-2].startswith("TOTAL")
+    assert lines[-1].startswith("[render]")
+
+
+def test_collector__rate_limited(fake_datadog: FakeDatadogServer) -> None:
+    fake_datadog.state.rate_limit = 1
+    fake_datadog.state.rate_limit_period_s = 0.2
+    collector = TimingCollector()
+    client = create_client(collector)
+
+    client.list_dashboards()
+    client.list_dashboards()
+
+    event1, event2 = collector.events
+    assert event1.status_codes == [200]
+    assert event1.retries == 0
+
+    assert event2.status_codes[0] == 429
+    assert event2.status_codes[-1] == 200
+    assert event2.retries == event2.sleeps > 0
+    assert event2.elapsed_s >= event2.sleep_s > 0
@@ -0,0 +1,90 @@
+import pstats
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from libddog.crud.dashboards import DashboardManager
+from libddog.crud.profiling import DefinitionsProfiler
+from libddog.dashboards import Dashboard, Request, Timeseries
+from libddog.metrics import Query
+
+
+def get_queries_dashboard() -> Dashboard:
+    widgets = [
+        Timeseries(
+            title=f"widget {idx}",
+            requests=[
+                Request(
+                    queries=[
+                        Query("aws.ec2.cpuutilization")
+                        .filter(role="db", az=f"az{idx}")
+                        .agg("avg")
+                        .by("host")
+                    ]
+                )
+            ],
+        )
+        for idx in range(20)
+    ]
+    return Dashboard(title="queries", widgets=widgets)
+
+
+def get_empty_dashboard() -> Dashboard:
+    return Dashboard(title="empty")
+
+
+def create_manager(tmp_path: Path) -> DashboardManager:
+    manager = DashboardManager(proj_path=str(tmp_path))
+    manager._factories = {
+        "queries": get_queries_dashboard,
+        "empty": get_empty_dashboard,
+    }
+    return manager
+
+
+def test_profiler__attributes_time_and_allocations(tmp_path: Path) -> None:
+    profiler = DefinitionsProfiler(create_manager(tmp_path))
+    report = profiler.profile()
+
+    queries, empty = report.profiles
+    assert queries.title == "queries"
+    assert empty.title == "empty"
+
+    assert queries.total_s > empty.total_s
+    assert queries.categories["clone"] > 0
+    assert queries.categories["validate"] > 0
+    assert report.get_category_totals()["clone"] == (
+        queries.categories["clone"] + empty.categories["clone"]
+    )
+
+    assert queries.alloc_peak is not None and queries.alloc_peak > 0
+    assert queries.alloc_libddog is not None and queries.alloc_libddog > 0
+
+    filepath = tmp_path / "defs.prof"
+    report.dump_stats(str(filepath))
+    stats = pstats.Stats(str(filepath))
+    funcnames = {funcname for _, _, funcname in stats.stats}  # type: ignore
+    assert "get_queries_dashboard" in funcnames
+
+
+def test_profiler__without_allocations(tmp_path: Path) -> None:
+    profiler = DefinitionsProfiler(create_manager(tmp_path), trace_allocations=False)
+    report = profiler.profile(title_pat="q*")
+
+    (queries,) = report.profiles
+    assert queries.title == "queries"
+    assert queries.alloc_peak is None
+
+
+def test_profiler__without_reset_peak(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # tracemalloc.reset_peak is missing on Python 3.8
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+
+    report = DefinitionsProfiler(create_manager(tmp_path)).profile()
+
+    queries, empty = report.profiles
+    assert queries.alloc_peak is not None and queries.alloc_peak > 0
+    assert empty.alloc_peak is not None and empty.alloc_peak >= 0
@@ -0,0 +1,131 @@
+from typing import Iterator
+
+import pytest
+import requests
+
+from libddog.crud.client import DatadogClient
+from libddog.crud.errors import DashboardCreateFailed, DashboardListFailed
+from libddog.crud.retries import RetryPolicy
+from libtests.fake_datadog import FakeDatadogServer
+
+
+@pytest.fixture
+def fake_datadog(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeDatadogServer]:
+    with FakeDatadogServer() as server:
+        for key, value in server.environ.items():
+            monkeypatch.setenv(key, value)
+
+        yield server
+
+
+def create_client(
+    *, max_attempts: int = 5, read_timeout_s: float = 60.0
+) -> DatadogClient:
+    policy = RetryPolicy(
+        max_attempts=max_attempts,
+        read_timeout_s=read_timeout_s,
+        backoff_base_s=0.01,
+        backoff_max_s=0.05,
+        seed=0,
+    )
+    client = DatadogClient(retry_policy=policy)
+    client.load_credentials_from_environment()
+    return client
+
+
+def test_policy__idempotency() -> None:
+    policy = RetryPolicy()
+
+    for method in ("GET", "PUT", "DELETE"):
+        assert policy.should_retry_response(method=method, status_code=503)
+    assert not policy.should_retry_response(method="GET", status_code=500)
+    assert not policy.should_retry_response(method="GET", status_code=404)
+
+    # POST may have taken effect, unless it was rate limited
+    assert not policy.should_retry_response(method="POST", status_code=502)
+    assert policy.should_retry_response(
+        method="POST", status_code=502, deduplicated=True
+    )
+    assert policy.should_retry_response(method="POST", status_code=429)
+
+    read_timeout = requests.exceptions.ReadTimeout()
+    connect_timeout = requests.exceptions.ConnectTimeout()
+    assert policy.should_retry_exception(method="GET", exc=read_timeout)
+    assert not policy.should_retry_exception(method="POST", exc=read_timeout)
+    assert policy.should_retry_exception(method="POST", exc=connect_timeout)
+    assert not policy.should_retry_exception(
+        method="GET", exc=requests.exceptions.InvalidURL()
+    )
+
+
+def test_policy__backoff_is_jittered_and_capped() -> None:
+    policy = RetryPolicy(backoff_base_s=1.0, backoff_max_s=10.0, seed=0)
+
+    waits = []
+    wait_s = None
+    for _ in range(20):
+        wait_s = policy.get_backoff(wait_s)
+        waits.append(wait_s)
+
+    assert all(1.0 <= wait_s <= 10.0 for wait_s in waits)
+    assert len(set(waits)) > 1
+    assert max(waits) == 10.0
+
+
+def test_policy__timeout_respects_deadline() -> None:
+    policy = RetryPolicy(connect_timeout_s=5, read_timeout_s=60)
+
+    assert policy.get_timeout(100) == (5, 60)
+    assert policy.get_timeout(2) == (2, 2)
+
+
+def test_client__retries_5xx_for_idempotent_requests(
+    fake_datadog: FakeDatadogServer,
+) -> None:
+    fake_datadog.state.inject_error(status=503, method="GET", count=2)
+    client = create_client()
+
+    assert client.list_dashboards() == []
+    assert len(fake_datadog.state.requests) == 3
+
+
+def test_client__gives_up_after_max_attempts(fake_datadog: FakeDatadogServer) -> None:
+    fake_datadog.state.inject_error(status=502, method="GET", count=10)
+    client = create_client(max_attempts=3)
+
+    with pytest.raises(DashboardListFailed) as exc_info:
+        client.list_dashboards()
+    assert exc_info.value.http_status_code == 502
+    assert len(fake_datadog.state.requests) == 3
+
+
+def test_client__does_not_retry_create(fake_datadog: FakeDatadogServer) -> None:
+    fake_datadog.state.inject_error(status=504, method="POST", count=1)
+    client = create_client()
+
+    with pytest.raises(DashboardCreateFailed):
+        client.create_dashboard_from_dict({"title": "x", "widgets": []})
+    assert len(fake_datadog.state.requests) == 1
+
+
+def test_client__retries_read_timeouts(fake_datadog: FakeDatadogServer) -> None:
+    fake_datadog.state.latency_s = 0.5
+    client = create_client(read_timeout_s=0.1, max_attempts=2)
+
+    with pytest.raises(DashboardListFailed) as exc_info:
+        client.list_dashboards()
+    assert exc_info.value.http_status_code is None
+    assert "timed out" in exc_info.value.errors[0]
+
+
+def test_client__stops_at_deadline(fake_datadog: FakeDatadogServer) -> None:
+    fake_datadog.state.inject_error(status=503, method="GET", count=10)
+    policy = RetryPolicy(backoff_base_s=1.0, deadline_s=0.5, seed=0)
+    client = DatadogClient(retry_policy=policy)
+    client.load_credentials_from_environment()
+
+    with pytest.raises(DashboardListFailed) as exc_info:
+        client.list_dashboards()
+    assert exc_info.value.http_status_code == 503
+    # waiting one second would exceed the deadline
+    assert len(fake_datadog.state.requests) == 1
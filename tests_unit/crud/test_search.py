@@ -0,0 +1,182 @@
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from libddog.common.types import JsonDict
+from libddog.crud import search
+from libddog.crud.search import SearchIndex
+from libddog.dashboards import (
+    Dashboard,
+    Group,
+    Note,
+    Request,
+    TemplateVariableDefinition,
+    Timeseries,
+)
+from libddog.metrics import Query
+
+
+def make_dashboard(title: str, metrics: List[str]) -> JsonDict:
+    queries = [
+        Query(metric).filter("$region", env="prod").agg("avg").by("host")
+        for metric in metrics
+    ]
+    dash = Dashboard(
+        title=title,
+        widgets=[
+            Note(content="not indexed"),
+            Group(
+                title="group",
+                widgets=[
+                    Timeseries(title="graph", requests=[Request(queries=queries)])
+                ],
+            ),
+        ],
+        tmpl_var_defs=[
+            TemplateVariableDefinition(name="region", tag="region", default_value="*"),
+            TemplateVariableDefinition(name="az", tag="az", default_value="*"),
+        ],
+    )
+
+    dct = dash.as_dict()
+    # a legacy request, as found on dashboards made in the UI long ago
+    dct["widgets"].append(
+        {"definition": {"type": "timeseries", "requests": {"q": "sum:legacy{*}"}}}
+    )
+    return dct
+
+
+def write_snapshot(dir: Path, id: str, date: str, dct: JsonDict) -> None:
+    dct = dict(dct, id=id)
+    filepath = dir / f"{id}--{dct['title'].replace(' ', '_')}--{date}.json"
+    filepath.write_text(json.dumps(dct))
+
+
+def test_search_index__search(tmp_path: Path) -> None:
+    write_snapshot(
+        tmp_path, "aaa", "2021-06-01T12:00:00Z", make_dashboard("EC2", ["aws.ec2.cpu"])
+    )
+    write_snapshot(
+        tmp_path,
+        "bbb",
+        "2021-06-01T12:00:00Z",
+        make_dashboard("ELB", ["aws.elb.latency", "aws.ec2.cpu"]),
+    )
+
+    index = SearchIndex(tmp_path / "_cache" / "search.sqlite")
+    update = index.update(tmp_path)
+    assert update.files_added == 2
+    assert update.dashboards_indexed == 2
+    assert update.queries_indexed == 5
+    assert update.queries_failed == 0
+
+    hits = index.search_dashboards(metric="aws.ec2.*")
+    assert [(hit.id, hit.title, hit.queries) for hit in hits] == [
+        ("aaa", "EC2", 1),
+        ("bbb", "ELB", 1),
+    ]
+
+    query_hits = index.search_queries(metric="aws.elb.latency", tag="env:prod")
+    assert [(hit.dashboard_id, hit.widget_title) for hit in query_hits] == [
+        ("bbb", "graph")
+    ]
+    assert query_hits[0].query == "avg:aws.elb.latency{$region, env:prod} by {host}"
+
+    assert len(index.search_queries(tag="host")) == 3
+    assert index.search_queries(tag="env:staging") == []
+    assert len(index.search_queries(metric="legacy")) == 2
+
+    # defined but not used
+    hits = index.search_dashboards(tmpl_var="$az")
+    assert [(hit.id, hit.queries) for hit in hits] == [("aaa", 0), ("bbb", 0)]
+
+    index.close()
+
+
+def test_search_index__incremental_update(tmp_path: Path) -> None:
+    index_path = tmp_path / "search.sqlite"
+    snapshots_path = tmp_path / "_snapshots"
+    snapshots_path.mkdir()
+
+    write_snapshot(
+        snapshots_path, "aaa", "2021-06-01T12:00:00Z", make_dashboard("EC2", ["a"])
+    )
+
+    index = SearchIndex(index_path)
+    assert index.update(snapshots_path).dashboards_indexed == 1
+    assert index.update(snapshots_path).files_added == 0
+    index.close()
+
+    # a newer snapshot replaces the dashboard, an older one is ignored
+    write_snapshot(
+        snapshots_path, "aaa", "2021-06-02T12:00:00Z", make_dashboard("EC2", ["b"])
+    )
+    write_snapshot(
+        snapshots_path, "aaa", "2021-05-01T12:00:00Z", make_dashboard("EC2", ["c"])
+    )
+
+    index = SearchIndex(index_path)
+    update = index.update(snapshots_path)
+    assert update.files_added == 2
+    assert update.dashboards_indexed == 1
+
+    assert index.search_queries(metric="a") == []
+    assert len(index.search_queries(metric="b")) == 1
+    assert index.search_queries(metric="c") == []
+    index.close()
+
+
+def test_search_index__snapshot_that_fails_to_load_is_retried(tmp_path: Path) -> None:
+    index_path = tmp_path / "search.sqlite"
+    snapshots_path = tmp_path / "_snapshots"
+    snapshots_path.mkdir()
+
+    write_snapshot(
+        snapshots_path, "aaa", "2021-06-01T12:00:00Z", make_dashboard("EC2", ["a"])
+    )
+    broken = snapshots_path / "aaa--EC2--2021-06-02T12:00:00Z.json"
+    broken.write_text("[]")
+
+    # the older snapshot is indexed in place of the broken one
+    index = SearchIndex(index_path)
+    update = index.update(snapshots_path)
+    assert update.files_added == 1
+    assert len(index.search_queries(metric="a")) == 1
+
+    write_snapshot(
+        snapshots_path, "aaa", "2021-06-02T12:00:00Z", make_dashboard("EC2", ["b"])
+    )
+
+    update = index.update(snapshots_path)
+    assert update.files_added == 1
+    assert index.search_queries(metric="a") == []
+    assert len(index.search_queries(metric="b")) == 1
+
+
+def test_search_index__rebuilt_when_the_parser_changes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index_path = tmp_path / "search.sqlite"
+    snapshots_path = tmp_path / "_snapshots"
+    snapshots_path.mkdir()
+
+    write_snapshot(
+        snapshots_path, "aaa", "2021-06-01T12:00:00Z", make_dashboard("EC2", ["a"])
+    )
+
+    index = SearchIndex(index_path)
+    update = index.update(snapshots_path)
+    assert update.queries_failed == 0
+    assert index.update(snapshots_path).files_added == 0
+    index.close()
+
+    monkeypatch.setattr(search, "get_parser_digest", lambda: "changed")
+
+    index = SearchIndex(index_path)
+    update = index.update(snapshots_path)
+    assert update.files_added == 1
+    assert update.dashboards_indexed == 1
+    assert len(index.search_queries(metric="a")) == 1
+    index.close()
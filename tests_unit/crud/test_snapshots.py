@@ -0,0 +1,165 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import pytest
+
+from libddog.common.types import JsonDict
+from libddog.crud.dashboards import DashboardManager
+from libddog.crud.errors import SnapshotLoadError
+from libddog.crud.snapshots import RestoreKind, Snapshot, find_snapshots_since
+
+
+def write_snapshot(dir: Path, id: str, title: str, date: str) -> Path:
+    filepath = dir / f"{id}--{title.replace(' ', '_')}--{date}.json"
+    dct = {
+        "id": id,
+        "title": title,
+        "widgets": [],
+        "layout_type": "ordered",
+        "author_handle": "someone@example.com",
+        "created_at": "2021-01-01T00:00:00.000000+00:00",
+        "modified_at": "2021-01-01T00:00:00.000000+00:00",
+        "url": f"/dashboard/{id}",
+    }
+    filepath.write_text(json.dumps(dct))
+    return filepath
+
+
+class FakeClient:
+    def __init__(self, live: List[JsonDict]) -> None:
+        self.live = live
+        self.calls: List[Tuple[str, Any]] = []
+
+    def resize_pool(self, pool_size: int) -> None:
+        pass
+
+    def list_dashboards(self) -> List[JsonDict]:
+        return self.live
+
+    def get_dashboard(self, *, id: str) -> JsonDict:
+        return {"id": id, "title": "current"}
+
+    def create_dashboard_from_dict(self, dct: JsonDict) -> str:
+        self.calls.append(("create", dct))
+        return "new-id-000"
+
+    def update_dashboard_from_dict(self, dct: JsonDict, id: str) -> None:
+        self.calls.append(("update", (id, dct)))
+
+
+def test_snapshot__parse_filename() -> None:
+    parsed = Snapshot.parse_filename(
+        Path("abc-def-ghi--My_title--2021-06-01T12:00:00Z.json")
+    )
+    assert parsed == ("abc-def-ghi", datetime(2021, 6, 1, 12, tzinfo=timezone.utc))
+
+    assert Snapshot.parse_filename(Path("notes.json")) is None
+    assert Snapshot.parse_filename(Path("a--b--not-a-date.json")) is None
+
+
+def test_snapshot__load_strips_read_only_keys(tmp_path: Path) -> None:
+    filepath = write_snapshot(tmp_path, "abc-def-ghi", "title", "2021-06-01T12:00:00Z")
+
+    snapshot = Snapshot.load(filepath)
+    assert snapshot.id == "abc-def-ghi"
+    assert snapshot.title == "title"
+    assert snapshot.get_restorable_dict() == {
+        "title": "title",
+        "widgets": [],
+        "layout_type": "ordered",
+    }
+
+    (tmp_path / "x--y--2021-06-01T12:00:00Z.json").write_text("[]")
+    with pytest.raises(SnapshotLoadError):
+        Snapshot.load(tmp_path / "x--y--2021-06-01T12:00:00Z.json")
+
+
+def test_find_snapshots_since__earliest_per_dashboard(tmp_path: Path) -> None:
+    write_snapshot(tmp_path, "aaa-aaa-aaa", "a", "2021-06-01T11:00:00Z")
+    write_snapshot(tmp_path, "aaa-aaa-aaa", "a", "2021-06-01T12:30:00Z")
+    write_snapshot(tmp_path, "aaa-aaa-aaa", "a", "2021-06-01T12:10:00Z")
+    write_snapshot(tmp_path, "bbb-bbb-bbb", "b", "2021-06-01T13:00:00Z")
+    write_snapshot(tmp_path, "ccc-ccc-ccc", "c", "2021-06-01T10:00:00Z")
+
+    since = datetime(2021, 6, 1, 12, tzinfo=timezone.utc)
+    snapshots = find_snapshots_since(tmp_path, since)
+
+    assert [
+        (snap.id, snap.taken_at.hour, snap.taken_at.minute) for snap in snapshots
+    ] == [
+        ("aaa-aaa-aaa", 12, 10),
+        ("bbb-bbb-bbb", 13, 0),
+    ]
+
+
+def test_plan_restore__conflicts(tmp_path: Path) -> None:
+    manager = DashboardManager(proj_path=str(tmp_path))
+    manager._client = FakeClient(  # type: ignore
+        live=[
+            {"id": "aaa-aaa-aaa", "title": "a renamed"},
+            {"id": "ddd-ddd-ddd", "title": "b"},
+        ]
+    )
+
+    snapshots = [
+        Snapshot.load(
+            write_snapshot(tmp_path, "aaa-aaa-aaa", "a", "2021-06-01T11:00:00Z")
+        ),
+        Snapshot.load(
+            write_snapshot(tmp_path, "bbb-bbb-bbb", "b", "2021-06-01T11:00:00Z")
+        ),
+        Snapshot.load(
+            write_snapshot(tmp_path, "ccc-ccc-ccc", "c", "2021-06-01T11:00:00Z")
+        ),
+        Snapshot.load(
+            write_snapshot(tmp_path, "eee-eee-eee", "c", "2021-06-01T11:00:00Z")
+        ),
+    ]
+
+    actions = manager.plan_restore(snapshots)
+
+    assert [action.kind for action in actions] == [
+        RestoreKind.UPDATE,
+        RestoreKind.CREATE,
+        RestoreKind.CREATE,
+        RestoreKind.CREATE,
+    ]
+    assert actions[0].conflict is None
+    # a different live dashboard already has the title
+    assert actions[1].conflict and "ddd-ddd-ddd" in actions[1].conflict
+    assert actions[2].conflict is None
+    # two snapshots would create the same title
+    assert actions[3].conflict and "ccc-ccc-ccc" in actions[3].conflict
+
+
+def test_restore_snapshots__updates_and_creates(tmp_path: Path) -> None:
+    client = FakeClient(live=[{"id": "aaa-aaa-aaa", "title": "a"}])
+    manager = DashboardManager(proj_path=str(tmp_path))
+    manager._client = client  # type: ignore
+
+    snapshots = [
+        Snapshot.load(
+            write_snapshot(tmp_path, "aaa-aaa-aaa", "a", "2021-06-01T11:00:00Z")
+        ),
+        Snapshot.load(
+            write_snapshot(tmp_path, "bbb-bbb-bbb", "b", "2021-06-01T11:00:00Z")
+        ),
+    ]
+    actions = manager.plan_restore(snapshots)
+
+    results = list(manager.restore_snapshots(actions, jobs=2))
+
+    ids = sorted(result.id or "" for result in results)
+    assert ids == ["aaa-aaa-aaa", "new-id-000"]
+    assert all(result.error is None for result in results)
+
+    # the created dashboard is updated once more to remove its create marker
+    kinds = sorted(kind for kind, _ in client.calls)
+    assert kinds == ["create", "update", "update"]
+    updated_ids = sorted(args[0] for kind, args in client.calls if kind == "update")
+    assert updated_ids == ["aaa-aaa-aaa", "new-id-000"]
+
+    # the dashboard being updated was snapshotted first
+    assert len(list(manager.snapshots_path.iterdir())) == 1
@@ -1,9 +1,19 @@
+import pytest
+
 from libddog.dashboards import (
     Dashboard,
+    Group,
     PopulatedTemplateVariable,
+    Request,
     TemplateVariableDefinition,
     TemplateVariablesPreset,
+    Timeseries,
+)
+from libddog.dashboards.exceptions import (
+    TemplateVariableConflict,
+    UndefinedTemplateVariables,
 )
+from libddog.metrics import Query
 
 
 def test_dashboard__minimal() -> None:
@@ -144,3 +154,73 @@ def test_dashboard__infer_templ_vars_from_templ_preset() -> None:
         "title": "EC2 instances",
         "widgets": [],
     }
+
+
+def test_dashboard__dedupe_templ_vars_by_value() -> None:
+    # every preset has its own (equal) definition of the same template var
+    presets = [
+        TemplateVariablesPreset(
+            name=region,
+            populated_vars=[
+                PopulatedTemplateVariable(
+                    tmpl_var=TemplateVariableDefinition(
+                        name="region", tag="region", default_value="*"
+                    ),
+                    value=region,
+                )
+            ],
+        )
+        for region in ("us-east-1", "us-west-1", "ap-southeast-2")
+    ]
+
+    dash = Dashboard(title="EC2 instances", tmpl_var_presets=presets)
+
+    assert dash.as_dict()["template_variables"] == [
+        {"default": "*", "name": "region", "prefix": "region"},
+    ]
+
+
+def test_dashboard__conflicting_templ_vars() -> None:
+    def_az = TemplateVariableDefinition(
+        name="az", tag="availability_zone", default_value="*"
+    )
+    def_az_other = TemplateVariableDefinition(
+        name="az", tag="availability_zone", default_value="us-east-1a"
+    )
+    preset = TemplateVariablesPreset(
+        name="az",
+        populated_vars=[PopulatedTemplateVariable(tmpl_var=def_az_other, value="*")],
+    )
+
+    with pytest.raises(TemplateVariableConflict):
+        Dashboard(
+            title="EC2 instances", tmpl_var_defs=[def_az], tmpl_var_presets=[preset]
+        )
+
+
+def test_dashboard__undefined_templ_vars() -> None:
+    def_region = TemplateVariableDefinition(
+        name="region", tag="region", default_value="*"
+    )
+    def_az = TemplateVariableDefinition(
+        name="az", tag="availability_zone", default_value="*"
+    )
+    query = (
+        Query("aws.ec2.cpuutilization").filter("$region").filter_ne("$az").agg("avg")
+    )
+    widgets = [
+        Group(
+            title="cpu",
+            widgets=[Timeseries(title="cpu", requests=[Request(queries=[query])])],
+        )
+    ]
+
+    Dashboard(title="defined", widgets=widgets, tmpl_var_defs=[def_region, def_az])
+
+    with pytest.raises(UndefinedTemplateVariables) as exc_info:
+        Dashboard(title="undefined", widgets=widgets, tmpl_var_defs=[def_region])
+
+    assert str(exc_info.value) == (
+        "Dashboard 'undefined' uses undefined template variables: "
+        "$az (used in widget 'cpu')"
+    )
@@ -0,0 +1,94 @@
+from typing import List, Set, Tuple
+
+import pytest
+
+from libddog.dashboards import FlowLayout, Note, NotePreset, Size, Widget
+from libddog.dashboards.exceptions import FlowLayoutError
+
+
+def note(width: int, height: int) -> Note:
+    return Note(content="a note", size=Size(width=width, height=height))
+
+
+def covered_cells(wids: List[Widget]) -> List[Tuple[int, int]]:
+    cells = []
+    for wid in wids:
+        assert wid.position.x is not None and wid.position.y is not None
+        assert wid.size.width is not None and wid.size.height is not None
+        for x in range(wid.position.x, wid.position.x + wid.size.width):
+            for y in range(wid.position.y, wid.position.y + wid.size.height):
+                cells.append((x, y))
+
+    return cells
+
+
+def test_flowlayout__fills_space_next_to_tall_widget() -> None:
+    tall = note(6, 4)
+    short1 = note(6, 2)
+    short2 = note(6, 2)
+
+    layout = FlowLayout(widgets=[tall, short1, short2])
+    wids = layout.get_widgets()
+
+    # no padding needed
+    assert wids == [tall, short1, short2]
+    assert (tall.position.x, tall.position.y) == (0, 0)
+    assert (short1.position.x, short1.position.y) == (6, 0)
+    assert (short2.position.x, short2.position.y) == (6, 2)
+    assert layout.total_height == 4
+
+
+def test_flowlayout__merges_padding() -> None:
+    tall = note(4, 6)
+    short = note(4, 2)
+
+    layout = FlowLayout(widgets=[tall, short])
+    wids = layout.get_widgets()
+
+    assert wids[:2] == [tall, short]
+    pads = wids[2:]
+
+    # one padding to the right of both widgets and one below the short one
+    assert len(pads) == 2
+    for pad in pads:
+        assert isinstance(pad, Note)
+        assert pad.preset is NotePreset.CAPTION
+        assert pad.content == ""
+
+    layout_of_pads = {
+        (pad.position.x, pad.position.y, pad.size.width, pad.size.height)
+        for pad in pads
+    }
+    assert layout_of_pads == {(8, 0, 4, 6), (4, 2, 4, 4)}
+
+
+def test_flowlayout__covers_page_exactly_once() -> None:
+    sizes = [(3, 2), (5, 3), (12, 1), (2, 5), (7, 2), (4, 4), (1, 1), (6, 3)] * 50
+    layout = FlowLayout(widgets=[note(width, height) for width, height in sizes])
+
+    wids = layout.get_widgets()
+    cells = covered_cells(wids)
+
+    height = layout.total_height
+    expected: Set[Tuple[int, int]] = {(x, y) for x in range(12) for y in range(height)}
+    assert len(cells) == len(expected)
+    assert set(cells) == expected
+
+
+def test_flowlayout__idempotent() -> None:
+    widgets: List[Widget] = [note(5, 2), note(3, 3), note(8, 1)]
+    layout = FlowLayout(widgets=widgets)
+
+    first = [(p.x, p.y, p.width, p.height) for p in layout.get_placements()]
+    second = [(p.x, p.y, p.width, p.height) for p in layout.get_placements()]
+    assert first == second
+
+    # computing placements does not modify the widgets
+    assert all(wid.position.x == 0 and wid.position.y == 0 for wid in widgets)
+
+
+def test_flowlayout__too_wide() -> None:
+    layout = FlowLayout(widgets=[note(13, 1)])
+
+    with pytest.raises(FlowLayoutError):
+        layout.get_widgets()
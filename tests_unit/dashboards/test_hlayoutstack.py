@@ -1,4 +1,6 @@
-from libddog.dashboards import HLayout, Note, NotePreset
+from typing import Any, List, Tuple
+
+from libddog.dashboards import HLayout, Note, NotePreset, Widget
 from libddog.dashboards.layouts import HLayoutStack, HLayoutWrapping
 
 
@@ -229,3 +231,40 @@ def test_hlayoutstack__mix_hlayout_hlayoutwrapping() -> None:
     assert pad4.size.height == 5
     assert pad4.position.x == 9
     assert pad4.position.y == 7
+
+
+def test_hlayoutstack__idempotent() -> None:
+    fst = Note(content="this is a note")
+    snd = Note(content="this is another note")
+    thd = Note(content="this is a third note")
+
+    stack = HLayoutStack(
+        layouts=[
+            HLayout(width=5, height=3, widgets=[fst]),
+            HLayoutWrapping(width=5, height=2, widgets=[snd, thd]),
+        ]
+    )
+
+    def layout_of(wids: List[Widget]) -> List[Tuple[Any, ...]]:
+        return [
+            (wid.position.x, wid.position.y, wid.size.width, wid.size.height)
+            for wid in wids
+        ]
+
+    first = layout_of(stack.get_widgets())
+    second = layout_of(stack.get_widgets())
+
+    assert first == second
+    assert first == [
+        (0, 0, 5, 3),
+        (5, 0, 7, 3),
+        (0, 3, 5, 2),
+        (5, 3, 5, 2),
+        (10, 3, 2, 2),
+    ]
+    assert stack.total_height == 5
+
+    # the layouts themselves are not modified
+    layout = stack.layouts[0]
+    assert isinstance(layout, HLayout)
+    assert layout.widgets == [fst]
@@ -140,3 +140,25 @@ def test_note_annotation__minimal() -> None:
         },
         "layout": {"height": 2, "width": 2, "x": 0, "y": 0},
     }
+
+
+def test_note__apply_preset() -> None:
+    note = Note(preset=NotePreset.HEADER, content="this is a note", font_size=20)
+
+    applied = note.apply_preset()
+    assert applied.font_size == 20
+    assert applied.background_color is BackgroundColor.WHITE
+    assert applied.vertical_align is VerticalAlign.CENTER
+    assert applied.as_dict() == note.as_dict()
+
+
+def test_note__presets_are_not_modified() -> None:
+    defaults = NotePreset.get_defaults()
+    defaults[NotePreset.DEFAULT]["font_size"] = 99
+
+    note = Note(content="this is a note")
+    assert note.as_dict()["definition"]["font_size"] == "14"
+
+    # a rendered note can be modified without affecting the next one
+    note.as_dict()["definition"]["content"] = "modified"
+    assert note.as_dict()["definition"]["content"] == "this is a note"
@@ -0,0 +1,102 @@
+import gc
+from typing import Optional
+
+import pytest
+
+from libddog.common.types import JsonDict
+from libddog.dashboards import Group, Note, Request, Size, Timeseries, Widget
+from libddog.dashboards.registry import get_widget_type, get_widget_types
+from libddog.metrics import Query
+from libddog.metrics.query import QueryState
+
+
+def test_registry__builtin_widget_types() -> None:
+    note_type = get_widget_type(Note)
+    assert note_type is not None
+    assert note_type.name == "note"
+    assert note_type.default_size == (2, 2)
+
+    timeseries_type = get_widget_type(Timeseries)
+    assert timeseries_type is not None
+    assert "on_right_yaxis" in timeseries_type.allowed_atts[Request]
+
+    assert Size.get_defaults()[Group] == (12, 1)
+    assert get_widget_type(Widget) is None
+
+
+def test_registry__subclasses_register_themselves() -> None:
+    class BigNote(Note):
+        _default_size = (6, 3)
+
+    class Heatmap(Widget):
+        _type_name = "heatmap"
+        _default_size = (4, 2)
+        _allowed_atts = {QueryState: ["name", "query"]}
+
+        def as_dict(self) -> JsonDict:
+            return {"definition": {"type": "heatmap"}}
+
+    note = BigNote(content="big")
+    assert (note.size.width, note.size.height) == (6, 3)
+    assert note.as_dict()["definition"]["type"] == "note"
+
+    heatmap = Heatmap(size=Size(height=4))
+    assert (heatmap.size.width, heatmap.size.height) == (4, 4)
+
+    query = Query("aws.ec2.cpuutilization")
+    assert heatmap.query_as_dict(query._state) == {
+        "name": query._state.name,
+        "query": "aws.ec2.cpuutilization{*}",
+    }
+
+
+def test_registry__type_name_is_rendered() -> None:
+    class Heatmap(Timeseries):
+        _type_name = "heatmap"
+
+    class BigNote(Note):
+        _type_name = "big_note"
+
+    heatmap = Heatmap(title="heat", requests=[])
+    assert heatmap.as_dict()["definition"]["type"] == "heatmap"
+    assert Timeseries(title="ts", requests=[]).as_dict()["definition"]["type"] == (
+        "timeseries"
+    )
+
+    assert BigNote(content="big").as_dict()["definition"]["type"] == "big_note"
+    assert Note(content="small").as_dict()["definition"]["type"] == "note"
+
+
+def test_registry__widget_without_size_cannot_be_created() -> None:
+    class Unsized(Widget):
+        _default_size: Optional[tuple] = None  # type: ignore
+
+    with pytest.raises(NotImplementedError):
+        Unsized()
+
+
+def test_registry__invalid_allowed_atts() -> None:
+    class Broken(Widget):
+        _default_size = (1, 1)
+        _allowed_atts = {QueryState: ["name", "nonexistent"]}
+
+    query = Query("aws.ec2.cpuutilization")
+    with pytest.raises(RuntimeError):
+        Broken().query_as_dict(query._state)
+
+
+def test_registry__classes_are_unregistered_when_they_go_away() -> None:
+    def define_widget() -> None:
+        class Throwaway(Widget):
+            _type_name = "throwaway"
+            _default_size = (1, 1)
+
+        assert get_widget_type(Throwaway) is not None
+        assert Throwaway in Size.get_defaults()
+
+    define_widget()
+    gc.collect()
+
+    names = [widget_type.name for widget_type in get_widget_types()]
+    assert "throwaway" not in names
+    assert "note" in names
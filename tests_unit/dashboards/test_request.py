@@ -1,3 +1,6 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from libddog.common.errors import RequestQueryNamesNotUnique
@@ -13,7 +16,7 @@ from libddog.dashboards import (
     Request,
     Style,
 )
-from libddog.metrics import Query
+from libddog.metrics import Int, Query
 
 
 def test_request__minimal() -> None:
@@ -128,6 +131,41 @@ def test_request__synthesize_formulas_from_queries() -> None:
     }
 
 
+def build_request_with_unnamed_queries() -> Request:
+    cpu = Query("aws.ec2.cpuutilization").agg("avg")
+    mem = Query("aws.ec2.memory", name="q1").agg("avg")
+    reqs = Query("aws.elb.request_count").agg("sum")
+
+    # formulas refer to the queries by their provisional names
+    formula = Formula(cpu.identifier() / reqs.identifier() * Int(100))
+
+    return Request(queries=[reqs, mem, cpu], formulas=[formula])
+
+
+def test_request__name_unnamed_queries_by_position() -> None:
+    request = build_request_with_unnamed_queries()
+
+    dct = request.as_dict()
+    assert [query["name"] for query in dct["queries"]] == ["q2", "q1", "q3"]
+    assert dct["formulas"] == [{"formula": "((q3 / q2) * 100)"}]
+
+    # names do not depend on how many queries were built before
+    for _ in range(10):
+        Query("aws.ec2.cpuutilization")
+
+    assert build_request_with_unnamed_queries().as_dict() == dct
+
+
+def test_request__names_are_the_same_in_every_thread() -> None:
+    def render(_: int) -> str:
+        return json.dumps(build_request_with_unnamed_queries().as_dict())
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        payloads = set(executor.map(render, range(40)))
+
+    assert len(payloads) == 1
+
+
 def test_request__non_distinct_query_names() -> None:
     with pytest.raises(RequestQueryNamesNotUnique) as ctx:
         Request(
@@ -0,0 +1,76 @@
+import json
+
+from libddog.dashboards import (
+    Dashboard,
+    Formula,
+    Group,
+    Note,
+    Request,
+    TemplateVariableDefinition,
+    Timeseries,
+    collect_stats,
+)
+from libddog.metrics import Query
+
+
+def test_collect_stats__empty() -> None:
+    dash = Dashboard(title="empty")
+    stats = collect_stats(dash)
+
+    assert stats.as_dict() == {
+        "groups": 0,
+        "widgets": 0,
+        "requests": 0,
+        "queries": 0,
+        "formulas": 0,
+        "metrics": 0,
+        "tmpl_vars": 0,
+        "payload_size": len(json.dumps(dash.as_dict())),
+    }
+
+
+def test_collect_stats__nested() -> None:
+    cpu = Query("aws.ec2.cpuutilization", name="cpu").agg("avg").filter("$region")
+    mem = Query("aws.ec2.mem", name="mem").agg("avg").filter("$region", "$az")
+    cpu_max = Query("aws.ec2.cpuutilization", name="cpu_max").agg("max")
+
+    ts_formulas = Timeseries(
+        title="cpu per mem",
+        requests=[
+            Request(
+                queries=[cpu, mem],
+                formulas=[Formula(cpu.identifier() / mem.identifier())],
+            )
+        ],
+    )
+    # no formulas: one is synthesized per query
+    ts_plain = Timeseries(title="cpu", requests=[Request(queries=[cpu, cpu_max])])
+
+    dash = Dashboard(
+        title="nested",
+        tmpl_var_defs=[
+            TemplateVariableDefinition(name=name, tag=name, default_value="*")
+            for name in ("region", "az")
+        ],
+        widgets=[
+            Note(content="top level note"),
+            Group(
+                title="outer",
+                widgets=[
+                    ts_formulas,
+                    Group(title="inner", widgets=[ts_plain, Note(content="n")]),
+                ],
+            ),
+        ],
+    )
+
+    stats = collect_stats(dash)
+
+    assert stats.groups == 2
+    assert stats.widgets == 4
+    assert stats.requests == 2
+    assert stats.queries == 4
+    assert stats.formulas == 3
+    assert stats.metrics == {"aws.ec2.cpuutilization", "aws.ec2.mem"}
+    assert stats.tmpl_var_usage == {"region": 3, "az": 1}
+    assert stats.payload_size == len(json.dumps(dash.as_dict()))
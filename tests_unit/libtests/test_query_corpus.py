@@ -0,0 +1,106 @@
+import random
+
+from parsimonious.nodes import Node
+
+from libddog.parsing.query_parser import ParserBackend, QueryParser
+from libtests.query_corpus import QueryCorpusGenerator, mutate_query
+
+
+def test_corpus__same_seed_same_corpus() -> None:
+    fst = QueryCorpusGenerator(seed=3).corpus(50)
+    snd = QueryCorpusGenerator(seed=3).corpus(50)
+    other = QueryCorpusGenerator(seed=4).corpus(50)
+
+    assert fst == snd
+    assert fst != other
+
+
+def test_corpus__valid_according_to_the_grammar() -> None:
+    parser = QueryParser(backend=ParserBackend.GRAMMAR)
+    corpus = QueryCorpusGenerator(seed=0).corpus(200, formula_ratio=0.5)
+
+    assert [query for query in corpus if not parser.is_valid_query(query)] == []
+
+
+def get_depth(node: Node) -> int:
+    """
+    The number of expr in the deepest branch of the tree. The grammar nests
+    the arguments of a function after the first, which doesn't count.
+    """
+
+    depth = max((get_depth(child) for child in node.children), default=0)
+
+    if node.expr_name == "expr":
+        return depth + 1
+
+    if (
+        len(node.children) == 4
+        and node.children[1].text == ","
+        and node.children[3].expr_name == "expr"
+    ):
+        return depth - 1
+
+    return depth
+
+
+def get_nesting(query: str) -> int:
+    return get_depth(QueryParser.get_instance().parse_st(query)) - 1
+
+
+def test_corpus__formula_ratio() -> None:
+    generator = QueryCorpusGenerator(seed=0)
+
+    formulas = generator.corpus(20, formula_ratio=1)
+    queries = generator.corpus(20, formula_ratio=0)
+
+    assert all(get_nesting(query) > 0 for query in formulas)
+    assert all(get_nesting(query) == 0 for query in queries)
+
+
+def test_formula__nesting_in_range() -> None:
+    generator = QueryCorpusGenerator(seed=0, formula_depth=(2, 4))
+    for _ in range(20):
+        assert 2 <= get_nesting(generator.formula()) <= 4
+
+    generator = QueryCorpusGenerator(seed=0, formula_depth=(15, 15))
+    assert get_nesting(generator.formula()) == 15
+
+
+def test_query__long_filters_and_many_by_tags() -> None:
+    generator = QueryCorpusGenerator(seed=0, filter_items=(25, 25), by_tags=(8, 8))
+
+    query = generator.query()
+    filter_ = query[query.index("{") : query.index("}") + 1]
+    by = query[query.index("by") :]
+
+    assert filter_.count(",") == 24
+    assert by[: by.index("}")].count(",") == 7
+
+
+def test_query__no_filter_or_by() -> None:
+    generator = QueryCorpusGenerator(seed=0, filter_items=(0, 0), by_tags=(0, 0))
+
+    for query in generator.corpus(20, formula_ratio=0):
+        assert "{" not in query
+        # '.rollup(..)' etc would be part of the metric name
+        assert "(" not in query
+
+
+def test_weights__override_the_grammar_alternatives() -> None:
+    generator = QueryCorpusGenerator(
+        seed=0, formula_depth=(3, 3), weights={"binop": [0, 0, 0, 1, 0]}
+    )
+
+    formulas = [generator.formula() for _ in range(20)]
+
+    assert any("/" in formula for formula in formulas)
+    assert not any("+" in formula for formula in formulas)
+
+
+def test_mutate_query() -> None:
+    rnd = random.Random(0)
+
+    mutations = {mutate_query("avg:cpu{*}", rnd) for _ in range(50)}
+
+    assert len(mutations) > 10
+    assert all(abs(len(mutation) - len("avg:cpu{*}")) == 1 for mutation in mutations)
@@ -0,0 +1,107 @@
+import threading
+from typing import Dict, Optional
+
+from libddog.dashboards import Formula
+from libddog.metrics import Float, Identifier, Int, NodeInterner, Query, interning
+from libddog.metrics.interning import get_active_interner
+
+
+def test_interning__disabled_by_default() -> None:
+    assert get_active_interner() is None
+
+    q1 = Query("aws.ec2.cpuutilization").filter(env="prod").agg("avg").by("host")
+    q2 = Query("aws.ec2.cpuutilization").filter(env="prod").agg("avg").by("host")
+
+    assert q1._state.metric is not q2._state.metric
+    assert not q1._state.metric._frozen
+
+
+def test_interning__shares_query_nodes() -> None:
+    with interning() as interner:
+        q1 = Query("aws.ec2.cpuutilization").filter("$az", env="prod").agg("avg")
+        q2 = Query("aws.ec2.cpuutilization").filter("$az", env="prod").agg("avg")
+        q1 = q1.by("host")
+        q2 = q2.by("host").by("az")
+
+    assert get_active_interner() is None
+
+    s1, s2 = q1._state, q2._state
+    assert s1.metric is s2.metric
+    assert s1.filter and s2.filter
+    assert s1.filter.conds[0] is s2.filter.conds[0]
+    assert s1.filter.conds[1] is s2.filter.conds[1]
+
+    # extending 'by' must not affect the query the first By was shared with
+    assert s1.agg and s1.agg.by and s2.agg and s2.agg.by
+    assert s1.agg.by.tags == ["host"]
+    assert s2.agg.by.tags == ["host", "az"]
+
+    # Metric, TmplVar, Tag, By(host), By(host, az)
+    assert len(interner) == 5
+
+    assert s1.codegen() == "avg:aws.ec2.cpuutilization{$az, env:prod} by {host}"
+    assert s2.codegen() == "avg:aws.ec2.cpuutilization{$az, env:prod} by {host, az}"
+
+
+def test_interning__shares_formula_subtrees() -> None:
+    with interning(NodeInterner()) as interner:
+        f1 = Formula(Identifier("a") / Identifier("b") * Int(100))
+        f2 = Formula(Identifier("a") / Identifier("b") * Int(100))
+        f3 = Formula(Identifier("a") / Identifier("b") * Float(100.0))
+
+    assert f1.formula is f2.formula
+    assert f1.formula is not f3.formula
+    assert f1.formula.children()[0] is f3.formula.children()[0]
+
+    assert f1.as_dict() == {"formula": "((a / b) * 100)"}
+    assert f3.as_dict() == {"formula": "((a / b) * 100.0)"}
+    assert interner.hits > 0
+
+
+def test_interning__frozen_nodes_are_not_copied() -> None:
+    with interning():
+        query = Query("aws.ec2.cpuutilization").filter(env="prod")
+
+    state = query._state
+    clone = state.clone()
+
+    assert clone is not state
+    assert clone.filter is not state.filter
+    assert clone.metric is state.metric
+    assert clone.filter and state.filter
+    assert clone.filter.conds[0] is state.filter.conds[0]
+
+
+def test_interning__overlapping_blocks_in_threads() -> None:
+    # A enters, B enters, A exits, B exits
+    a_entered = threading.Event()
+    b_entered = threading.Event()
+    a_exited = threading.Event()
+    inside: Dict[str, bool] = {}
+    after: Dict[str, Optional[NodeInterner]] = {}
+
+    def thread_a() -> None:
+        with interning() as interner:
+            a_entered.set()
+            b_entered.wait()
+            inside["a"] = get_active_interner() is interner
+        after["a"] = get_active_interner()
+        a_exited.set()
+
+    def thread_b() -> None:
+        a_entered.wait()
+        with interning() as interner:
+            b_entered.set()
+            a_exited.wait()
+            inside["b"] = get_active_interner() is interner
+        after["b"] = get_active_interner()
+
+    threads = [threading.Thread(target=thread_a), threading.Thread(target=thread_b)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert inside == {"a": True, "b": True}
+    assert after == {"a": None, "b": None}
+    assert get_active_interner() is None
@@ -0,0 +1,86 @@
+from libddog.metrics import Identifier, Int, abs, outliers, timeshift
+from libddog.metrics.bases import FormulaNode
+from libddog.metrics.interning import intern_formula, interning
+from libddog.metrics.support import (
+    find_identifier_names,
+    find_identifiers,
+    rename_identifiers,
+)
+
+
+def test_children__declared_explicitly() -> None:
+    cpu = Identifier("cpu")
+    reqs = Identifier("reqs")
+    two = Int(2)
+
+    assert cpu.children() == ()
+    assert two.children() == ()
+    assert (cpu + reqs).children() == (cpu, reqs)
+    assert abs(cpu).children() == (cpu,)
+    assert outliers(reqs, "DBSCAN", 3.0).children() == (reqs,)
+
+
+def test_children__inferred_for_custom_nodes() -> None:
+    class pair(FormulaNode):
+        def __init__(self, fst: FormulaNode, snd: FormulaNode) -> None:
+            self.fst = fst
+            self.snd = snd
+            self.label = "not a node"
+
+    cpu = Identifier("cpu")
+    reqs = Identifier("reqs")
+
+    formula = abs(pair(cpu, reqs))
+
+    assert find_identifier_names(formula) == {"cpu", "reqs"}
+
+
+def test_find_identifiers__in_order() -> None:
+    formula = (Identifier("a") * Int(2)) - timeshift(Identifier("b"), -60)
+    formula = formula + Identifier("a")
+
+    names = [ident.name for ident in find_identifiers(formula)]
+    assert names == ["a", "b", "a"]
+
+
+def test_find_identifier_names__cached_on_every_node() -> None:
+    cpu = Identifier("cpu")
+    reqs = Identifier("reqs")
+    inner = abs(cpu)
+    formula = inner / reqs
+
+    assert find_identifier_names(formula) == {"cpu", "reqs"}
+    assert inner._identifier_names == frozenset({"cpu"})
+
+    # a new formula sharing a subtree reuses what was computed for it
+    outer = formula * Int(100)
+    assert find_identifier_names(outer) == {"cpu", "reqs"}
+    assert find_identifier_names(outer) is outer._identifier_names
+
+
+def test_find_identifier_names__deep_formula() -> None:
+    # deep enough to exceed the recursion limit of a recursive walk
+    formula: FormulaNode = Identifier("q0")
+    for idx in range(1, 5000):
+        formula = formula + Identifier(f"q{idx % 10}")
+
+    assert find_identifier_names(formula) == {f"q{idx}" for idx in range(10)}
+    assert len(find_identifiers(formula)) == 5000
+
+
+def test_rename_identifiers__swap_and_share() -> None:
+    with interning():
+        formula = intern_formula(
+            (Identifier("a") / Identifier("b")) + abs(Identifier("c"))
+        )
+    assert formula._frozen
+
+    renamed = rename_identifiers(formula, {"a": "b", "b": "a"})
+
+    assert renamed.codegen() == "((b / a) + abs(c))"
+    assert find_identifier_names(renamed) == {"a", "b", "c"}
+    assert renamed.children()[1] is formula.children()[1]
+
+    # the original (interned) formula is untouched
+    assert formula.codegen() == "((a / b) + abs(c))"
+    assert rename_identifiers(formula, {"x": "y"}) is formula
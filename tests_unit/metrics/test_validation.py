@@ -0,0 +1,128 @@
+import threading
+from typing import List
+
+import pytest
+
+from libddog.common.errors import (
+    RequestQueryNamesNotUnique,
+    UnresolvedFormulaIdentifiers,
+)
+from libddog.dashboards import Formula, Request
+from libddog.metrics import Identifier, Query, deferred_validation
+from libddog.metrics.query import QueryValidationError
+from libddog.metrics.validation import get_deferred_validator
+from libddog.parsing.query_parser import QuerySyntaxError
+
+
+def build_queries(num: int) -> None:
+    for idx in range(num):
+        (
+            Query("aws.ec2.cpuutilization")
+            .filter("$region", env="prod", role=f"role{idx % 3}")
+            .agg("avg")
+            .by("host")
+        )
+
+
+def test_deferred_validation__dedupes_tokens() -> None:
+    with deferred_validation() as validator:
+        assert get_deferred_validator() is validator
+
+        build_queries(100)
+
+        # $region, env, prod, role, role0..2, host
+        assert len(validator) == 8
+
+    assert get_deferred_validator() is None
+    assert len(validator) == 0
+
+
+def test_deferred_validation__raises_on_exit_with_call_site() -> None:
+    with pytest.raises(QueryValidationError) as exc_info:
+        with deferred_validation():
+            build_queries(10)
+            Query("aws.ec2.cpuutilization").filter(env="prod", **{"bad tag": "x"})
+            Query("aws.ec2.cpuutilization").filter(env="prod bad")
+
+    msg = str(exc_info.value)
+
+    # the earliest invalid token is reported
+    assert msg.startswith("Invalid tag name: 'bad tag'\n")
+    assert __file__ in msg
+    assert "test_deferred_validation__raises_on_exit_with_call_site" in msg
+    assert 'Query("aws.ec2.cpuutilization").filter(env="prod", **{"bad tag"' in msg
+
+
+def test_deferred_validation__requests() -> None:
+    query = Query("aws.ec2.cpuutilization", name="cpu").agg("avg")
+
+    with pytest.raises(UnresolvedFormulaIdentifiers) as exc_info:
+        with deferred_validation():
+            request = Request(
+                queries=[query], formulas=[Formula(Identifier("cpu") + Identifier("x"))]
+            )
+
+    assert request.queries == [query]
+    assert "'x'" in str(exc_info.value)
+    assert "request = Request(" in str(exc_info.value)
+
+
+def test_deferred_validation__in_processes() -> None:
+    with deferred_validation(jobs=2):
+        build_queries(10)
+
+    with pytest.raises(QueryValidationError):
+        with deferred_validation(jobs=2):
+            build_queries(10)
+            Query("aws.ec2.cpuutilization").filter(env="prod bad")
+
+
+def test_deferred_validation__not_run_if_block_fails() -> None:
+    with pytest.raises(RuntimeError):
+        with deferred_validation() as validator:
+            Query("aws.ec2.cpuutilization").filter(env="prod bad")
+            raise RuntimeError("failed")
+
+    # env and 'prod bad' are pending
+    assert len(validator) == 2
+
+
+def test_deferred_validation__requests_validated_as_given() -> None:
+    query = Query("aws.ec2.cpuutilization").agg("avg")
+
+    # the queries are only named q1, q2 after the request is validated
+    with pytest.raises(RequestQueryNamesNotUnique):
+        with deferred_validation():
+            Request(queries=[query, query])
+
+
+def test_deferred_validation__only_in_the_current_thread() -> None:
+    errors: List[Exception] = []
+
+    def build_invalid_query() -> None:
+        try:
+            Query("aws.ec2.cpuutilization").filter(env="prod bad")
+        except QueryValidationError as exc:
+            errors.append(exc)
+
+    with deferred_validation() as validator:
+        thread = threading.Thread(target=build_invalid_query)
+        thread.start()
+        thread.join()
+
+        assert len(validator) == 0
+
+    assert len(errors) == 1
+
+
+def test_deferred_validation__error_with_several_arguments() -> None:
+    def check() -> None:
+        raise QuerySyntaxError("Expected '}'", query="avg:cpu{", offset=8)
+
+    with pytest.raises(QuerySyntaxError) as exc_info:
+        with deferred_validation() as validator:
+            validator.defer_call(check)
+
+    assert exc_info.value.offset == 8
+    assert "Expected '}' at offset 8" in str(exc_info.value)
+    assert "validator.defer_call(check)" in str(exc_info.value)
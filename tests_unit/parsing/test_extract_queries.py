@@ -0,0 +1,65 @@
+import pytest
+from parsimonious.exceptions import ParseError
+
+from libddog.parsing.extract_queries import get_queries, get_query_terms
+
+
+def test_get_queries__legacy_and_formula_requests() -> None:
+    doc = {
+        "id": "abc-def-ghi",
+        "title": "EC2",
+        "widgets": [
+            {
+                "id": 1,
+                "definition": {
+                    "type": "group",
+                    "widgets": [
+                        {
+                            "id": 2,
+                            "definition": {
+                                "type": "timeseries",
+                                "title": "cpu",
+                                "requests": [
+                                    {
+                                        "queries": [
+                                            {"name": "q1", "query": "avg:cpu{*}"},
+                                            {
+                                                "data_source": "logs",
+                                                "name": "q2",
+                                                "search": {"query": "status:error"},
+                                            },
+                                        ],
+                                    }
+                                ],
+                            },
+                        },
+                        {"definition": {"type": "note", "content": "hi"}},
+                    ],
+                },
+            },
+            {
+                "id": 3,
+                "definition": {"type": "query_value", "requests": {"q": "sum:reqs{*}"}},
+            },
+        ],
+    }
+
+    found = [(qf.doc.id, qf.id, qf.title, qf.query) for qf in get_queries(doc)]
+    assert found == [
+        ("abc-def-ghi", 2, "cpu", "avg:cpu{*}"),
+        ("abc-def-ghi", 3, None, "sum:reqs{*}"),
+    ]
+
+
+def test_get_query_terms() -> None:
+    terms = get_query_terms(
+        "avg:aws.ec2.cpuutilization{$az, !role:cache, env} by {az, $region}"
+        " / sum:aws.elb.request_count{*}"
+    )
+
+    assert terms.metrics == ["aws.ec2.cpuutilization", "aws.elb.request_count"]
+    assert terms.tags == [("role", "cache"), ("env", None), ("az", None)]
+    assert terms.tmpl_vars == ["az", "region"]
+
+    with pytest.raises(ParseError):
+        get_query_terms("avg:")
@@ -0,0 +1,102 @@
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from libddog.parsing import parse_fetched as parse_fetched_module
+from libddog.parsing.parse_fetched import ParseManifest, parse_fetched
+from libddog.parsing.query_parser import ParserBackend, QueryParser
+
+
+def write_dashboard(filepath: Path, queries: List[str]) -> None:
+    dct = {
+        "id": filepath.stem,
+        "title": filepath.stem,
+        "widgets": [
+            {"definition": {"type": "timeseries", "requests": [{"q": query}]}}
+            for query in queries
+        ],
+    }
+    filepath.write_text(json.dumps(dct))
+
+
+def test_parse_fetched__only_changed_files_are_parsed(tmp_path: Path) -> None:
+    manifest = ParseManifest(tmp_path / ".manifest.json")
+
+    write_dashboard(tmp_path / "aaa.json", ["avg:cpu{*}", "avg:cpu{*"])
+    write_dashboard(tmp_path / "bbb.json", ["avg:mem{*}"])
+    (tmp_path / "ccc.json").write_text("{")
+
+    run = parse_fetched(tmp_path, manifest)
+    assert run.reparsed == ["aaa.json", "bbb.json", "ccc.json"]
+    assert run.num_queries == 3
+    assert run.files["aaa.json"].failures == ["avg:cpu{*"]
+    assert run.files["ccc.json"].error is not None
+    assert run.num_errors == 1
+
+    # nothing changed, but the report is still complete
+    run = parse_fetched(tmp_path, manifest)
+    assert run.reparsed == []
+    assert run.num_queries == 3
+    assert run.num_failures == 1
+    assert run.num_errors == 1
+
+    # touched without changing the content
+    os.utime(tmp_path / "aaa.json", ns=(0, 0))
+    # changed
+    write_dashboard(tmp_path / "bbb.json", ["avg:mem{*}", "avg:mem{"])
+    # removed
+    (tmp_path / "ccc.json").unlink()
+
+    run = parse_fetched(tmp_path, manifest)
+    assert run.reparsed == ["bbb.json"]
+    assert sorted(run.files) == ["aaa.json", "bbb.json"]
+    assert run.num_failures == 2
+
+    assert sorted(manifest.get()) == ["aaa.json", "bbb.json"]
+
+
+def test_parse_fetched__parser_change_reparses_all(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    manifest = ParseManifest(tmp_path / ".manifest.json")
+    write_dashboard(tmp_path / "aaa.json", ["avg:cpu{*}"])
+
+    assert parse_fetched(tmp_path, manifest).reparsed == ["aaa.json"]
+    assert parse_fetched(tmp_path, manifest).reparsed == []
+
+    monkeypatch.setattr(parse_fetched_module, "get_parser_digest", lambda: "changed")
+    assert manifest.get() == {}
+    assert parse_fetched(tmp_path, manifest).reparsed == ["aaa.json"]
+
+
+def test_parse_fetched__backend_defaults_to_grammar(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    backends = []
+
+    def is_valid_query(self: QueryParser, query_string: str) -> bool:
+        backends.append(self.backend)
+        return True
+
+    monkeypatch.setattr(QueryParser, "is_valid_query", is_valid_query)
+    write_dashboard(tmp_path / "aaa.json", ["avg:cpu{*}"])
+
+    parse_fetched(tmp_path, ParseManifest(tmp_path / ".manifest.json"))
+
+    assert backends == [ParserBackend.GRAMMAR]
+
+
+def test_parse_fetched__backend_change_reparses_all(tmp_path: Path) -> None:
+    grammar = ParseManifest(tmp_path / ".manifest.json")
+    recursive_descent = ParseManifest(
+        tmp_path / ".manifest.json", backend=ParserBackend.RECURSIVE_DESCENT
+    )
+    write_dashboard(tmp_path / "aaa.json", ["avg:cpu{*}"])
+
+    assert parse_fetched(tmp_path, grammar).reparsed == ["aaa.json"]
+    assert recursive_descent.get() == {}
+    assert parse_fetched(tmp_path, recursive_descent).reparsed == ["aaa.json"]
+    assert parse_fetched(tmp_path, recursive_descent).reparsed == []
@@ -0,0 +1,147 @@
+import random
+from typing import Type
+
+import pytest
+
+from libddog.metrics.bases import FormulaNode
+from libddog.metrics.formulas import Add, Div, Mul, Sub
+from libddog.metrics.functions import (
+    FUNCTIONS_BY_NAME,
+    Function,
+    FunctionWithSingleNode,
+    abs,
+    per_second,
+    timeshift,
+    top,
+)
+from libddog.metrics.literals import Float, Identifier, Int
+from libddog.parsing.parse_formula import (
+    get_func_names,
+    parse_formula,
+    parse_formula_identifiers,
+)
+from libddog.parsing.query_parser import QuerySyntaxError, UnsupportedQueryError
+
+
+def test_functions_by_name() -> None:
+    assert FUNCTIONS_BY_NAME["abs"] is abs
+    assert FUNCTIONS_BY_NAME["timeshift"] is timeshift
+
+    # base classes are not functions
+    assert Function not in FUNCTIONS_BY_NAME.values()
+    assert FunctionWithSingleNode not in FUNCTIONS_BY_NAME.values()
+
+    assert get_func_names() == list(FUNCTIONS_BY_NAME)
+
+
+def test_parse_formula_identifiers() -> None:
+    text = "100 * top(abs(q_4xx / q_all), 5, 'mean', 'desc')"
+
+    assert parse_formula_identifiers(text) == {"q_4xx", "q_all"}
+
+
+@pytest.mark.parametrize(
+    "formula, expected",
+    [
+        ("a", "a"),
+        ("  a  ", "a"),
+        ("100 * (q_4xx / q_all)", "(100 * (q_4xx / q_all))"),
+        ("a + b * c", "(a + (b * c))"),
+        ("a * b + c", "((a * b) + c)"),
+        ("a - b - c", "((a - b) - c)"),
+        ("a / b / c", "((a / b) / c)"),
+        ("a-1", "(a - 1)"),
+        ("a * -1.5", "(a * -1.5)"),
+        ("((a))", "a"),
+        ("abs(a)/2", "(abs(a) / 2)"),
+        ("timeshift(a, -3600)", "timeshift(a, -3600)"),
+        ("top(a + b,10,'mean','desc')", "top((a + b), 10, 'mean', 'desc')"),
+        ('exclude_null(a, "host")', "exclude_null(a, 'host')"),
+        ("outliers(a, 'MAD', 3, 80)", "outliers(a, 'MAD', 3, 80)"),
+    ],
+)
+def test_parse_formula(formula: str, expected: str) -> None:
+    assert parse_formula(formula).codegen() == expected
+
+
+def test_parse_formula__tree() -> None:
+    node = parse_formula("100 * top(q1, 5, 'max', 'desc') / q2")
+
+    assert isinstance(node, Div)
+    assert isinstance(node.left, Mul)
+    assert isinstance(node.left.left, Int)
+    assert isinstance(node.left.right, top)
+    assert node.left.right.limit_to == 5
+    assert isinstance(node.right, Identifier)
+    assert node.right.name == "q2"
+
+
+@pytest.mark.parametrize(
+    "formula, offset",
+    [
+        ("", 0),
+        ("a +", 3),
+        ("(a", 2),
+        ("a b", 2),
+        ("-a", 0),
+        ("'a'", 0),
+        ("abs(a", 5),
+        ("abs(a,)", 6),
+    ],
+)
+def test_parse_formula__syntax_errors(formula: str, offset: int) -> None:
+    with pytest.raises(QuerySyntaxError) as exc_info:
+        parse_formula(formula)
+
+    assert exc_info.value.offset == offset
+
+
+@pytest.mark.parametrize(
+    "formula, offset",
+    [
+        ("a + top10(b)", 4),
+        ("abs('a')", 0),
+        ("top(a, 7, 'mean', 'desc')", 0),
+    ],
+)
+def test_parse_formula__unsupported(formula: str, offset: int) -> None:
+    with pytest.raises(UnsupportedQueryError) as exc_info:
+        parse_formula(formula)
+
+    assert exc_info.value.offset == offset
+
+
+def random_formula(rnd: random.Random, depth: int) -> FormulaNode:
+    if depth == 0:
+        return rnd.choice(
+            [
+                Identifier(rnd.choice(["a", "q1", "query_2"])),
+                Int(rnd.randint(-100, 100)),
+                Float(rnd.choice([0.5, -2.25])),
+            ]
+        )
+
+    node = random_formula(rnd, depth - 1)
+    kind = rnd.random()
+
+    if kind < 0.5:
+        binop = rnd.choice([Add, Sub, Mul, Div])
+        return binop(node, random_formula(rnd, depth - 1))
+
+    if kind < 0.8:
+        func: Type[FunctionWithSingleNode] = rnd.choice([abs, per_second])
+        return func(node)
+
+    if kind < 0.9:
+        return timeshift(node, -rnd.randint(1, 86400))
+
+    return top(node, 10, "mean", "desc")
+
+
+def test_parse_formula__round_trip() -> None:
+    rnd = random.Random(0)
+
+    for _ in range(200):
+        formula = random_formula(rnd, rnd.randint(0, 6)).codegen()
+
+        assert parse_formula(formula).codegen() == formula
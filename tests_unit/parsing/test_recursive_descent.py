@@ -0,0 +1,207 @@
+import random
+from typing import List, Optional
+
+import pytest
+from parsimonious.expressions import Literal
+
+from libddog.parsing.query_parser import (
+    ParserBackend,
+    QueryParseError,
+    QueryParser,
+    QuerySyntaxError,
+    UnsupportedQueryError,
+)
+from libddog.parsing.recursive_descent import (
+    AGG_FUNCS,
+    AS_FUNCS,
+    FILL_FUNCS,
+    FUNC_NAMES,
+    ROLLUP_FUNCS,
+    KeywordTrie,
+    check_query_syntax,
+    parse_query,
+)
+from libtests.query_corpus import QueryCorpusGenerator, mutate_query
+
+VALID_QUERIES = [
+    "avg:svcname",
+    "svcname",
+    "avg:svcname.s3.95percentile",
+    "avg:svcname.s3.",
+    "avg:svcname{$region,box:blue,$db,name:bob}",
+    "avg:svcname{!region:us-east-1}",
+    "avg:svcname{  $region  ,   box:blue  }",
+    "avg:svcname{kubernetes.io/namespace:db}",
+    "avg:svcname{region:*-east-1}",
+    "avg:svcname{db:arn:aws:rds}",
+    "avg:svcname{region}",
+    "avg:svcname{*}",
+    "avg:svcname{$}",
+    "avg:svcname{*}by{  db  ,   $region  }",
+    "avg:svcname{db:toys} by {az}.as_rate().rollup(sum).fill(zero)",
+    "avg:svcname{db:toys}.fill(zero, 4).rollup(sum, 60)",
+    "sum:svcname{*}.fill(0).rollup(  count   ,  13   )",
+    "top10(sum:svcname by {region})",
+    "top(sum:svcname by {region},5,'max','desc')",
+    'top(  sum:svcname  ,  5  ,  "max"  ,  "desc"  )',
+    "(  avg:svcname.requests   )",
+    "-100 * avg:svcname.requests",
+    "sum:svcname.requests * avg:svcname.requests - 1",
+    "(100 * avg:svcname.requests) + 1",
+    "top(abs(avg:svcname.requests))",
+    "sum:svcname.requests, avg:svcname.requests",
+    "timeshift(avg:svcname{*}, -3600) / avg:svcname{*}",
+    "absolute.value + sum.total",
+]
+
+INVALID_QUERIES = [
+    "",
+    " avg:svcname",
+    "avg:svcname ",
+    "avg:svcname{",
+    "avg:svcname{!$region}",
+    "avg:svcname{*} by {}",
+    "avg:svcname.as_total()",
+    "avg:svcname.rollup(median)",
+    "top5(avg:svcname)",
+    "avg:1svcname",
+    "(avg:svcname",
+    "avg:svcname +",
+]
+
+
+def get_corpus(seed: int = 0) -> List[str]:
+    """
+    Returns the queries above and generated ones, along with mutations of the
+    valid ones (every prefix of those above, and random deletions and
+    insertions) which are mostly invalid in interesting places.
+    """
+
+    rand = random.Random(seed)
+    generated = QueryCorpusGenerator(seed=seed).corpus(300, formula_ratio=0.3)
+
+    corpus = VALID_QUERIES + INVALID_QUERIES + generated
+    for query in VALID_QUERIES:
+        for idx in range(len(query)):
+            corpus.append(query[:idx])
+
+    for query in VALID_QUERIES + generated:
+        for _ in range(10):
+            corpus.append(mutate_query(query, rand))
+
+    return corpus
+
+
+@pytest.mark.parametrize(
+    "rule, trie",
+    [
+        ("func_name", FUNC_NAMES),
+        ("agg_func", AGG_FUNCS),
+        ("rollup_func", ROLLUP_FUNCS),
+        ("fill_arg", FILL_FUNCS),
+        ("as_func", AS_FUNCS),
+    ],
+)
+def test_keywords_match_grammar(rule: str, trie: KeywordTrie) -> None:
+    members = QueryParser().grammar[rule].members
+    literals = [member.literal for member in members if isinstance(member, Literal)]
+
+    assert trie.keywords == literals
+
+
+def test_keyword_trie__first_match_wins() -> None:
+    trie = KeywordTrie(["top10", "top", "ab", "abc"])
+
+    assert trie.match("top10(", 0) == "top10"
+    assert trie.match("top5(", 0) == "top"
+    assert trie.match("x abc", 2) == "ab"
+    assert trie.match("to", 0) is None
+
+
+def test_differential__accepts_the_language_of_the_grammar() -> None:
+    grammar = QueryParser(backend=ParserBackend.GRAMMAR)
+    recursive_descent = QueryParser(backend=ParserBackend.RECURSIVE_DESCENT)
+
+    mismatches = [
+        query
+        for query in get_corpus()
+        if grammar.is_valid_query(query) != recursive_descent.is_valid_query(query)
+    ]
+
+    assert mismatches == []
+
+
+def test_differential__generated_queries_are_supported() -> None:
+    corpus = QueryCorpusGenerator(seed=1).corpus(300, formula_ratio=0.5)
+
+    for query in corpus:
+        codegen = parse_query(query).codegen()
+
+        # the AST generates a query that parses into the same AST
+        assert parse_query(codegen).codegen() == codegen, query
+
+
+def test_differential__builds_the_same_ast_as_the_visitor() -> None:
+    grammar = QueryParser(backend=ParserBackend.GRAMMAR)
+
+    compared = 0
+    for query in get_corpus():
+        try:
+            expected: Optional[str] = grammar.parse_ast(query).codegen()
+        except QueryParseError:
+            expected = None
+
+        # an AST where the visitor has none would be lossy or wrong
+        if expected is None:
+            with pytest.raises(QueryParseError):
+                parse_query(query)
+        else:
+            assert parse_query(query).codegen() == expected, query
+            compared += 1
+
+    assert compared > 100
+
+
+@pytest.mark.parametrize(
+    "query, offset, expected",
+    [
+        ("avg:cpu{*}.rollup(sum", 21, "Expected ')' or ','"),
+        ("avg:cpu{env:prod", 16, "Expected ',' or '}'"),
+        ("avg:cpu{!$az}", 9, "Expected tag name"),
+        ("avg:cpu{*} by {}", 15, "Expected '$' or tag name"),
+        ("avg:cpu +", 9, "Expected"),
+    ],
+)
+def test_syntax_error_offsets(query: str, offset: int, expected: str) -> None:
+    error = check_query_syntax(query)
+
+    assert error is not None
+    assert error.offset == offset
+    assert str(error).startswith(expected)
+
+    with pytest.raises(QuerySyntaxError):
+        parse_query(query)
+
+
+@pytest.mark.parametrize(
+    "query, offset",
+    [
+        ("top10(avg:cpu)", 0),
+        ("avg:cpu * abs('x')", 14),
+        ("avg:cpu{env:prod, $}", 18),
+        ("avg:cpu{*}.fill(5)", 16),
+        ("timeshift(avg:cpu, 60)", 0),
+        ("avg:cpu * clamp_max(avg:cpu, 2 * 3)", 10),
+        ("(avg:cpu, 'x') * 2", 10),
+        ("aws.elb.latency by {region}.as_count()", 16),
+        ("aws.elb.latency{*}.as_count()", 18),
+        ("median_3(aws.elb.latency by {$region})", 25),
+    ],
+)
+def test_unsupported_queries(query: str, offset: int) -> None:
+    assert check_query_syntax(query) is None
+
+    with pytest.raises(UnsupportedQueryError) as exc_info:
+        parse_query(query)
+
+    assert exc_info.value.offset == offset